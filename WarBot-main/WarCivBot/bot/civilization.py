@@ -7,94 +7,101 @@ from bot.database import Database
 
 logger = logging.getLogger(__name__)
 
+# Expanded ideology modifiers to include socialism, terrorism, capitalism, federalism, monarchy
+IDEOLOGY_MODIFIERS = {
+    "fascism": {
+        "soldier_training_speed": 1.25,
+        "diplomacy_success": 0.85,
+        "luck_modifier": 0.90
+    },
+    "democracy": {
+        "happiness_boost": 1.20,
+        "trade_profit": 1.10,
+        "soldier_training_speed": 0.85
+    },
+    "communism": {
+        "citizen_productivity": 1.10,
+        "tech_speed": 0.90
+    },
+    "theocracy": {
+        "propaganda_success": 1.15,
+        "happiness_boost": 1.05,
+        "tech_speed": 0.90
+    },
+    "anarchy": {
+        "random_event_frequency": 2.0,
+        "soldier_upkeep": 0.0,
+        "spy_success": 0.80
+    },
+    "destruction": {
+        "combat_strength": 1.35,
+        "resource_production": 0.75,
+        "soldier_training_speed": 1.40,
+        "happiness_boost": 0.70,
+        "diplomacy_success": 0.50
+    },
+    "pacifist": {
+        "happiness_boost": 1.35,
+        "population_growth": 1.25,
+        "trade_profit": 1.20,
+        "soldier_training_speed": 0.40,
+        "combat_strength": 0.60,
+        "diplomacy_success": 1.25
+    },
+    # New ideologies
+    "socialism": {
+        "citizen_productivity": 1.15,
+        "happiness_boost": 1.10,
+        "trade_profit": 0.90
+    },
+    "terrorism": {
+        # terrorism is treated as a shadow/guerrilla ideology: strong raids/spy ops,
+        # poor diplomacy and unstable resources
+        "guerrilla_effectiveness": 1.40,
+        "spy_success": 1.30,
+        "diplomacy_success": 0.50,
+        "resource_production": 0.80,
+        "unrest_multiplier": 1.25
+    },
+    "capitalism": {
+        "trade_profit": 1.20,
+        "gold_generation": 1.15,
+        "happiness_boost": 0.90  # inequality can lower happiness
+    },
+    "federalism": {
+        "stability": 1.10,
+        "diplomacy_success": 1.10,
+        "regional_production": 1.05
+    },
+    "monarchy": {
+        "loyalty": 1.10,
+        "soldier_morale": 1.10,
+        "reform_speed": 0.90,
+        "happiness_boost": 1.10
+    }
+}
+
+# Region-specific modifiers
+REGION_MODIFIERS = {
+    "Asia": {"food_production": 1.20, "population_capacity": 1.25},
+    "Europe": {"tech_research": 1.25, "gold_production": 1.15},
+    "Africa": {"mining_efficiency": 1.30, "stone_production": 1.20},
+    "North America": {"balanced_production": 1.10, "trade_efficiency": 1.15},
+    "South America": {"food_production": 1.25, "wood_production": 1.15},
+    "Middle East": {"gold_production": 1.40, "oil_resources": 1.30},
+    "Oceania": {"happiness": 1.15, "naval_advantage": 1.20},
+    "Antarctica": {"research_speed": 1.25, "unique_discoveries": 1.30}
+}
+
+
 class CivilizationManager:
+    __slots__ = ("db", "ideology_modifiers", "region_modifiers")
+
     def __init__(self, db: Database):
         self.db = db
-        # Expanded ideology modifiers to include socialism, terrorism, capitalism, federalism, monarchy
-        self.ideology_modifiers = {
-            "fascism": {
-                "soldier_training_speed": 1.25,
-                "diplomacy_success": 0.85,
-                "luck_modifier": 0.90
-            },
-            "democracy": {
-                "happiness_boost": 1.20,
-                "trade_profit": 1.10,
-                "soldier_training_speed": 0.85
-            },
-            "communism": {
-                "citizen_productivity": 1.10,
-                "tech_speed": 0.90
-            },
-            "theocracy": {
-                "propaganda_success": 1.15,
-                "happiness_boost": 1.05,
-                "tech_speed": 0.90
-            },
-            "anarchy": {
-                "random_event_frequency": 2.0,
-                "soldier_upkeep": 0.0,
-                "spy_success": 0.80
-            },
-            "destruction": {
-                "combat_strength": 1.35,
-                "resource_production": 0.75,
-                "soldier_training_speed": 1.40,
-                "happiness_boost": 0.70,
-                "diplomacy_success": 0.50
-            },
-            "pacifist": {
-                "happiness_boost": 1.35,
-                "population_growth": 1.25,
-                "trade_profit": 1.20,
-                "soldier_training_speed": 0.40,
-                "combat_strength": 0.60,
-                "diplomacy_success": 1.25
-            },
-            # New ideologies
-            "socialism": {
-                "citizen_productivity": 1.15,
-                "happiness_boost": 1.10,
-                "trade_profit": 0.90
-            },
-            "terrorism": {
-                # terrorism is treated as a shadow/guerrilla ideology: strong raids/spy ops,
-                # poor diplomacy and unstable resources
-                "guerrilla_effectiveness": 1.40,
-                "spy_success": 1.30,
-                "diplomacy_success": 0.50,
-                "resource_production": 0.80,
-                "unrest_multiplier": 1.25
-            },
-            "capitalism": {
-                "trade_profit": 1.20,
-                "gold_generation": 1.15,
-                "happiness_boost": 0.90  # inequality can lower happiness
-            },
-            "federalism": {
-                "stability": 1.10,
-                "diplomacy_success": 1.10,
-                "regional_production": 1.05
-            },
-            "monarchy": {
-                "loyalty": 1.10,
-                "soldier_morale": 1.10,
-                "reform_speed": 0.90,
-                "happiness_boost": 1.10
-            }
-        }
-
-        # Region-specific modifiers
-        self.region_modifiers = {
-            "Asia": {"food_production": 1.20, "population_capacity": 1.25},
-            "Europe": {"tech_research": 1.25, "gold_production": 1.15},
-            "Africa": {"mining_efficiency": 1.30, "stone_production": 1.20},
-            "North America": {"balanced_production": 1.10, "trade_efficiency": 1.15},
-            "South America": {"food_production": 1.25, "wood_production": 1.15},
-            "Middle East": {"gold_production": 1.40, "oil_resources": 1.30},
-            "Oceania": {"happiness": 1.15, "naval_advantage": 1.20},
-            "Antarctica": {"research_speed": 1.25, "unique_discoveries": 1.30}
-        }
+        # Shared, read-only modifier tables built once at import
+        self.ideology_modifiers = IDEOLOGY_MODIFIERS
+        self.region_modifiers = REGION_MODIFIERS
 
     def create_civilization(self, user_id: str, name: str, bonus_resources: Dict = None, bonuses: Dict = None, hyper_item: str = None) -> bool:
         """Create a new civilization"""
@@ -117,6 +124,19 @@ class CivilizationManager:
             logger.error(f"Error getting civilization for {user_id}: {e}")
             return None
 
+    def get_civilizations(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get several civilizations in one lookup, keyed by user_id"""
+        try:
+            civs = self.db.get_civilizations_many(user_ids)
+            for user_id, civ in civs.items():
+                if 'employed' not in civ['population']:
+                    civ['population']['employed'] = civ['population']['citizens'] // 2
+                    self._update_employment_only(user_id, civ['population']['employed'])
+            return civs
+        except Exception as e:
+            logger.error(f"Error getting civilizations for {user_ids}: {e}")
+            return {}
+
     def reset_civilization(self, user_id: str) -> bool:
         """Completely reset a user's civilization"""
         try:
@@ -138,13 +158,7 @@ class CivilizationManager:
     def _update_employment_only(self, user_id: str, employed: int) -> bool:
         """Update only the employment field without recursion"""
         try:
-            civ = self.get_civilization(user_id)
-            if not civ:
-                return False
-                
-            population = civ['population'].copy()
-            population['employed'] = employed
-            return self.db.update_civilization(user_id, {"population": population})
+            return self.db.patch_civilization_json(user_id, "population", {"employed": employed})
         except Exception as e:
             logger.error(f"Error updating employment for {user_id}: {e}")
             return False
@@ -197,24 +211,25 @@ class CivilizationManager:
                     loss = amount // 2  # 50% loss
                     resource_losses[resource] = -loss
             
-            # Apply resource losses
-            if resource_losses:
-                self.update_resources(user_id, resource_losses)
-            
             # Additional population and military losses
             population_loss = max(1, civ['population']['citizens'] // 20)  # 5% population loss
             soldier_loss = max(1, civ['military']['soldiers'] // 10)  # 10% soldier loss
             
-            self.update_population(user_id, {"citizens": -population_loss, "happiness": -15})
-            self.update_military(user_id, {"soldiers": -soldier_loss})
-            
-            # Log the civil war event
-            self.db.log_event(
-                user_id, 
-                "civil_war", 
-                "Civil War Erupts!", 
-                f"A devastating civil war has broken out! Lost 50% of resources, {population_loss} citizens, and {soldier_loss} soldiers due to internal conflict."
-            )
+            with self.db.transaction():
+                # Apply resource losses
+                if resource_losses:
+                    self.update_resources(user_id, resource_losses)
+                
+                self.update_population(user_id, {"citizens": -population_loss, "happiness": -15})
+                self.update_military(user_id, {"soldiers": -soldier_loss})
+                
+                # Log the civil war event
+                self.db.log_event(
+                    user_id, 
+                    "civil_war", 
+                    "Civil War Erupts!", 
+                    f"A devastating civil war has broken out! Lost 50% of resources, {population_loss} citizens, and {soldier_loss} soldiers due to internal conflict."
+                )
             
             logger.info(f"Civil war triggered for {user_id}. Lost 50% of resources.")
             
@@ -237,6 +252,76 @@ class CivilizationManager:
             logger.error(f"Error setting region for {user_id}: {e}")
             return False
 
+    @staticmethod
+    def _apply_resource_changes(resources: Dict[str, int], resource_changes: Dict[str, int]):
+        """Apply resource deltas in place, never going below zero"""
+        for resource, change in resource_changes.items():
+            if resource in resources:
+                resources[resource] = max(0, resources[resource] + change)
+
+    @staticmethod
+    def _apply_population_changes(population: Dict[str, int], population_changes: Dict[str, int]):
+        """Apply population deltas in place, keeping percentages within 0-100"""
+        for stat, change in population_changes.items():
+            if stat in population:
+                if stat in ['happiness', 'hunger']:
+                    population[stat] = max(0, min(100, population[stat] + change))
+                elif stat == 'citizens':
+                    population['citizens'] = max(0, population['citizens'] + change)
+                    population['employed'] = min(population.get('employed', 0), population['citizens'])
+                else:
+                    population[stat] = max(0, population[stat] + change)
+
+    @staticmethod
+    def _apply_military_changes(military: Dict[str, int], military_changes: Dict[str, int]):
+        """Apply military deltas in place, keeping tech level within 1-10"""
+        for stat, change in military_changes.items():
+            if stat in military:
+                if stat == 'tech_level':
+                    military[stat] = min(10, max(1, military[stat] + change))  # Cap at 10
+                else:
+                    military[stat] = max(0, military[stat] + change)
+
+    @staticmethod
+    def _apply_territory_changes(territory: Dict[str, int], territory_changes: Dict[str, int]):
+        """Apply territory deltas in place, never going below zero"""
+        for stat, change in territory_changes.items():
+            if stat in territory:
+                territory[stat] = max(0, territory[stat] + change)
+
+    def _on_tech_change(self, user_id: str, old_tech_level: int, new_tech_level: int):
+        """Offer a new card selection when tech level goes up"""
+        if new_tech_level > old_tech_level and new_tech_level <= 10:
+            self.db.generate_card_selection(user_id, new_tech_level)
+            self.db.log_event(user_id, "tech_advance", "Tech Level Increased",
+                            f"Reached tech level {new_tech_level}. New card selection available!")
+
+    def update_stats(self, user_id: str, changes: Dict[str, Dict[str, int]]) -> bool:
+        """Update several stat groups with one read and one write, e.g. both sides of a battle"""
+        try:
+            civ = self.get_civilization(user_id)
+            if not civ:
+                return False
+                
+            old_tech_level = civ['military']['tech_level']
+            appliers = {
+                'resources': self._apply_resource_changes,
+                'population': self._apply_population_changes,
+                'military': self._apply_military_changes,
+                'territory': self._apply_territory_changes,
+            }
+            for category, category_changes in changes.items():
+                appliers[category](civ[category], category_changes)
+            
+            result = self.db.update_civilization(user_id, {category: civ[category] for category in changes})
+            if result and 'military' in changes:
+                self._on_tech_change(user_id, old_tech_level, civ['military']['tech_level'])
+            
+            return result
+        except Exception as e:
+            logger.error(f"Error updating stats for {user_id}: {e}")
+            return False
+
     def update_resources(self, user_id: str, resource_changes: Dict[str, int]) -> bool:
         """Update civilization resources"""
         try:
@@ -245,9 +330,7 @@ class CivilizationManager:
                 return False
                 
             resources = civ['resources']
-            for resource, change in resource_changes.items():
-                if resource in resources:
-                    resources[resource] = max(0, resources[resource] + change)
+            self._apply_resource_changes(resources, resource_changes)
             
             return self.db.update_civilization(user_id, {"resources": resources})
         except Exception as e:
@@ -262,15 +345,7 @@ class CivilizationManager:
                 return False
                 
             population = civ['population']
-            for stat, change in population_changes.items():
-                if stat in population:
-                    if stat in ['happiness', 'hunger']:
-                        population[stat] = max(0, min(100, population[stat] + change))
-                    elif stat == 'citizens':
-                        population['citizens'] = max(0, population['citizens'] + change)
-                        population['employed'] = min(population.get('employed', 0), population['citizens'])
-                    else:
-                        population[stat] = max(0, population[stat] + change)
+            self._apply_population_changes(population, population_changes)
             
             return self.db.update_civilization(user_id, {"population": population})
         except Exception as e:
@@ -286,21 +361,11 @@ class CivilizationManager:
                 
             military = civ['military']
             old_tech_level = military['tech_level']
+            self._apply_military_changes(military, military_changes)
             
-            for stat, change in military_changes.items():
-                if stat in military:
-                    if stat == 'tech_level':
-                        military[stat] = min(10, max(1, military[stat] + change))  # Cap at 10
-                    else:
-                        military[stat] = max(0, military[stat] + change)
-            
-            new_tech_level = military['tech_level']
             result = self.db.update_civilization(user_id, {"military": military})
-            
-            if result and new_tech_level > old_tech_level and new_tech_level <= 10:
-                self.db.generate_card_selection(user_id, new_tech_level)
-                self.db.log_event(user_id, "tech_advance", "Tech Level Increased",
-                                f"Reached tech level {new_tech_level}. New card selection available!")
+            if result:
+                self._on_tech_change(user_id, old_tech_level, military['tech_level'])
             
             return result
         except Exception as e:
@@ -332,9 +397,7 @@ class CivilizationManager:
                 return False
                 
             territory = civ['territory']
-            for stat, change in territory_changes.items():
-                if stat in territory:
-                    territory[stat] = max(0, territory[stat] + change)
+            self._apply_territory_changes(territory, territory_changes)
             
             return self.db.update_civilization(user_id, {"territory": territory})
         except Exception as e:
@@ -694,43 +757,42 @@ class CivilizationManager:
             return False
 
     def spend_resources(self, user_id: str, costs: Dict[str, int]) -> bool:
-        """Spend resources if affordable"""
+        """Spend resources if affordable, checking and deducting in a single statement"""
         try:
-            if not self.can_afford(user_id, costs):
-                return False
-                
-            negative_costs = {resource: -cost for resource, cost in costs.items()}
-            return self.update_resources(user_id, negative_costs)
+            return self.db.spend_resources(user_id, costs)
         except Exception as e:
             logger.error(f"Error spending resources for {user_id}: {e}")
             return False
 
+    @staticmethod
+    def calculate_power(civ: Dict[str, Any]) -> int:
+        """Calculate the total power score of an already loaded civilization"""
+        resources = civ['resources']
+        population = civ['population']
+        military = civ['military']
+        territory = civ['territory']
+        bonuses = civ['bonuses']
+        
+        resource_power = sum(resources.values()) // 10
+        population_power = population['citizens'] * 2
+        military_power = military['soldiers'] * 5 + military['spies'] * 10
+        tech_power = military['tech_level'] * 100
+        territory_power = territory['land_size'] // 100
+        happiness_power = population['happiness']
+        
+        defense_bonus = bonuses.get('defense_strength', 0)
+        total_power = (resource_power + population_power + military_power +
+                      tech_power + territory_power + happiness_power)
+        
+        return int(total_power * (1 + defense_bonus / 100))
+
     def get_civilization_power(self, user_id: str) -> int:
         """Calculate civilization's total power score"""
         try:
             civ = self.get_civilization(user_id)
             if not civ:
                 return 0
-                
-            resources = civ['resources']
-            population = civ['population']
-            military = civ['military']
-            territory = civ['territory']
-            bonuses = civ['bonuses']
-            
-            resource_power = sum(resources.values()) // 10
-            population_power = population['citizens'] * 2
-            military_power = military['soldiers'] * 5 + military['spies'] * 10
-            tech_power = military['tech_level'] * 100
-            territory_power = territory['land_size'] // 100
-            happiness_power = population['happiness']
-            
-            defense_bonus = bonuses.get('defense_strength', 0)
-            total_power = (resource_power + population_power + military_power +
-                          tech_power + territory_power + happiness_power)
-            
-            total_power = int(total_power * (1 + defense_bonus / 100))
-            return total_power
+            return self.calculate_power(civ)
         except Exception as e:
             logger.error(f"Error calculating civilization power for {user_id}: {e}")
             return 0
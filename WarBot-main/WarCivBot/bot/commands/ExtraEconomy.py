@@ -367,7 +367,7 @@ class EconomyCog(commands.Cog):
                         self.manager.add_gold(suid, random.randint(50, 150))
                     elif proj == "virus":
                         if random.random() < 0.25:
-                            logger.debug(f"Virus coder {suid} got caught.")
+                            logger.debug("Virus coder %s got caught.", suid)
                         else:
                             self.manager.add_gold(suid, random.randint(250, 763))
                     elif proj == "messenger":
@@ -515,7 +515,7 @@ class EconomyCog(commands.Cog):
                 await ctx.send("You don't have enough gold. No cooldown applied.")
                 return
             symbols = ["🍒", "🍋", "🔔", "💎", "7️⃣"]
-            result = [random.choice(symbols) for _ in range(3)]
+            result = random.choices(symbols, k=3)
             if result == ["7️⃣", "7️⃣", "7️⃣"]:
                 win = amount * 10
                 self.manager.add_gold(uid, win)
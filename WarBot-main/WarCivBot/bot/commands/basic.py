@@ -7,7 +7,7 @@ import logging
 from datetime import datetime, timedelta
 from collections import defaultdict, deque
 from guilded.ext import commands
-from bot.utils import format_number, get_ascii_art, create_embed
+from bot.utils import format_number, get_ascii_art, create_embed, get_user_id
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +15,100 @@ logger = logging.getLogger(__name__)
 MAX_CONVERSATION_HISTORY = 100  # Increased to 100 messages max
 CONVERSATION_TIMEOUT = 1800  # 30 minutes in seconds
 
+# Help menu pages for .warhelp
+HELP_CATEGORIES = {
+    "basic": {
+        "title": "🏛️ Basic Commands",
+        "description": "Essential civilization management",
+        "commands": {
+            ".start <name>": "Begin your civilization journey",
+            ".ideology <type>": "Choose government type",
+            ".status": "View your civilization stats",
+            ".regions": "Select your region for bonuses",
+            ".reset": "⚠️ Reset your civilization (irreversible!)",
+            ".sv": "💾 Start saved chat with AI",
+            ".svc": "🗑️ Close saved chat"
+        }
+    },
+    "economy": {
+        "title": "💰 Economy Commands", 
+        "description": "Resource management & jobs",
+        "commands": {
+            ".extrawork": "Work to earn gold (5min cd)",
+            ".extrastore": "View special items shop",
+            ".extrainventory": "Check your inventory",
+            ".farm/.mine/.fish": "Gather resources",
+            ".tax": "Collect taxes from citizens",
+            ".invest <amt>": "Invest for future profit",
+            ".job <type>": "Apply for special jobs"
+        }
+    },
+    "military": {
+        "title": "⚔️ Military Commands",
+        "description": "Warfare and defense",
+        "commands": {
+            ".train soldiers/spies <amt>": "Train military units",
+            ".declare @user": "Declare war on another civ",
+            ".attack @user": "Launch direct attack", 
+            ".siege @user": "Lay siege to territory",
+            ".find": "Recruit wandering soldiers",
+            ".addborder/.removeborder": "Manage defenses",
+            ".cards": "Use unlocked battle cards"
+        }
+    },
+    "diplomacy": {
+        "title": "🤝 Diplomacy Commands",
+        "description": "Alliances and trade",
+        "commands": {
+            ".ally @user": "Propose alliance",
+            ".trade @user <offer> <request>": "Trade resources",
+            ".peace @user": "Offer peace treaty",
+            ".accept_peace @user": "Accept peace offer",
+            ".mail @user <msg>": "Send diplomatic message",
+            ".inbox": "Check pending requests"
+        }
+    },
+    "items": {
+        "title": "💎 HyperItem Commands",
+        "description": "Powerful special items",
+        "commands": {
+            ".inventory": "View your HyperItems",
+            ".blackmarket": "Risky item marketplace", 
+            ".nuke @user": "Nuclear attack (Warhead)",
+            ".shield": "Anti-nuke defense (Shield)",
+            ".propaganda @user": "Steal soldiers (Kit)",
+            ".luckystrike": "Guaranteed crit (Charm)"
+        }
+    }
+}
+
+# Government ideologies offered by .ideology, with their effect summaries
+IDEOLOGIES = {
+    "fascism": "+25% soldier training speed, -15% diplomacy success, -10% luck",
+    "democracy": "+20% happiness, +10% trade profit, slower soldier training (-15%)", 
+    "communism": "Equal resource distribution (+10% citizen productivity), -10% tech speed",
+    "theocracy": "+15% propaganda success, +5% happiness, -10% tech speed",
+    "anarchy": "Random events happen twice as often, 0 soldier upkeep, -20% spy success",
+    # NEW IDEOLOGIES
+    "destruction": "+35% combat strength, +40% soldier training, -25% resources, -30% happiness, -50% diplomacy",
+    "pacifist": "+35% happiness, +25% population growth, +20% trade profit, -60% soldier training, -40% combat, +25% diplomacy", 
+    "socialism": "+15% citizen productivity, +10% happiness from welfare, -10% trade profit",
+    "terrorism": "+40% guerrilla/raid effectiveness, +30% spy success, -50% diplomacy, increases unrest",
+    "capitalism": "+20% trade profit, +15% gold generation, -10% happiness due to inequality",
+    "federalism": "+10% stability, +10% diplomacy, +5% regional production, minor tech tradeoffs",
+    "monarchy": "+10% loyalty/happiness, +10% soldier morale, -10% reform speed"
+}
+VALID_IDEOLOGIES = frozenset(IDEOLOGIES)
+IDEOLOGY_NAMES = ', '.join(IDEOLOGIES)
+
+# .status embed fields as (name, template); every template is filled from one
+# dict of already formatted values
+STATUS_FIELDS = (
+    ("💰 Resources", "🪙 Gold: {gold}\n🌾 Food: {food}\n🪨 Stone: {stone}\n🪵 Wood: {wood}"),
+    ("👥 Population & Military", "👤 Citizens: {citizens}\n😊 Happiness: {happiness}%\n🍽️ Hunger: {hunger}%\n⚔️ Soldiers: {soldiers}\n🕵️ Spies: {spies}"),
+    ("🗺️ Territory & Items", "🏞️ Land Size: {land_size} km²\n🎁 HyperItems: {item_count}\n{item_list}"),
+)
+
 class BasicCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -30,6 +124,54 @@ class BasicCommands(commands.Cog):
         self.conversations = defaultdict(deque)  # user_id: deque of messages
         self.last_interaction = {}  # user_id: timestamp
         self.saved_chats = set()  # user_ids with saved chats
+        
+        # Help pages never change, so build their embeds once
+        self.help_embeds = self._build_help_embeds()
+        self.help_not_found_embed = guilded.Embed(
+            title="❌ Category Not Found",
+            description=f"Available categories: {', '.join(HELP_CATEGORIES.keys())}",
+            color=0xff0000
+        )
+
+    def _build_help_embeds(self):
+        """Build every help menu page once; none of them depend on the caller"""
+        # Main menu, shown when no category is given
+        main_embed = guilded.Embed(
+            title="🤖 NationBot Help Menu",
+            description="**Use `.warhelp <category>` for detailed commands**\nExample: `.warhelp basic`",
+            color=0x1e90ff
+        )
+        
+        for cat_name, cat_data in HELP_CATEGORIES.items():
+            main_embed.add_field(
+                name=cat_data["title"],
+                value=f"*{cat_data['description']}*\n`{cat_name}`",
+                inline=True
+            )
+        
+        main_embed.add_field(
+            name="💡 Quick Tips",
+            value="• Mention me or reply for AI help\n• Use `.sv` for persistent chats\n• Check cooldowns with commands",
+            inline=False
+        )
+        
+        help_embeds = {None: main_embed}
+        
+        # One page per category
+        for cat_name, cat_data in HELP_CATEGORIES.items():
+            embed = guilded.Embed(
+                title=cat_data["title"],
+                description=cat_data["description"],
+                color=0x1e90ff
+            )
+            
+            for cmd, desc in cat_data["commands"].items():
+                embed.add_field(name=cmd, value=desc, inline=False)
+            
+            embed.set_footer(text=f"Use .warhelp for main menu | Total categories: {len(HELP_CATEGORIES)}")
+            help_embeds[cat_name] = embed
+        
+        return help_embeds
 
     def _get_conversation_history(self, user_id):
         """Get formatted conversation history for a user"""
@@ -78,7 +220,7 @@ class BasicCommands(commands.Cog):
     @commands.command(name='reset')
     async def reset_civilization(self, ctx):
         """Reset your civilization (irreversible!)"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         civ = self.civ_manager.get_civilization(user_id)
         
         if not civ:
@@ -148,7 +290,7 @@ class BasicCommands(commands.Cog):
     @commands.command(name='sv')
     async def start_saved_chat(self, ctx):
         """Start a saved chat with the AI (no timeout)"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if user_id in self.saved_chats:
             await ctx.send("💾 You already have a saved chat running! Use `.svc` to close it.")
@@ -178,7 +320,7 @@ class BasicCommands(commands.Cog):
     @commands.command(name='svc')
     async def close_saved_chat(self, ctx):
         """Close and delete your saved chat"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if user_id not in self.saved_chats:
             await ctx.send("❌ You don't have a saved chat running! Use `.sv` to start one.")
@@ -514,121 +656,7 @@ Remember to keep responses engaging but focused on the game.
     @commands.command(name='warhelp')
     async def warbot_help_command(self, ctx, category: str = None):
         """Display simplified, organized help menu"""
-        
-        # Define help categories
-        categories = {
-            "basic": {
-                "title": "🏛️ Basic Commands",
-                "description": "Essential civilization management",
-                "commands": {
-                    ".start <name>": "Begin your civilization journey",
-                    ".ideology <type>": "Choose government type",
-                    ".status": "View your civilization stats",
-                    ".regions": "Select your region for bonuses",
-                    ".reset": "⚠️ Reset your civilization (irreversible!)",
-                    ".sv": "💾 Start saved chat with AI",
-                    ".svc": "🗑️ Close saved chat"
-                }
-            },
-            "economy": {
-                "title": "💰 Economy Commands", 
-                "description": "Resource management & jobs",
-                "commands": {
-                    ".extrawork": "Work to earn gold (5min cd)",
-                    ".extrastore": "View special items shop",
-                    ".extrainventory": "Check your inventory",
-                    ".farm/.mine/.fish": "Gather resources",
-                    ".tax": "Collect taxes from citizens",
-                    ".invest <amt>": "Invest for future profit",
-                    ".job <type>": "Apply for special jobs"
-                }
-            },
-            "military": {
-                "title": "⚔️ Military Commands",
-                "description": "Warfare and defense",
-                "commands": {
-                    ".train soldiers/spies <amt>": "Train military units",
-                    ".declare @user": "Declare war on another civ",
-                    ".attack @user": "Launch direct attack", 
-                    ".siege @user": "Lay siege to territory",
-                    ".find": "Recruit wandering soldiers",
-                    ".addborder/.removeborder": "Manage defenses",
-                    ".cards": "Use unlocked battle cards"
-                }
-            },
-            "diplomacy": {
-                "title": "🤝 Diplomacy Commands",
-                "description": "Alliances and trade",
-                "commands": {
-                    ".ally @user": "Propose alliance",
-                    ".trade @user <offer> <request>": "Trade resources",
-                    ".peace @user": "Offer peace treaty",
-                    ".accept_peace @user": "Accept peace offer",
-                    ".mail @user <msg>": "Send diplomatic message",
-                    ".inbox": "Check pending requests"
-                }
-            },
-            "items": {
-                "title": "💎 HyperItem Commands",
-                "description": "Powerful special items",
-                "commands": {
-                    ".inventory": "View your HyperItems",
-                    ".blackmarket": "Risky item marketplace", 
-                    ".nuke @user": "Nuclear attack (Warhead)",
-                    ".shield": "Anti-nuke defense (Shield)",
-                    ".propaganda @user": "Steal soldiers (Kit)",
-                    ".luckystrike": "Guaranteed crit (Charm)"
-                }
-            }
-        }
-
-        # If no category specified, show main menu
-        if not category:
-            embed = guilded.Embed(
-                title="🤖 NationBot Help Menu",
-                description="**Use `.warhelp <category>` for detailed commands**\nExample: `.warhelp basic`",
-                color=0x1e90ff
-            )
-            
-            for cat_name, cat_data in categories.items():
-                embed.add_field(
-                    name=cat_data["title"],
-                    value=f"*{cat_data['description']}*\n`{cat_name}`",
-                    inline=True
-                )
-            
-            embed.add_field(
-                name="💡 Quick Tips",
-                value="• Mention me or reply for AI help\n• Use `.sv` for persistent chats\n• Check cooldowns with commands",
-                inline=False
-            )
-            
-            await ctx.send(embed=embed)
-            return
-
-        # Show specific category
-        category = category.lower()
-        if category in categories:
-            cat_data = categories[category]
-            
-            embed = guilded.Embed(
-                title=cat_data["title"],
-                description=cat_data["description"],
-                color=0x1e90ff
-            )
-            
-            for cmd, desc in cat_data["commands"].items():
-                embed.add_field(name=cmd, value=desc, inline=False)
-            
-            embed.set_footer(text=f"Use .warhelp for main menu | Total categories: {len(categories)}")
-            
-        else:
-            embed = guilded.Embed(
-                title="❌ Category Not Found",
-                description=f"Available categories: {', '.join(categories.keys())}",
-                color=0xff0000
-            )
-        
+        embed = self.help_embeds.get(category.lower() if category else None, self.help_not_found_embed)
         await ctx.send(embed=embed)
 
     # ... rest of your existing commands (regions, start, ideology, status) remain the same ...
@@ -680,7 +708,7 @@ Remember to keep responses engaging but focused on the game.
             }
         }
         
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         civ = self.civ_manager.get_civilization(user_id)
         
         if not civ:
@@ -794,7 +822,7 @@ Remember to keep responses engaging but focused on the game.
             await ctx.send("❌ Please provide a civilization name: `.start <civilization_name>`")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check if user already has a civilization
         if self.civ_manager.get_civilization(user_id):
@@ -860,31 +888,21 @@ Remember to keep responses engaging but focused on the game.
     async def choose_ideology(self, ctx, ideology_type: str = None):
         """Choose your civilization's government ideology"""
         if not ideology_type:
-            ideologies = {
-                "fascism": "+25% soldier training speed, -15% diplomacy success, -10% luck",
-                "democracy": "+20% happiness, +10% trade profit, slower soldier training (-15%)", 
-                "communism": "Equal resource distribution (+10% citizen productivity), -10% tech speed",
-                "theocracy": "+15% propaganda success, +5% happiness, -10% tech speed",
-                "anarchy": "Random events happen twice as often, 0 soldier upkeep, -20% spy success",
-                # NEW IDEOLOGIES
-                "destruction": "+35% combat strength, +40% soldier training, -25% resources, -30% happiness, -50% diplomacy",
-                "pacifist": "+35% happiness, +25% population growth, +20% trade profit, -60% soldier training, -40% combat, +25% diplomacy", 
-                "socialism": "+15% citizen productivity, +10% happiness from welfare, -10% trade profit",
-                "terrorism": "+40% guerrilla/raid effectiveness, +30% spy success, -50% diplomacy, increases unrest",
-                "capitalism": "+20% trade profit, +15% gold generation, -10% happiness due to inequality",
-                "federalism": "+10% stability, +10% diplomacy, +5% regional production, minor tech tradeoffs",
-                "monarchy": "+10% loyalty/happiness, +10% soldier morale, -10% reform speed"
-            }
-            
             embed = guilded.Embed(title="🏛️ Government Ideologies", color=0x0099ff)
-            for name, description in ideologies.items():
+            for name, description in IDEOLOGIES.items():
                 embed.add_field(name=name.capitalize(), value=description, inline=False)
             embed.add_field(name="Usage", value="`.ideology <type>`", inline=False)
             
             await ctx.send(embed=embed)
             return
             
-        user_id = str(ctx.author.id)
+        # Reject unknown ideologies before touching the database
+        ideology_type = ideology_type.lower()
+        if ideology_type not in VALID_IDEOLOGIES:
+            await ctx.send(f"❌ Invalid ideology! Choose from: {IDEOLOGY_NAMES}")
+            return
+            
+        user_id = get_user_id(ctx)
         civ = self.civ_manager.get_civilization(user_id)
         
         if not civ:
@@ -895,14 +913,6 @@ Remember to keep responses engaging but focused on the game.
             await ctx.send("❌ You have already chosen an ideology! It cannot be changed.")
             return
             
-        ideology_type = ideology_type.lower()
-        # UPDATED valid ideologies list
-        valid_ideologies = ["fascism", "democracy", "communism", "theocracy", "anarchy", "destruction", "pacifist", "socialism", "terrorism", "capitalism", "federalism", "monarchy"]
-        
-        if ideology_type not in valid_ideologies:
-            await ctx.send(f"❌ Invalid ideology! Choose from: {', '.join(valid_ideologies)}")
-            return
-            
         # Apply ideology
         self.civ_manager.set_ideology(user_id, ideology_type)
         
@@ -938,7 +948,7 @@ Remember to keep responses engaging but focused on the game.
     @commands.command(name='status')
     async def civilization_status(self, ctx):
         """View your civilization status"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         civ = self.civ_manager.get_civilization(user_id)
         
         if not civ:
@@ -952,31 +962,27 @@ Remember to keep responses engaging but focused on the game.
             color=0x0099ff
         )
         
-        # Resources
+        # Resources, population & military, territory & items
         resources = civ['resources']
-        embed.add_field(
-            name="💰 Resources",
-            value=f"🪙 Gold: {format_number(resources['gold'])}\n🌾 Food: {format_number(resources['food'])}\n🪨 Stone: {format_number(resources['stone'])}\n🪵 Wood: {format_number(resources['wood'])}",
-            inline=True
-        )
-        
-        # Population & Military
         population = civ['population']
         military = civ['military']
-        embed.add_field(
-            name="👥 Population & Military",
-            value=f"👤 Citizens: {format_number(population['citizens'])}\n😊 Happiness: {population['happiness']}%\n🍽️ Hunger: {population['hunger']}%\n⚔️ Soldiers: {format_number(military['soldiers'])}\n🕵️ Spies: {format_number(military['spies'])}",
-            inline=True
-        )
-        
-        # Territory & Items
-        territory = civ['territory']
         hyper_items = civ.get('hyper_items', [])
-        embed.add_field(
-            name="🗺️ Territory & Items",
-            value=f"🏞️ Land Size: {format_number(territory['land_size'])} km²\n🎁 HyperItems: {len(hyper_items)}\n" + ("\n".join(f"• {item}" for item in hyper_items[:5]) + ("..." if len(hyper_items) > 5 else "")),
-            inline=True
-        )
+        values = {
+            'gold': format_number(resources['gold']),
+            'food': format_number(resources['food']),
+            'stone': format_number(resources['stone']),
+            'wood': format_number(resources['wood']),
+            'citizens': format_number(population['citizens']),
+            'happiness': population['happiness'],
+            'hunger': population['hunger'],
+            'soldiers': format_number(military['soldiers']),
+            'spies': format_number(military['spies']),
+            'land_size': format_number(civ['territory']['land_size']),
+            'item_count': len(hyper_items),
+            'item_list': "\n".join(f"• {item}" for item in hyper_items[:5]) + ("..." if len(hyper_items) > 5 else "")
+        }
+        for name, template in STATUS_FIELDS:
+            embed.add_field(name=name, value=template.format_map(values), inline=True)
         
         await ctx.send(embed=embed)
 
@@ -1,13 +1,28 @@
 import random
 import guilded
 from guilded.ext import commands
-import json
 import logging
 from datetime import datetime, timedelta
 import sqlite3
+from bot.database import json_dumps, json_loads
+from bot.utils import get_user_id, validate_user_mention
 
 logger = logging.getLogger(__name__)
 
+# Number of most recent diplomatic messages shown by .inbox
+INBOX_MESSAGE_LIMIT = 5
+
+# Icon and display name for each tradeable resource, built once for every embed
+RESOURCE_LABELS = {
+    resource: (icon, resource.capitalize())
+    for resource, icon in (("gold", "🪙"), ("food", "🌾"), ("wood", "🪵"), ("stone", "🪨"))
+}
+
+def format_resource(resource: str, amount) -> str:
+    """Format an amount of a resource with its icon and name"""
+    icon, name = RESOURCE_LABELS[resource]
+    return f"{icon} {amount} {name}"
+
 class DiplomacyCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -16,37 +31,46 @@ class DiplomacyCommands(commands.Cog):
         self.pending_trades = {}  # Temp storage for pending trades {trade_id: details}
         self.pending_alliances = {}  # Temp storage for pending alliances {alliance_id: details}
 
-    @commands.command(name='ally')
-    async def propose_alliance(self, ctx, target: str = None, alliance_name: str = None):
-        """Propose an alliance with another civilization"""
-        if not target or not alliance_name:
-            await ctx.send("🤝 **Alliance Proposal**\nUsage: `.ally @user <alliance_name>`\nPropose a mutual defense pact with another civilization.")
-            return
-            
-        user_id = str(ctx.author.id)
-        civ = self.civ_manager.get_civilization(user_id)
+    async def _resolve_two_civs(self, ctx, target: str, invalid_target_error: str,
+                                self_target_error: str = None):
+        """Resolve the caller's and a mentioned user's civilizations, replying with the reason on failure"""
+        user_id = get_user_id(ctx)
         
+        # Parse target
+        target_id = validate_user_mention(target)
+        if not target_id:
+            await ctx.send(invalid_target_error)
+            return None
+            
+        if self_target_error and target_id == user_id:
+            await ctx.send(self_target_error)
+            return None
+            
+        # Fetch both civilizations in one lookup
+        civs = self.civ_manager.get_civilizations([user_id, target_id])
+        civ = civs.get(user_id)
         if not civ:
             await ctx.send("❌ You need to start a civilization first! Use `.start <name>`")
-            return
+            return None
             
-        # Parse target
-        if target.startswith('<@') and target.endswith('>'):
-            target_id = target[2:-1]
-            if target_id.startswith('!'):
-                target_id = target_id[1:]
-        else:
-            await ctx.send("❌ Please mention a valid user to ally with!")
-            return
+        target_civ = civs.get(target_id)
+        if not target_civ:
+            await ctx.send("❌ Target user doesn't have a civilization!")
+            return None
             
-        if target_id == user_id:
-            await ctx.send("❌ You cannot ally with yourself!")
+        return user_id, target_id, civ, target_civ
+
+    @commands.command(name='ally')
+    async def propose_alliance(self, ctx, target: str = None, alliance_name: str = None):
+        """Propose an alliance with another civilization"""
+        if not target or not alliance_name:
+            await ctx.send("🤝 **Alliance Proposal**\nUsage: `.ally @user <alliance_name>`\nPropose a mutual defense pact with another civilization.")
             return
             
-        target_civ = self.civ_manager.get_civilization(target_id)
-        if not target_civ:
-            await ctx.send("❌ Target user doesn't have a civilization!")
+        resolved = await self._resolve_two_civs(ctx, target, "❌ Please mention a valid user to ally with!", "❌ You cannot ally with yourself!")
+        if not resolved:
             return
+        user_id, target_id, civ, target_civ = resolved
             
         # Check if already at war
         conn = self.db.get_connection()
@@ -111,7 +135,7 @@ class DiplomacyCommands(commands.Cog):
     @commands.command(name='acceptally')
     async def accept_alliance(self, ctx, alliance_id: str):
         """Accept a pending alliance proposal"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if alliance_id not in self.pending_alliances:
             await ctx.send("❌ Invalid or expired alliance ID!")
@@ -128,17 +152,18 @@ class DiplomacyCommands(commands.Cog):
             del self.pending_alliances[alliance_id]
             return
             
-        # Create the alliance
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-                INSERT INTO alliances (name, leader_id, members)
-                VALUES (?, ?, ?)
-            ''', (proposal["alliance_name"], proposal["proposer_id"], json.dumps([proposal["proposer_id"], proposal["target_id"]])))
-            
-            conn.commit()
+            # Create the alliance and log it for both members in one commit
+            with self.db.transaction() as conn:
+                conn.execute('''
+                    INSERT INTO alliances (name, leader_id, members)
+                    VALUES (?, ?, ?)
+                ''', (proposal["alliance_name"], proposal["proposer_id"], json_dumps([proposal["proposer_id"], proposal["target_id"]])))
+                self.db.log_event(proposal["proposer_id"], "alliance", "Alliance Formed", f"Created alliance '{proposal['alliance_name']}'")
+                self.db.log_event(user_id, "alliance", "Alliance Formed", f"Joined alliance '{proposal['alliance_name']}'")
+            
+            self.db.invalidate_alliances()
+            del self.pending_alliances[alliance_id]
             
             embed = guilded.Embed(
                 title="🤝 Alliance Formed!",
@@ -152,14 +177,8 @@ class DiplomacyCommands(commands.Cog):
                 inline=False
             )
             
-            await ctx.send(embed=embed)
-            await ctx.send(f"<@{proposal['proposer_id']}> 🤝 **Alliance Accepted!** Your proposal for **{proposal['alliance_name']}** has been accepted!")
-            
-            # Log events
-            self.db.log_event(proposal["proposer_id"], "alliance", "Alliance Formed", f"Created alliance '{proposal['alliance_name']}'")
-            self.db.log_event(user_id, "alliance", "Alliance Formed", f"Joined alliance '{proposal['alliance_name']}'")
-            
-            del self.pending_alliances[alliance_id]
+            # One message carries both the proposer's ping and the announcement
+            await ctx.send(f"<@{proposal['proposer_id']}> 🤝 **Alliance Accepted!** Your proposal for **{proposal['alliance_name']}** has been accepted!", embed=embed)
             
         except Exception as e:
             logger.error(f"Error creating alliance: {e}")
@@ -168,7 +187,7 @@ class DiplomacyCommands(commands.Cog):
     @commands.command(name='rejectally')
     async def reject_alliance(self, ctx, alliance_id: str):
         """Reject a pending alliance proposal"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if alliance_id not in self.pending_alliances:
             await ctx.send("❌ Invalid or expired alliance ID!")
@@ -192,7 +211,7 @@ class DiplomacyCommands(commands.Cog):
     @commands.command(name='break')
     async def break_alliance(self, ctx):
         """Break your current alliance"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         civ = self.civ_manager.get_civilization(user_id)
         
         if not civ:
@@ -200,34 +219,29 @@ class DiplomacyCommands(commands.Cog):
             return
             
         # Find user's alliance
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM alliances 
-            WHERE members LIKE '%' || ? || '%'
-        ''', (user_id,))
-        
-        alliance = cursor.fetchone()
-        if not alliance:
+        alliance_dict = self.db.get_user_alliance(user_id)
+        if not alliance_dict:
             await ctx.send("❌ You are not currently in an alliance!")
             return
             
-        alliance_dict = dict(alliance)
-        members = json.loads(alliance_dict['members'])
+        members = json_loads(alliance_dict['members'])
+        notified = [member_id for member_id in members if member_id != user_id]
         
-        if len(members) <= 2:
-            # Dissolve the alliance if only 2 members
-            cursor.execute('DELETE FROM alliances WHERE id = ?', (alliance_dict['id'],))
-        else:
-            # Remove user from alliance
-            members.remove(user_id)
-            cursor.execute('UPDATE alliances SET members = ? WHERE id = ?', (json.dumps(members), alliance_dict['id']))
+        # Leaving and its penalty share one commit
+        with self.db.transaction() as conn:
+            if len(members) <= 2:
+                # Dissolve the alliance if only 2 members
+                conn.execute('DELETE FROM alliances WHERE id = ?', (alliance_dict['id'],))
+            else:
+                # Remove user from alliance
+                members.remove(user_id)
+                conn.execute('UPDATE alliances SET members = ? WHERE id = ?', (json_dumps(members), alliance_dict['id']))
             
-        conn.commit()
-        
-        # Happiness penalty for breaking alliance
-        self.civ_manager.update_population(user_id, {"happiness": -10})
+            # Happiness penalty for breaking alliance
+            self.civ_manager.update_population(user_id, {"happiness": -10})
+            
+            self.db.log_event(user_id, "alliance_break", "Alliance Broken", f"Left the {alliance_dict['name']} alliance")
+        self.db.invalidate_alliances()
         
         embed = guilded.Embed(
             title="💔 Alliance Broken",
@@ -236,14 +250,12 @@ class DiplomacyCommands(commands.Cog):
         )
         embed.add_field(name="Consequence", value="Breaking diplomatic ties has upset your people. (-10 happiness)", inline=False)
         
-        await ctx.send(embed=embed)
-        
-        # Notify other alliance members in channel
-        for member_id in members:
-            if member_id != user_id:
-                await ctx.send(f"<@{member_id}> 💔 **Alliance Update**: {civ['name']} has left the **{alliance_dict['name']}** alliance.")
-                
-        self.db.log_event(user_id, "alliance_break", "Alliance Broken", f"Left the {alliance_dict['name']} alliance")
+        # Notify other alliance members in the same message as the embed
+        mentions = " ".join(f"<@{member_id}>" for member_id in notified)
+        if mentions:
+            await ctx.send(f"{mentions} 💔 **Alliance Update**: {civ['name']} has left the **{alliance_dict['name']}** alliance.", embed=embed)
+        else:
+            await ctx.send(embed=embed)
 
     @commands.command(name='send')
     async def send_resources(self, ctx, target: str = None, resource_type: str = None, amount: int = None):
@@ -260,26 +272,10 @@ class DiplomacyCommands(commands.Cog):
             await ctx.send("❌ Amount must be positive!")
             return
             
-        user_id = str(ctx.author.id)
-        civ = self.civ_manager.get_civilization(user_id)
-        
-        if not civ:
-            await ctx.send("❌ You need to start a civilization first! Use `.start <name>`")
-            return
-            
-        # Parse target
-        if target.startswith('<@') and target.endswith('>'):
-            target_id = target[2:-1]
-            if target_id.startswith('!'):
-                target_id = target_id[1:]
-        else:
-            await ctx.send("❌ Please mention a valid user to send resources to!")
-            return
-            
-        target_civ = self.civ_manager.get_civilization(target_id)
-        if not target_civ:
-            await ctx.send("❌ Target user doesn't have a civilization!")
+        resolved = await self._resolve_two_civs(ctx, target, "❌ Please mention a valid user to send resources to!")
+        if not resolved:
             return
+        user_id, target_id, civ, target_civ = resolved
             
         # Check if can afford
         if not self.civ_manager.can_afford(user_id, {resource_type: amount}):
@@ -287,15 +283,7 @@ class DiplomacyCommands(commands.Cog):
             return
             
         # Check if allied (optional - could allow sending to anyone)
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM alliances 
-            WHERE members LIKE '%' || ? || '%' AND members LIKE '%' || ? || '%'
-        ''', (user_id, target_id))
-        
-        is_allied = cursor.fetchone()[0] > 0
+        is_allied = self.db.are_allied(user_id, target_id)
         
         # Calculate transfer efficiency
         transfer_efficiency = 0.9  # 90% efficiency (10% lost in transport)
@@ -309,8 +297,7 @@ class DiplomacyCommands(commands.Cog):
         self.civ_manager.update_resources(target_id, {resource_type: received_amount})
         
         # Create success embed
-        resource_icons = {"gold": "🪙", "food": "🌾", "wood": "🪵", "stone": "🪨"}
-        
+        resource_icon, resource_name = RESOURCE_LABELS[resource_type]
         embed = guilded.Embed(
             title="📦 Resources Sent",
             description=f"Successfully sent resources to **{target_civ['name']}**!",
@@ -319,7 +306,7 @@ class DiplomacyCommands(commands.Cog):
         
         embed.add_field(
             name="Transfer Details",
-            value=f"{resource_icons[resource_type]} Sent: {amount} {resource_type.capitalize()}\n{resource_icons[resource_type]} Received: {received_amount} {resource_type.capitalize()}\n📊 Efficiency: {int(transfer_efficiency * 100)}%",
+            value=f"{resource_icon} Sent: {amount} {resource_name}\n{resource_icon} Received: {received_amount} {resource_name}\n📊 Efficiency: {int(transfer_efficiency * 100)}%",
             inline=False
         )
         
@@ -346,26 +333,10 @@ class DiplomacyCommands(commands.Cog):
             await ctx.send(f"❌ Invalid resource! Choose from: {', '.join(valid_resources)}")
             return
             
-        user_id = str(ctx.author.id)
-        civ = self.civ_manager.get_civilization(user_id)
-        
-        if not civ:
-            await ctx.send("❌ You need to start a civilization first! Use `.start <name>`")
-            return
-            
-        # Parse target
-        if target.startswith('<@') and target.endswith('>'):
-            target_id = target[2:-1]
-            if target_id.startswith('!'):
-                target_id = target_id[1:]
-        else:
-            await ctx.send("❌ Please mention a valid user to trade with!")
-            return
-            
-        target_civ = self.civ_manager.get_civilization(target_id)
-        if not target_civ:
-            await ctx.send("❌ Target user doesn't have a civilization!")
+        resolved = await self._resolve_two_civs(ctx, target, "❌ Please mention a valid user to trade with!")
+        if not resolved:
             return
+        user_id, target_id, civ, target_civ = resolved
             
         # Check if can afford the offer
         if not self.civ_manager.can_afford(user_id, {offer_resource: offer_amount}):
@@ -387,8 +358,6 @@ class DiplomacyCommands(commands.Cog):
         }
         
         # Send proposal in channel with ping
-        resource_icons = {"gold": "🪙", "food": "🌾", "wood": "🪵", "stone": "🪨"}
-        
         embed = guilded.Embed(
             title="💰 Trade Proposal Received!",
             description=f"From **{civ['name']}** (led by {ctx.author.name})",
@@ -397,7 +366,7 @@ class DiplomacyCommands(commands.Cog):
         
         embed.add_field(
             name="Proposed Trade",
-            value=f"They offer: {resource_icons[offer_resource]} {offer_amount} {offer_resource.capitalize()}\nThey request: {resource_icons[request_resource]} {request_amount} {request_resource.capitalize()}",
+            value=f"They offer: {format_resource(offer_resource, offer_amount)}\nThey request: {format_resource(request_resource, request_amount)}",
             inline=False
         )
         
@@ -414,7 +383,7 @@ class DiplomacyCommands(commands.Cog):
     @commands.command(name='accepttrade')
     async def accept_trade(self, ctx, trade_id: str):
         """Accept a pending trade proposal"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if trade_id not in self.pending_trades:
             await ctx.send("❌ Invalid or expired trade ID!")
@@ -442,26 +411,25 @@ class DiplomacyCommands(commands.Cog):
             del self.pending_trades[trade_id]
             return
             
-        # Execute trade
-        self.civ_manager.spend_resources(trade["proposer_id"], {trade["offer_resource"]: trade["offer_amount"]})
-        self.civ_manager.update_resources(trade["proposer_id"], {trade["request_resource"]: trade["request_amount"]})
-        
-        self.civ_manager.spend_resources(user_id, {trade["request_resource"]: trade["request_amount"]})
-        self.civ_manager.update_resources(user_id, {trade["offer_resource"]: trade["offer_amount"]})
+        # Execute trade and log it for both sides in one commit
+        with self.db.transaction():
+            self.civ_manager.spend_resources(trade["proposer_id"], {trade["offer_resource"]: trade["offer_amount"]})
+            self.civ_manager.update_resources(trade["proposer_id"], {trade["request_resource"]: trade["request_amount"]})
+            
+            self.civ_manager.spend_resources(user_id, {trade["request_resource"]: trade["request_amount"]})
+            self.civ_manager.update_resources(user_id, {trade["offer_resource"]: trade["offer_amount"]})
+            
+            self.db.log_event(user_id, "trade_accept", "Trade Accepted", f"Accepted trade {trade_id}")
+            self.db.log_event(trade["proposer_id"], "trade_accept", "Trade Accepted", f"Trade {trade_id} accepted by target")
+        del self.pending_trades[trade_id]
         
         # Notify proposer in channel
-        await ctx.send(f"<@{trade['proposer_id']}> 💰 **Trade Accepted!** Your trade proposal has been accepted!")
-        await ctx.send("💰 **Trade Accepted!** The exchange has been completed.")
-        
-        # Log
-        self.db.log_event(user_id, "trade_accept", "Trade Accepted", f"Accepted trade {trade_id}")
-        self.db.log_event(trade["proposer_id"], "trade_accept", "Trade Accepted", f"Trade {trade_id} accepted by target")
-        del self.pending_trades[trade_id]
+        await ctx.send(f"<@{trade['proposer_id']}> 💰 **Trade Accepted!** Your trade proposal has been accepted! The exchange has been completed.")
 
     @commands.command(name='rejecttrade')
     async def reject_trade(self, ctx, trade_id: str):
         """Reject a pending trade proposal"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if trade_id not in self.pending_trades:
             await ctx.send("❌ Invalid or expired trade ID!")
@@ -493,26 +461,10 @@ class DiplomacyCommands(commands.Cog):
             await ctx.send("❌ Message too long! Maximum 500 characters.")
             return
             
-        user_id = str(ctx.author.id)
-        civ = self.civ_manager.get_civilization(user_id)
-        
-        if not civ:
-            await ctx.send("❌ You need to start a civilization first! Use `.start <name>`")
-            return
-            
-        # Parse target
-        if target.startswith('<@') and target.endswith('>'):
-            target_id = target[2:-1]
-            if target_id.startswith('!'):
-                target_id = target_id[1:]
-        else:
-            await ctx.send("❌ Please mention a valid user to send mail to!")
-            return
-            
-        target_civ = self.civ_manager.get_civilization(target_id)
-        if not target_civ:
-            await ctx.send("❌ Target user doesn't have a civilization!")
+        resolved = await self._resolve_two_civs(ctx, target, "❌ Please mention a valid user to send mail to!")
+        if not resolved:
             return
+        user_id, target_id, civ, target_civ = resolved
             
         # Store the message in the database
         try:
@@ -535,8 +487,18 @@ class DiplomacyCommands(commands.Cog):
     @commands.command(name='inbox')
     async def check_inbox(self, ctx):
         """Check your pending alliance, trade proposals, and diplomatic messages"""
-        user_id = str(ctx.author.id)
-        civ = self.civ_manager.get_civilization(user_id)
+        user_id = get_user_id(ctx)
+        now = datetime.now()
+        open_alliances = [(alliance_id, proposal) for alliance_id, proposal in self.pending_alliances.items()
+                          if proposal["target_id"] == user_id and now < proposal["expires"]]
+        open_trades = [(trade_id, trade) for trade_id, trade in self.pending_trades.items()
+                       if trade["target_id"] == user_id and now < trade["expires"]]
+        
+        # Fetch the reader's and every proposer's civilization in one lookup
+        civs = self.civ_manager.get_civilizations(
+            [user_id] + [proposal["proposer_id"] for _, proposal in open_alliances + open_trades]
+        )
+        civ = civs.get(user_id)
         
         if not civ:
             await ctx.send("❌ You need to start a civilization first! Use `.start <name>`")
@@ -550,55 +512,46 @@ class DiplomacyCommands(commands.Cog):
         
         # Check pending alliances
         alliance_proposals = []
-        for alliance_id, proposal in self.pending_alliances.items():
-            if proposal["target_id"] == user_id and datetime.now() < proposal["expires"]:
-                proposer_civ = self.civ_manager.get_civilization(proposal["proposer_id"])
-                if proposer_civ:
-                    alliance_proposals.append(
-                        f"**Alliance ID**: {alliance_id}\n"
-                        f"From: **{proposer_civ['name']}**\n"
-                        f"Alliance Name: **{proposal['alliance_name']}**\n"
-                        f"Respond with: `.acceptally {alliance_id}` or `.rejectally {alliance_id}`\n"
-                        f"Expires: <t:{int(proposal['expires'].timestamp())}:R>"
-                    )
+        for alliance_id, proposal in open_alliances:
+            proposer_civ = civs.get(proposal["proposer_id"])
+            if proposer_civ:
+                alliance_proposals.append(
+                    f"**Alliance ID**: {alliance_id}\n"
+                    f"From: **{proposer_civ['name']}**\n"
+                    f"Alliance Name: **{proposal['alliance_name']}**\n"
+                    f"Respond with: `.acceptally {alliance_id}` or `.rejectally {alliance_id}`\n"
+                    f"Expires: <t:{int(proposal['expires'].timestamp())}:R>"
+                )
         
         # Check pending trades
         trade_proposals = []
-        for trade_id, trade in self.pending_trades.items():
-            if trade["target_id"] == user_id and datetime.now() < trade["expires"]:
-                proposer_civ = self.civ_manager.get_civilization(trade["proposer_id"])
-                if proposer_civ:
-                    resource_icons = {"gold": "🪙", "food": "🌾", "wood": "🪵", "stone": "🪨"}
-                    trade_proposals.append(
-                        f"**Trade ID**: {trade_id}\n"
-                        f"From: **{proposer_civ['name']}**\n"
-                        f"Offers: {resource_icons[trade['offer_resource']]} {trade['offer_amount']} {trade['offer_resource'].capitalize()}\n"
-                        f"Requests: {resource_icons[trade['request_resource']]} {trade['request_amount']} {trade['request_resource'].capitalize()}\n"
-                        f"Respond with: `.accepttrade {trade_id}` or `.rejecttrade {trade_id}`\n"
-                        f"Expires: <t:{int(trade['expires'].timestamp())}:R>"
-                    )
-        
-        # Check diplomatic messages using the database method
-        diplomatic_messages = []
+        for trade_id, trade in open_trades:
+            proposer_civ = civs.get(trade["proposer_id"])
+            if proposer_civ:
+                trade_proposals.append(
+                    f"**Trade ID**: {trade_id}\n"
+                    f"From: **{proposer_civ['name']}**\n"
+                    f"Offers: {format_resource(trade['offer_resource'], trade['offer_amount'])}\n"
+                    f"Requests: {format_resource(trade['request_resource'], trade['request_amount'])}\n"
+                    f"Respond with: `.accepttrade {trade_id}` or `.rejecttrade {trade_id}`\n"
+                    f"Expires: <t:{int(trade['expires'].timestamp())}:R>"
+                )
+        
+        # Check diplomatic messages using the database method; one row past the ones shown
+        # is fetched to tell whether older messages were left out
         try:
-            messages = self.db.get_messages(user_id)
-            
-            for msg in messages:
-                sender_civ = self.civ_manager.get_civilization(msg['sender_id'])
-                if sender_civ:
-                    # Handle timestamp format
-                    timestamp = msg['created_at']
-                    if isinstance(timestamp, str):
-                        timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                    
-                    diplomatic_messages.append(
-                        f"**From**: {sender_civ['name']}\n"
-                        f"**Message**: {msg['message']}\n"
-                        f"**Received**: <t:{int(timestamp.timestamp())}:R>"
-                    )
+            messages = self.db.get_messages(user_id, INBOX_MESSAGE_LIMIT + 1)
+            diplomatic_text = "\n\n".join(
+                f"**From**: {msg['sender_name']}\n"
+                f"**Message**: {msg['message']}\n"
+                f"**Received**: <t:{msg['created_epoch']}:R>"
+                for msg in messages[:INBOX_MESSAGE_LIMIT]
+            )
+            if len(messages) > INBOX_MESSAGE_LIMIT:
+                diplomatic_text += f"\n\n*…older messages hidden; only the {INBOX_MESSAGE_LIMIT} newest are shown.*"
         except Exception as e:
             logger.error(f"Error fetching messages: {e}")
-            diplomatic_messages.append("⚠️ Could not load messages")
+            diplomatic_text = "⚠️ Could not load messages"
         
         # Add fields to embed
         embed.add_field(
@@ -613,7 +566,7 @@ class DiplomacyCommands(commands.Cog):
         )
         embed.add_field(
             name="Diplomatic Messages",
-            value="\n\n".join(diplomatic_messages) if diplomatic_messages else "No diplomatic messages received.",
+            value=diplomatic_text or "No diplomatic messages received.",
             inline=False
         )
         
@@ -626,7 +579,7 @@ class DiplomacyCommands(commands.Cog):
             await ctx.send("⚔️ **Coalition Warfare**\nUsage: `.coalition <target_alliance_name>`\nForm a coalition to declare war on another alliance.")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         civ = self.civ_manager.get_civilization(user_id)
         
         if not civ:
@@ -634,20 +587,14 @@ class DiplomacyCommands(commands.Cog):
             return
             
         # Find user's alliance
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM alliances 
-            WHERE members LIKE '%' || ? || '%'
-        ''', (user_id,))
-        
-        user_alliance = cursor.fetchone()
+        user_alliance = self.db.get_user_alliance(user_id)
         if not user_alliance:
             await ctx.send("❌ You must be in an alliance to form a coalition!")
             return
             
         # Find target alliance
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
         cursor.execute('SELECT * FROM alliances WHERE name = ?', (target_alliance,))
         target_alliance_data = cursor.fetchone()
         
@@ -663,8 +610,8 @@ class DiplomacyCommands(commands.Cog):
         target_alliance_dict = dict(target_alliance_data)
         
         # Calculate coalition success chance
-        user_members = json.loads(user_alliance_dict['members'])
-        target_members = json.loads(target_alliance_dict['members'])
+        user_members = json_loads(user_alliance_dict['members'])
+        target_members = json_loads(target_alliance_dict['members'])
         
         # Coalition is more likely to succeed if user's alliance is larger or stronger
         success_chance = min(0.8, len(user_members) / max(1, len(target_members)))
@@ -683,14 +630,13 @@ class DiplomacyCommands(commands.Cog):
                 inline=False
             )
             
-            # Notify all members of both alliances in channel
-            all_affected = user_members + target_members
-            for member_id in all_affected:
-                if member_id != user_id:
-                    if member_id in user_members:
-                        await ctx.send(f"<@{member_id}> ⚔️ **Coalition Formed!** Your alliance has formed a coalition against {target_alliance}!")
-                    else:
-                        await ctx.send(f"<@{member_id}> ⚔️ **Coalition Against You!** {user_alliance_dict['name']} has formed a coalition against your alliance!")
+            # Notify all members of both alliances in channel, one batched message per side
+            ally_mentions = " ".join(f"<@{member_id}>" for member_id in user_members if member_id != user_id)
+            enemy_mentions = " ".join(f"<@{member_id}>" for member_id in target_members if member_id not in user_members)
+            if ally_mentions:
+                await ctx.send(f"{ally_mentions} ⚔️ **Coalition Formed!** Your alliance has formed a coalition against {target_alliance}!")
+            if enemy_mentions:
+                await ctx.send(f"{enemy_mentions} ⚔️ **Coalition Against You!** {user_alliance_dict['name']} has formed a coalition against your alliance!")
                         
             await ctx.send(embed=embed)
             
@@ -702,10 +648,11 @@ class DiplomacyCommands(commands.Cog):
             )
             embed.add_field(name="Consequence", value="Failed diplomacy has consequences. (-10 happiness)", inline=False)
             
-            # Penalty for failed coalition
-            self.civ_manager.update_population(user_id, {"happiness": -10})
+            # Penalty for failed coalition, committed with its log entry
+            with self.db.transaction():
+                self.civ_manager.update_population(user_id, {"happiness": -10})
+                self.db.log_event(user_id, "coalition_failed", "Coalition Failed", f"Failed coalition against {target_alliance}")
             await ctx.send(embed=embed)
-            self.db.log_event(user_id, "coalition_failed", "Coalition Failed", f"Failed coalition against {target_alliance}")
 
 def setup(bot):
     bot.add_cog(DiplomacyCommands(bot))
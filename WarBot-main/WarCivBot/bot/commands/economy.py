@@ -2,9 +2,8 @@ import random
 import asyncio
 import guilded
 from guilded.ext import commands
-from datetime import datetime, timedelta
 import logging
-from bot.utils import format_number, create_embed
+from bot.utils import format_number, create_embed, get_user_id
 from functools import wraps
 
 logger = logging.getLogger(__name__)
@@ -12,29 +11,38 @@ logger = logging.getLogger(__name__)
 # Cooldown decorator implementation
 def check_cooldown_decorator(minutes=0):
     def decorator(func):
+        command_name = func.__name__
+
         @wraps(func)
         async def wrapper(self, ctx, *args, **kwargs):
-            user_id = str(ctx.author.id)
-            command_name = func.__name__
-            
-            # Get last used time from database
-            last_used = self.db.get_command_cooldown(user_id, command_name)
-            
-            if last_used:
-                cooldown_end = last_used + timedelta(minutes=minutes)
-                if datetime.utcnow() < cooldown_end:
-                    remaining = cooldown_end - datetime.utcnow()
-                    mins = int(remaining.total_seconds() // 60)
-                    secs = int(remaining.total_seconds() % 60)
-                    await ctx.send(f"⏳ Please wait {mins}m {secs}s before using this command again!")
-                    return
-            
-            # Update cooldown in database
-            self.db.set_command_cooldown(user_id, command_name, datetime.utcnow())
-            return await func(self, ctx, *args, **kwargs)
+            user_id = get_user_id(ctx)
+            
+            # Get the civilization and seconds left on the cooldown in a single query
+            civ, remaining = self.db.get_civilization_with_cooldown(user_id, command_name, minutes)
+            
+            if not civ:
+                await ctx.send("❌ You need to start a civilization first! Use `.start <name>`")
+                return
+            
+            if remaining:
+                mins, secs = divmod(remaining, 60)
+                await ctx.send(f"⏳ Please wait {mins}m {secs}s before using this command again!")
+                return
+            
+            # Start the cooldown now; it is written by the command's own commit
+            self.db.queue_command_cooldown(user_id, command_name)
+            try:
+                return await func(self, ctx, *args, **kwargs)
+            finally:
+                self.db.flush_cooldowns()
+        # Lets the spam pre-check in on_message know how long the cooldown lasts
+        wrapper.cooldown_seconds = minutes * 60
         return wrapper
     return decorator
 
+# Short alias used by the commands below
+cooldown = check_cooldown_decorator
+
 class EconomyCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -61,10 +69,10 @@ class EconomyCommands(commands.Cog):
             return True
 
     @commands.command(name='gather')
-    @check_cooldown_decorator(minutes=1)
+    @cooldown(1)
     async def gather_resources(self, ctx):
         """Gather random resources from your territory"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -82,14 +90,15 @@ class EconomyCommands(commands.Cog):
         
         employment_rate = self.civ_manager.get_employment_rate(user_id)
         employment_modifier = employment_rate / 100 + 0.5  # Base 50% + employment rate
+        # Apply territory modifier; it is the same for every resource
+        territory_modifier = civ['territory']['land_size'] / 1000
         
         for resource in possible_resources:
-            if random.random() < 0.7:  # 70% chance for each resource
-                base_amount = random.randint(10, 50)
-                # Apply territory modifier
-                territory_modifier = civ['territory']['land_size'] / 1000
-                amount = int(base_amount * territory_modifier * employment_modifier)
-                gathered[resource] = amount
+            roll = random.random()
+            if roll < 0.7:  # 70% chance for each resource
+                # A hit leaves roll uniform on [0, 0.7), so it also picks the 10-50 amount
+                base_amount = 10 + int(roll / 0.7 * 41)
+                gathered[resource] = int(base_amount * territory_modifier * employment_modifier)
         
         if not gathered:
             await ctx.send("🔍 Your scouts searched but found nothing of value this time.")
@@ -120,14 +129,14 @@ class EconomyCommands(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(name='work')
-    @check_cooldown_decorator(minutes=1)
+    @cooldown(1)
     async def work(self, ctx, amount: int = None):
         """Employ citizens to work and gain immediate gold"""
         if amount is None or amount < 1:
             await ctx.send("💼 **Work Command**\nUsage: `.work <amount>`\nEmploy <amount> citizens to increase employment and gain gold based on new employment rate.")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -172,10 +181,10 @@ class EconomyCommands(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(name='farm')
-    @check_cooldown_decorator(minutes=1)
+    @cooldown(1)
     async def farm_food(self, ctx):
         """Farm food for your civilization"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -223,10 +232,10 @@ class EconomyCommands(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(name='mine')
-    @check_cooldown_decorator(minutes=1)
+    @cooldown(1)
     async def mine_resources(self, ctx):
         """Mine stone and wood from your territory"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -278,7 +287,7 @@ class EconomyCommands(commands.Cog):
     @commands.command(name='harvest')
     async def harvest_food(self, ctx):
         """Large harvest with longer cooldown"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -316,10 +325,10 @@ class EconomyCommands(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(name='drill')
-    @check_cooldown_decorator(minutes=1)
+    @cooldown(1)
     async def drill_minerals(self, ctx):
         """Extract rare minerals with advanced drilling"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -364,10 +373,10 @@ class EconomyCommands(commands.Cog):
         await ctx.send(content=drill_gif, embed=embed)
 
     @commands.command(name='fish')
-    @check_cooldown_decorator(minutes=1)
+    @cooldown(1)
     async def fish_resources(self, ctx):
         """Fish for food or occasionally find treasure"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -402,10 +411,10 @@ class EconomyCommands(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(name='tax')
-    @check_cooldown_decorator(minutes=5)
+    @cooldown(5)
     async def collect_taxes(self, ctx):
         """Collect taxes from your citizens with risk of population loss"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -464,7 +473,7 @@ class EconomyCommands(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(name='lottery')
-    @check_cooldown_decorator(minutes=1)
+    @cooldown(1)
     async def play_lottery(self, ctx, bet: int = None):
         """Gamble gold for a chance at the jackpot"""
         if bet is None:
@@ -475,7 +484,7 @@ class EconomyCommands(commands.Cog):
             await ctx.send("❌ Minimum lottery bet is 50 gold!")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -533,7 +542,7 @@ class EconomyCommands(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(name='invest')
-    @check_cooldown_decorator(minutes=5)
+    @cooldown(5)
     async def invest_gold(self, ctx, amount: int = None):
         """Invest gold for delayed profit"""
         if amount is None:
@@ -544,7 +553,7 @@ class EconomyCommands(commands.Cog):
             await ctx.send("❌ Minimum investment is 100 gold!")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -604,10 +613,10 @@ class EconomyCommands(commands.Cog):
         asyncio.create_task(investment_return())
 
     @commands.command(name='raidcaravan')
-    @check_cooldown_decorator(minutes=5)
+    @cooldown(5)
     async def raid_caravan(self, ctx):
         """Raid NPC merchant caravans for loot"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -683,7 +692,7 @@ class EconomyCommands(commands.Cog):
             await ctx.send("🚗 **Drive Command**\nUsage: `.drive <amount>`\nUnemploy <amount> citizens to reduce employment rate.")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -721,10 +730,10 @@ class EconomyCommands(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(name='festival')
-    @check_cooldown_decorator(minutes=1)
+    @cooldown(1)
     async def hold_festival(self, ctx):
         """Hold a grand festival to greatly boost citizen happiness"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -768,10 +777,10 @@ class EconomyCommands(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(name='cheer')
-    @check_cooldown_decorator(minutes=1)
+    @cooldown(1)
     async def cheer_citizens(self, ctx):
         """Spread cheer to boost citizen happiness"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -823,7 +832,7 @@ class EconomyCommands(commands.Cog):
             await ctx.send("💰 **Sell Hyper Items**\nUsage: `.sell <item-name>`\nSell specific hyper items to wandering merchants for gold.")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -867,10 +876,10 @@ class EconomyCommands(commands.Cog):
         await ctx.send(embed=embed)
 
     @commands.command(name='advertise')
-    @check_cooldown_decorator(minutes=10)
+    @cooldown(10)
     async def advertise_civilization(self, ctx):
         """Run promotional campaigns to attract new citizens"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -925,7 +934,7 @@ class EconomyCommands(commands.Cog):
     @commands.command(name='census')
     async def show_census(self, ctx):
         """Display current gold and population status"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         civ = self.civ_manager.get_civilization(user_id)
         
@@ -971,7 +980,7 @@ class EconomyCommands(commands.Cog):
             await ctx.send("🎖️ **Recruitment Drive**\nUsage: `.recruit <number>`\nAttempt to convert citizens into soldiers. Higher numbers risk population loss if recruitment fails.")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         # Check for civil war first
         if not await self.check_civil_war_and_proceed(ctx, user_id):
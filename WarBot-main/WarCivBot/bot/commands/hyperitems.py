@@ -3,15 +3,40 @@ import asyncio
 import guilded
 from guilded.ext import commands
 import logging
-from bot.utils import format_number, check_cooldown_decorator, create_embed
+from bot.utils import format_number, check_cooldown_decorator, create_embed, get_user_id, validate_user_mention
 
 logger = logging.getLogger(__name__)
 
+# Fixed fields of the elite spy mission embeds; only the description changes per mission
+SUPERSPY_SUCCESS_FIELD = {"name": "Network Status", "value": "Spy Network consumed - mission complete", "inline": False}
+SUPERSPY_FAILED_FIELD = {"name": "Result", "value": "Spy Network consumed but no intelligence gathered", "inline": False}
+
+def covert_operation_roll(success_chance, *side_chances):
+    """Roll a covert operation's success and, on success, each of its side effects"""
+    if random.random() >= success_chance:
+        return False, (False,) * len(side_chances)
+    return True, tuple(random.random() < chance for chance in side_chances)
+
 class HyperItemCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.db = bot.db
         self.civ_manager = bot.civ_manager
+        self.notification_tasks = set()  # Background DMs, kept referenced until they finish
+
+    async def _send_dm(self, user_id: str, message: str):
+        """DM a user, ignoring users who can't be reached"""
+        try:
+            user = await self.bot.fetch_user(int(user_id))
+            await user.send(message)
+        except:
+            pass
+
+    def _notify_user(self, user_id: str, message: str):
+        """DM a user in the background so the command doesn't wait on it"""
+        task = asyncio.create_task(self._send_dm(user_id, message))
+        self.notification_tasks.add(task)
+        task.add_done_callback(self.notification_tasks.discard)
 
     def _has_hyperitem(self, user_id: str, item_name: str) -> bool:
         """Check if user has a specific HyperItem"""
@@ -34,11 +59,7 @@ class HyperItemCommands(commands.Cog):
         await ctx.send(embed=embed)
         
         # Notify target
-        try:
-            target_user = await self.bot.fetch_user(int(target_id))
-            await target_user.send(f"🛡️ **Shield Popped Off!** Your Anti-Nuke Shield straight-up blocked that {attack_type} from {attacker_civ['name']}. You're safe, fr.")
-        except:
-            pass
+        self._notify_user(target_id, f"🛡️ **Shield Popped Off!** Your Anti-Nuke Shield straight-up blocked that {attack_type} from {attacker_civ['name']}. You're safe, fr.")
 
     async def _reflect_with_mirror(self, ctx, target_id: str, target_civ, attacker_civ, attack_type: str):
         """Generic mirror reflection handler for all attacks"""
@@ -54,17 +75,9 @@ class HyperItemCommands(commands.Cog):
         await ctx.send(embed=embed)
         
         # Notify both parties
-        try:
-            target_user = await self.bot.fetch_user(int(target_id))
-            await target_user.send(f"🪞 **Attack Reflected!** Your Mirror reflected the {attack_type} from {attacker_civ['name']} back at them!")
-        except:
-            pass
+        self._notify_user(target_id, f"🪞 **Attack Reflected!** Your Mirror reflected the {attack_type} from {attacker_civ['name']} back at them!")
             
-        try:
-            attacker_user = await self.bot.fetch_user(int(attacker_civ['user_id']))
-            await attacker_user.send(f"🪞 **ATTACK REFLECTED!** Your {attack_type} was reflected back at you by {target_civ['name']}'s Mirror!")
-        except:
-            pass
+        self._notify_user(attacker_civ['user_id'], f"🪞 **ATTACK REFLECTED!** Your {attack_type} was reflected back at you by {target_civ['name']}'s Mirror!")
 
     async def _announce_global_attack(self, ctx, attacker_name: str, target_name: str, attack_type: str):
         """Announce world-ending attacks globally"""
@@ -89,7 +102,7 @@ class HyperItemCommands(commands.Cog):
     @check_cooldown_decorator(minutes=60)
     async def last_stand(self, ctx):
         """Use Last Stand when under 500 gold for ultimate military power"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         civ = self.civ_manager.get_civilization(user_id)
         
         if not civ:
@@ -166,7 +179,7 @@ class HyperItemCommands(commands.Cog):
             await ctx.send("💀 **MUTUAL DESTRUCTION**\nUsage: `.sacrifice @user`\nRequires: Sacrifice HyperItem\n⚠️ COMPLETELY DESTROYS BOTH CIVILIZATIONS!")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Sacrifice"):
             await ctx.send("❌ You need a **Sacrifice** HyperItem to use this command!")
@@ -178,11 +191,8 @@ class HyperItemCommands(commands.Cog):
             return
             
         # Parse target
-        if target.startswith('<@') and target.endswith('>'):
-            target_id = target[2:-1]
-            if target_id.startswith('!'):
-                target_id = target_id[1:]
-        else:
+        target_id = validate_user_mention(target)
+        if not target_id:
             await ctx.send("❌ Please mention a valid user to sacrifice with!")
             return
             
@@ -201,19 +211,12 @@ class HyperItemCommands(commands.Cog):
             await self._reflect_with_mirror(ctx, target_id, target_civ, civ, "mutual destruction sacrifice")
             # If reflected, the original attacker gets destroyed alone
             try:
-                conn = self.db.get_connection()
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM civilizations WHERE user_id = ?', (user_id,))
-                conn.commit()
+                self.db.remove_civilizations(user_id)
                 
                 await ctx.send("💀 **SACRIFICE REFLECTED!** You were destroyed by your own reflected sacrifice!")
                 
                 # Notify attacker
-                try:
-                    attacker_user = await self.bot.fetch_user(int(user_id))
-                    await attacker_user.send("💀 **SACRIFICE REFLECTED!** Your mutual destruction attempt was reflected back at you by a Mirror! Your civilization has been destroyed.")
-                except:
-                    pass
+                self._notify_user(user_id, "💀 **SACRIFICE REFLECTED!** Your mutual destruction attempt was reflected back at you by a Mirror! Your civilization has been destroyed.")
                     
             except Exception as e:
                 logger.error(f"Error in reflected sacrifice: {e}")
@@ -255,12 +258,8 @@ class HyperItemCommands(commands.Cog):
         
         # DESTROY BOTH CIVILIZATIONS
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
             # Delete both civilizations
-            cursor.execute('DELETE FROM civilizations WHERE user_id IN (?, ?)', (user_id, target_id))
-            conn.commit()
+            self.db.remove_civilizations(user_id, target_id)
             
             # Global announcement
             await self._announce_global_attack(ctx, civ['name'], target_civ['name'], "Mutual Destruction Sacrifice")
@@ -286,17 +285,9 @@ class HyperItemCommands(commands.Cog):
             await ctx.send(embed=embed)
             
             # Notify both players
-            try:
-                target_user = await self.bot.fetch_user(int(target_id))
-                await target_user.send(f"💀 **MUTUAL DESTRUCTION!** Your civilization has been completely destroyed in a mutual sacrifice with {civ['name']}! Use `.start <name>` to begin anew.")
-            except:
-                pass
+            self._notify_user(target_id, f"💀 **MUTUAL DESTRUCTION!** Your civilization has been completely destroyed in a mutual sacrifice with {civ['name']}! Use `.start <name>` to begin anew.")
                 
-            try:
-                user = await self.bot.fetch_user(int(user_id))
-                await user.send(f"💀 **SACRIFICE COMPLETE!** You have destroyed both your civilization and {target_civ['name']} in mutual destruction. Use `.start <name>` to begin anew.")
-            except:
-                pass
+            self._notify_user(user_id, f"💀 **SACRIFICE COMPLETE!** You have destroyed both your civilization and {target_civ['name']} in mutual destruction. Use `.start <name>` to begin anew.")
                 
             # Log the mutual destruction
             self.db.log_event(user_id, "mutual_destruction", "Mutual Destruction", f"Destroyed both {civ['name']} and {target_civ['name']}")
@@ -308,7 +299,7 @@ class HyperItemCommands(commands.Cog):
     @commands.command(name='mirror')
     async def mirror_status(self, ctx):
         """Display Mirror status - reflects ANY attack back to attacker"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Mirror"):
             await ctx.send("❌ You don't have a **Mirror** HyperItem!")
@@ -350,7 +341,7 @@ class HyperItemCommands(commands.Cog):
             await ctx.send("☢️ **Nuclear Strike**\nUsage: `.nuke @user`\nRequires: Nuclear Warhead HyperItem\n⚠️ Causes massive destruction!")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Nuclear Warhead"):
             await ctx.send("❌ You need a **Nuclear Warhead** HyperItem to use this command!")
@@ -362,11 +353,8 @@ class HyperItemCommands(commands.Cog):
             return
             
         # Parse target
-        if target.startswith('<@') and target.endswith('>'):
-            target_id = target[2:-1]
-            if target_id.startswith('!'):
-                target_id = target_id[1:]
-        else:
+        target_id = validate_user_mention(target)
+        if not target_id:
             await ctx.send("❌ Please mention a valid user to nuke!")
             return
             
@@ -479,27 +467,25 @@ class HyperItemCommands(commands.Cog):
             await ctx.send("💥 **Total Obliteration**\nUsage: `.obliterate @user`\nRequires: HyperLaser HyperItem\n⚠️ COMPLETELY DESTROYS target civilization!")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "HyperLaser"):
             await ctx.send("❌ You need a **HyperLaser** HyperItem to use this command!")
             return
             
         # Parse target
-        if target.startswith('<@') and target.endswith('>'):
-            target_id = target[2:-1]
-            if target_id.startswith('!'):
-                target_id = target_id[1:]
-        else:
+        target_id = validate_user_mention(target)
+        if not target_id:
             await ctx.send("❌ Please mention a valid user to obliterate!")
             return
             
-        target_civ = self.civ_manager.get_civilization(target_id)
+        civs = self.civ_manager.get_civilizations([user_id, target_id])
+        target_civ = civs.get(target_id)
         if not target_civ:
             await ctx.send("❌ Target user doesn't have a civilization!")
             return
             
-        civ = self.civ_manager.get_civilization(user_id)
+        civ = civs.get(user_id)
         
         # Check defenses in order: Mirror first, then Shield
         defense = self._check_defenses(target_id, "HyperLaser obliteration")
@@ -507,18 +493,11 @@ class HyperItemCommands(commands.Cog):
             await self._reflect_with_mirror(ctx, target_id, target_civ, civ, "HyperLaser obliteration")
             # After reflection, the original attacker gets obliterated
             try:
-                conn = self.db.get_connection()
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM civilizations WHERE user_id = ?', (user_id,))
-                conn.commit()
+                self.db.remove_civilizations(user_id)
                 
                 await ctx.send("💥 **OBLITERATION REFLECTED!** You were destroyed by your own reflected HyperLaser!")
                 
-                try:
-                    attacker_user = await self.bot.fetch_user(int(user_id))
-                    await attacker_user.send("💥 **OBLITERATION REFLECTED!** Your HyperLaser was reflected back at you by a Mirror! Your civilization has been destroyed.")
-                except:
-                    pass
+                self._notify_user(user_id, "💥 **OBLITERATION REFLECTED!** Your HyperLaser was reflected back at you by a Mirror! Your civilization has been destroyed.")
                     
             except Exception as e:
                 logger.error(f"Error in reflected obliteration: {e}")
@@ -533,10 +512,7 @@ class HyperItemCommands(commands.Cog):
         
         # TOTAL DESTRUCTION - delete the civilization
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM civilizations WHERE user_id = ?', (target_id,))
-            conn.commit()
+            self.db.remove_civilizations(target_id)
             
             # Global announcement
             await self._announce_global_attack(ctx, civ['name'], target_civ['name'], "HyperLaser Obliteration")
@@ -558,11 +534,7 @@ class HyperItemCommands(commands.Cog):
             await ctx.send(embed=embed)
             
             # Notify target
-            try:
-                target_user = await self.bot.fetch_user(int(target_id))
-                await target_user.send(f"💥 **CIVILIZATION OBLITERATED!** Your civilization has been completely destroyed by {civ['name']}'s HyperLaser! Use `.start <name>` to begin anew.")
-            except:
-                pass
+            self._notify_user(target_id, f"💥 **CIVILIZATION OBLITERATED!** Your civilization has been completely destroyed by {civ['name']}'s HyperLaser! Use `.start <name>` to begin anew.")
                 
             # Log the obliteration
             self.db.log_event(user_id, "obliteration", "Civilization Obliterated", f"Completely destroyed {target_civ['name']} with HyperLaser")
@@ -574,7 +546,7 @@ class HyperItemCommands(commands.Cog):
     @commands.command(name='shield')
     async def activate_shield(self, ctx):
         """Display Anti-Nuke Shield status - now protects against EVERYTHING"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Anti-Nuke Shield"):
             await ctx.send("❌ You don't have an **Anti-Nuke Shield** HyperItem!")
@@ -606,7 +578,7 @@ class HyperItemCommands(commands.Cog):
     @check_cooldown_decorator(minutes=60)
     async def lucky_strike(self, ctx):
         """Use Lucky Charm for guaranteed critical success on next action"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Lucky Charm"):
             await ctx.send("❌ You need a **Lucky Charm** HyperItem to use this command!")
@@ -645,27 +617,25 @@ class HyperItemCommands(commands.Cog):
             await ctx.send("📢 **Propaganda Campaign**\nUsage: `.propaganda @user`\nRequires: Propaganda Kit HyperItem")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Propaganda Kit"):
             await ctx.send("❌ You need a **Propaganda Kit** HyperItem to use this command!")
             return
             
         # Parse target
-        if target.startswith('<@') and target.endswith('>'):
-            target_id = target[2:-1]
-            if target_id.startswith('!'):
-                target_id = target_id[1:]
-        else:
+        target_id = validate_user_mention(target)
+        if not target_id:
             await ctx.send("❌ Please mention a valid user to target!")
             return
             
-        target_civ = self.civ_manager.get_civilization(target_id)
+        civs = self.civ_manager.get_civilizations([user_id, target_id])
+        target_civ = civs.get(target_id)
         if not target_civ:
             await ctx.send("❌ Target user doesn't have a civilization!")
             return
             
-        civ = self.civ_manager.get_civilization(user_id)
+        civ = civs.get(user_id)
         
         # Check defenses in order: Mirror first, then Shield
         defense = self._check_defenses(target_id, "propaganda campaign")
@@ -721,17 +691,13 @@ class HyperItemCommands(commands.Cog):
         await ctx.send(embed=embed)
         
         # Notify target
-        try:
-            target_user = await self.bot.fetch_user(int(target_id))
-            await target_user.send(f"📢 **Propaganda Attack!** {civ['name']} has convinced {soldiers_stolen} of your soldiers to defect!")
-        except:
-            pass
+        self._notify_user(target_id, f"📢 **Propaganda Attack!** {civ['name']} has convinced {soldiers_stolen} of your soldiers to defect!")
 
     @commands.command(name='hiremercs')
     @check_cooldown_decorator(minutes=10)
     async def hire_mercenaries(self, ctx):
         """Use Mercenary Contract to instantly hire professional soldiers"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Mercenary Contract"):
             await ctx.send("❌ You need a **Mercenary Contract** HyperItem to use this command!")
@@ -771,7 +737,7 @@ class HyperItemCommands(commands.Cog):
     @check_cooldown_decorator(minutes=5)
     async def boost_technology(self, ctx):
         """Use Ancient Scroll to instantly advance technology"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Ancient Scroll"):
             await ctx.send("❌ You need an **Ancient Scroll** HyperItem to use this command!")
@@ -810,7 +776,7 @@ class HyperItemCommands(commands.Cog):
     @check_cooldown_decorator(minutes=10)
     async def mint_gold(self, ctx):
         """Use Gold Mint to generate large amounts of gold"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Gold Mint"):
             await ctx.send("❌ You need a **Gold Mint** HyperItem to use this command!")
@@ -848,7 +814,7 @@ class HyperItemCommands(commands.Cog):
     @check_cooldown_decorator(minutes=10)
     async def super_harvest(self, ctx):
         """Use Harvest Engine for massive food production"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Harvest Engine"):
             await ctx.send("❌ You need a **Harvest Engine** HyperItem to use this command!")
@@ -897,27 +863,25 @@ class HyperItemCommands(commands.Cog):
             await ctx.send("🕵️ **Elite Spy Mission**\nUsage: `.superspy @user`\nRequires: Spy Network HyperItem\nHigh-success elite espionage operation")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Spy Network"):
             await ctx.send("❌ You need a **Spy Network** HyperItem to use this command!")
             return
             
         # Parse target
-        if target.startswith('<@') and target.endswith('>'):
-            target_id = target[2:-1]
-            if target_id.startswith('!'):
-                target_id = target_id[1:]
-        else:
+        target_id = validate_user_mention(target)
+        if not target_id:
             await ctx.send("❌ Please mention a valid user to spy on!")
             return
             
-        target_civ = self.civ_manager.get_civilization(target_id)
+        civs = self.civ_manager.get_civilizations([user_id, target_id])
+        target_civ = civs.get(target_id)
         if not target_civ:
             await ctx.send("❌ Target user doesn't have a civilization!")
             return
             
-        civ = self.civ_manager.get_civilization(user_id)
+        civ = civs.get(user_id)
         
         # Check defenses in order: Mirror first, then Shield
         defense = self._check_defenses(target_id, "super spy mission")
@@ -941,13 +905,14 @@ class HyperItemCommands(commands.Cog):
         # Consume Spy Network
         self.civ_manager.use_hyper_item(user_id, "Spy Network")
         
-        # Elite spy mission with 90% success rate
-        if random.random() < 0.9:
+        # Elite spy mission with 90% success rate, 70% tech theft, 50% sabotage
+        success, (steal_tech, sabotage) = covert_operation_roll(0.9, 0.7, 0.5)
+        if success:
             # Multi-effect spy mission
             effects = []
             
             # Steal intelligence (tech)
-            if random.random() < 0.7:
+            if steal_tech:
                 tech_stolen = 1
                 self.civ_manager.update_military(user_id, {"tech_level": tech_stolen})
                 self.civ_manager.update_military(target_id, {"tech_level": -tech_stolen})
@@ -961,7 +926,7 @@ class HyperItemCommands(commands.Cog):
                 effects.append(f"🪙 Stole {format_number(stolen_gold)} gold")
                 
             # Sabotage military
-            if random.random() < 0.5:
+            if sabotage:
                 soldiers_sabotaged = int(target_civ['military']['soldiers'] * random.uniform(0.05, 0.15))
                 self.civ_manager.update_military(target_id, {"soldiers": -soldiers_sabotaged})
                 effects.append(f"⚔️ Sabotaged {format_number(soldiers_sabotaged)} enemy soldiers")
@@ -969,12 +934,13 @@ class HyperItemCommands(commands.Cog):
             embed = create_embed(
                 "🕵️ Elite Spy Mission Success!",
                 f"**{civ['name']}**'s elite operatives have infiltrated **{target_civ['name']}**!",
-                guilded.Color.dark_blue()
+                guilded.Color.dark_blue(),
+                fields=(
+                    {"name": "Mission Results", "value": "\n".join(effects), "inline": False},
+                    SUPERSPY_SUCCESS_FIELD,
+                )
             )
             
-            embed.add_field(name="Mission Results", value="\n".join(effects), inline=False)
-            embed.add_field(name="Network Status", value="Spy Network consumed - mission complete", inline=False)
-            
             await ctx.send(embed=embed)
             
         else:
@@ -982,9 +948,9 @@ class HyperItemCommands(commands.Cog):
             embed = create_embed(
                 "🕵️ Mission Compromised!",
                 f"Elite spy mission against **{target_civ['name']}** was detected!",
-                guilded.Color.red()
+                guilded.Color.red(),
+                fields=(SUPERSPY_FAILED_FIELD,)
             )
-            embed.add_field(name="Result", value="Spy Network consumed but no intelligence gathered", inline=False)
             
             await ctx.send(embed=embed)
 
@@ -992,7 +958,7 @@ class HyperItemCommands(commands.Cog):
     @check_cooldown_decorator(minutes=5)  # 5 hour cooldown
     async def mega_invention(self, ctx):
         """Use Tech Core to advance multiple technology levels"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Tech Core"):
             await ctx.send("❌ You need a **Tech Core** HyperItem to use this command!")
@@ -1035,27 +1001,25 @@ class HyperItemCommands(commands.Cog):
             await ctx.send("🗡️ **Assassination Attempt**\nUsage: `.backstab @user`\nRequires: Dagger HyperItem\nRisky but potentially devastating attack")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Dagger"):
             await ctx.send("❌ You need a **Dagger** HyperItem to use this command!")
             return
             
         # Parse target
-        if target.startswith('<@') and target.endswith('>'):
-            target_id = target[2:-1]
-            if target_id.startswith('!'):
-                target_id = target_id[1:]
-        else:
+        target_id = validate_user_mention(target)
+        if not target_id:
             await ctx.send("❌ Please mention a valid user to target!")
             return
             
-        target_civ = self.civ_manager.get_civilization(target_id)
+        civs = self.civ_manager.get_civilizations([user_id, target_id])
+        target_civ = civs.get(target_id)
         if not target_civ:
             await ctx.send("❌ Target user doesn't have a civilization!")
             return
             
-        civ = self.civ_manager.get_civilization(user_id)
+        civ = civs.get(user_id)
         
         # Check defenses in order: Mirror first, then Shield
         defense = self._check_defenses(target_id, "assassination attempt")
@@ -1082,7 +1046,8 @@ class HyperItemCommands(commands.Cog):
         self.civ_manager.use_hyper_item(user_id, "Dagger")
         
         # 60% success rate for assassination
-        if random.random() < 0.6:
+        success, _ = covert_operation_roll(0.6)
+        if success:
             # Successful assassination - major damage
             leadership_crisis = {
                 "happiness": -30,
@@ -1126,11 +1091,7 @@ class HyperItemCommands(commands.Cog):
             await ctx.send(embed=embed)
             
             # Notify target of attempt
-            try:
-                target_user = await self.bot.fetch_user(int(target_id))
-                await target_user.send(f"🗡️ **Assassination Attempt!** {civ['name']} tried to assassinate your leaders but failed!")
-            except:
-                pass
+            self._notify_user(target_id, f"🗡️ **Assassination Attempt!** {civ['name']} tried to assassinate your leaders but failed!")
 
     @commands.command(name='bomb')
     @check_cooldown_decorator(minutes=1)
@@ -1140,27 +1101,25 @@ class HyperItemCommands(commands.Cog):
             await ctx.send("🚀 **Missile Strike**\nUsage: `.bomb @user`\nRequires: Missiles HyperItem\nPowerful military attack between conventional and nuclear")
             return
             
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         
         if not self._has_hyperitem(user_id, "Missiles"):
             await ctx.send("❌ You need **Missiles** HyperItem to use this command!")
             return
             
         # Parse target
-        if target.startswith('<@') and target.endswith('>'):
-            target_id = target[2:-1]
-            if target_id.startswith('!'):
-                target_id = target_id[1:]
-        else:
+        target_id = validate_user_mention(target)
+        if not target_id:
             await ctx.send("❌ Please mention a valid user to bomb!")
             return
             
-        target_civ = self.civ_manager.get_civilization(target_id)
+        civs = self.civ_manager.get_civilizations([user_id, target_id])
+        target_civ = civs.get(target_id)
         if not target_civ:
             await ctx.send("❌ Target user doesn't have a civilization!")
             return
             
-        civ = self.civ_manager.get_civilization(user_id)
+        civ = civs.get(user_id)
         
         # Check defenses in order: Mirror first, then Shield
         defense = self._check_defenses(target_id, "missile strike")
@@ -1230,11 +1189,7 @@ class HyperItemCommands(commands.Cog):
         await ctx.send(embed=embed)
         
         # Notify target
-        try:
-            target_user = await self.bot.fetch_user(int(target_id))
-            await target_user.send(f"🚀 **Missile Attack!** Your civilization has been bombed by {civ['name']}!")
-        except:
-            pass
+        self._notify_user(target_id, f"🚀 **Missile Attack!** Your civilization has been bombed by {civ['name']}!")
 
 def setup(bot):
     bot.add_cog(HyperItemCommands(bot))
\ No newline at end of file
@@ -2,21 +2,124 @@ import random
 import re
 import logging
 from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import NamedTuple
 
 import guilded
 from guilded.ext import commands
 
-from bot.utils import format_number, create_embed
+from bot.utils import format_number, create_embed, get_user_id, validate_user_mention
 
 logger = logging.getLogger(__name__)
 
+# Fallback pattern for pulling a user ID token out of free-form input
+USER_ID_TOKEN_RE = re.compile(r'[A-Za-z0-9]{6,}')
+
+@lru_cache(maxsize=4096)
+def extract_user_id(input_str: str):
+    """
+    Extract user ID from a mention string like <@id> (or <@!id>) or return
+    the input if it looks like an ID (alphanumeric, length >= 6).
+    Returns None if extraction fails.
+    """
+    if not input_str:
+        return None
+
+    # If it's a mention like <@ac5egiu8e> or <@!ac5egiu8e>
+    inner = (validate_user_mention(input_str) or '').strip()
+    if inner:
+        return inner
+
+    # If it's a raw ID (alphanumeric)
+    if input_str.isalnum() and len(input_str) >= 6:
+        return input_str
+
+    # Try to find an alphanumeric token inside the string (fallback)
+    m = USER_ID_TOKEN_RE.search(input_str)
+    if m:
+        return m.group(0)
+
+    return None
+
+@lru_cache(maxsize=4096)
+def military_strength(soldiers, spies, tech_level, land_size, defense_strength):
+    """Deterministic strength core; repeat raids between the same armies hit the cache"""
+    base_strength = soldiers * 10 + spies * 5
+    tech_bonus = tech_level * 50
+    territory_bonus = land_size / 100
+    defense_bonus = defense_strength / 100
+
+    return (base_strength + tech_bonus + territory_bonus) * (1 + defense_bonus)
+
+class BattleResult(NamedTuple):
+    """Outcome of a battle; margin is the winner's strength over the loser's"""
+    attacker_won: bool
+    margin: float
+
+def resolve_battle(attacker_strength, defender_strength, attacker_roll, defender_roll) -> BattleResult:
+    """Pure battle arithmetic; conditionals instead of min/max keep it free of builtin calls"""
+    final_attacker_strength = attacker_strength * attacker_roll
+    final_defender_strength = defender_strength * defender_roll
+
+    if final_attacker_strength > final_defender_strength:
+        return BattleResult(True, final_attacker_strength / (final_defender_strength if final_defender_strength > 1 else 1))
+    return BattleResult(False, final_defender_strength / (final_attacker_strength if final_attacker_strength > 1 else 1))
+
+class BattleLosses(NamedTuple):
+    """Soldiers each side loses in a battle"""
+    attacker_losses: int
+    defender_losses: int
+
+def battle_losses(attacker_won, margin, attacker_soldiers, defender_soldiers) -> BattleLosses:
+    """Roll each side's losses, capped by the soldiers it actually has"""
+    if attacker_won:
+        attacker_losses = random.randint(2, 8)
+        if attacker_losses > attacker_soldiers:
+            attacker_losses = attacker_soldiers
+        defender_losses = int(attacker_losses * margin)
+    else:
+        attacker_losses = int(random.randint(5, 15) * margin)
+        if attacker_losses > attacker_soldiers:
+            attacker_losses = attacker_soldiers
+        defender_losses = random.randint(2, 5)
+    if defender_losses > defender_soldiers:
+        defender_losses = defender_soldiers
+    return BattleLosses(attacker_losses, defender_losses)
+
+def spy_success_chance(attacker_military, defender_military, attacker_ideology, defender_ideology):
+    """Chance that a stealth operation succeeds, usable for any number of targets"""
+    attacker_spy_power = attacker_military['spies'] * attacker_military['tech_level']
+    defender_spy_power = defender_military['spies'] * defender_military['tech_level']
+
+    # Base success chance
+    success_chance = 0.6 + (attacker_spy_power - defender_spy_power) / 100
+    if success_chance > 0.9:
+        success_chance = 0.9
+    elif success_chance < 0.2:
+        success_chance = 0.2
+
+    # Apply ideology modifiers
+    if attacker_ideology == 'anarchy':
+        success_chance *= 0.8  # Anarchy penalty to spy success
+    elif attacker_ideology == 'destruction':
+        success_chance *= 1.2  # Destruction bonus to spy success
+        if random.random() < 0.1:  # 10% chance for extra destruction
+            success_chance += 0.15
+
+    if defender_ideology == 'fascism':
+        success_chance *= 0.9  # Fascist states are harder to infiltrate
+    elif defender_ideology == 'pacifist':
+        success_chance *= 1.1  # Pacifist states are easier to infiltrate
+
+    return success_chance
+
 # Simple in-memory cooldown decorator
 def cooldown(seconds=60):
     def decorator(func):
         cooldowns = {}
         
         async def wrapper(self, ctx, *args, **kwargs):
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             now = datetime.utcnow()
             
             # Check if user is on cooldown
@@ -117,34 +220,6 @@ class MilitaryCommands(commands.Cog):
             logger.error(f"Error checking civil war for {user_id}: {e}")
             return True
 
-    def _extract_user_id(self, input_str: str) -> str:
-        """
-        Extract user ID from a mention string like <@id> (or <@!id>) or return
-        the input if it looks like an ID (alphanumeric, length >= 6).
-        Returns None if extraction fails.
-        """
-        if not input_str:
-            return None
-
-        # If it's a mention like <@ac5egiu8e> or <@!ac5egiu8e>
-        if input_str.startswith('<@') and input_str.endswith('>'):
-            inner = input_str[2:-1]
-            inner = inner.lstrip('!')  # handle possible ! form
-            inner = inner.strip()
-            if inner:
-                return inner
-
-        # If it's a raw ID (alphanumeric)
-        if input_str.isalnum() and len(input_str) >= 6:
-            return input_str
-
-        # Try to find an alphanumeric token inside the string (fallback)
-        m = re.search(r'[A-Za-z0-9]{6,}', input_str)
-        if m:
-            return m.group(0)
-
-        return None
-
     async def _get_member_from_mention(self, ctx, mention: str):
         """
         Robustly resolve a mention string (or usage where user typed/displayed name)
@@ -157,15 +232,18 @@ class MilitaryCommands(commands.Cog):
         if hasattr(mention, "id") and hasattr(mention, "display_name"):
             return mention
 
+        # Parsed once; both the mention match and the ID fetch below use it
+        user_id = extract_user_id(mention)
+
         # 1) Use ctx.mentions if present (this is the most reliable)
         try:
             mentions = getattr(ctx, "mentions", None)
             if mentions:
                 # If mention string contains an ID, try to match that exact mention in ctx.mentions
-                user_id = self._extract_user_id(mention)
                 if user_id:
+                    wanted = user_id.lower()
                     for m in mentions:
-                        if str(getattr(m, "id", "")).lower() == user_id.lower():
+                        if str(getattr(m, "id", "")).lower() == wanted:
                             return m
                 # Otherwise return the first mentioned member
                 return mentions[0]
@@ -181,8 +259,7 @@ class MilitaryCommands(commands.Cog):
         except Exception:
             pass
 
-        # 3) Try extracting an ID and fetching by it
-        user_id = self._extract_user_id(mention)
+        # 3) Try fetching by the extracted ID
         if user_id:
             try:
                 member = await ctx.guild.fetch_member(user_id)
@@ -207,6 +284,26 @@ class MilitaryCommands(commands.Cog):
 
         return None
 
+    async def _resolve_target(self, ctx, user_id: str, target_mention: str,
+                              self_target_error: str = "❌ You cannot target yourself!"):
+        """Resolve a mentioned rival and their civilization, replying with the reason on failure"""
+        target = await self._get_member_from_mention(ctx, target_mention)
+        if not target:
+            await ctx.send("❌ Could not find that user. Make sure you're mentioning a valid user in this server.")
+            return None
+
+        target_id = str(target.id)
+        if target_id == user_id:
+            await ctx.send(self_target_error)
+            return None
+
+        target_civ = self.civ_manager.get_civilization(target_id)
+        if not target_civ:
+            await ctx.send("❌ Target user doesn't have a civilization!")
+            return None
+
+        return target, target_id, target_civ
+
     def _check_cooldown(self, user_id: str, command: str, seconds: int) -> bool:
         """Check if user is on cooldown for a command"""
         key = f"{user_id}_{command}"
@@ -234,7 +331,7 @@ class MilitaryCommands(commands.Cog):
     async def train_soldiers(self, ctx, unit_type: str = None, amount: int = None):
         """Train military units (2min cooldown)"""
         try:
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check cooldown
             if not self._check_cooldown(user_id, 'train', 120):  # 2 minutes
@@ -342,7 +439,7 @@ class MilitaryCommands(commands.Cog):
                 await ctx.send("⚔️ **Declaration of War**\nUsage: `.declare @user`\nNote: War must be declared before attacking!")
                 return
 
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check for civil war first
             if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -355,21 +452,10 @@ class MilitaryCommands(commands.Cog):
                 return
 
             # Try to resolve the member from the argument / message mentions
-            target = await self._get_member_from_mention(ctx, target_mention)
-            if not target:
-                await ctx.send("❌ Could not find that user. Make sure you're mentioning a valid user in this server.")
-                return
-
-            target_id = str(target.id)
-
-            if target_id == user_id:
-                await ctx.send("❌ You cannot declare war on yourself!")
-                return
-
-            target_civ = self.civ_manager.get_civilization(target_id)
-            if not target_civ:
-                await ctx.send("❌ Target user doesn't have a civilization!")
+            resolved = await self._resolve_target(ctx, user_id, target_mention, "❌ You cannot declare war on yourself!")
+            if not resolved:
                 return
+            target, target_id, target_civ = resolved
 
             # Check if war is already ongoing
             with self.db.get_connection() as conn:
@@ -417,7 +503,7 @@ class MilitaryCommands(commands.Cog):
     async def attack_civilization(self, ctx, target_mention: str = None):
         """Launch a direct attack on another civilization (3min cooldown)"""
         try:
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check cooldown
             if not self._check_cooldown(user_id, 'attack', 180):  # 3 minutes
@@ -446,21 +532,10 @@ class MilitaryCommands(commands.Cog):
                 return
 
             # Resolve target
-            target = await self._get_member_from_mention(ctx, target_mention)
-            if not target:
-                await ctx.send("❌ Could not find that user. Make sure you're mentioning a valid user in this server.")
-                return
-
-            target_id = str(target.id)
-
-            if target_id == user_id:
-                await ctx.send("❌ You cannot attack yourself!")
-                return
-
-            target_civ = self.civ_manager.get_civilization(target_id)
-            if not target_civ:
-                await ctx.send("❌ Target user doesn't have a civilization!")
+            resolved = await self._resolve_target(ctx, user_id, target_mention, "❌ You cannot attack yourself!")
+            if not resolved:
                 return
+            target, target_id, target_civ = resolved
 
             # Check if war declared
             with self.db.get_connection() as conn:
@@ -485,21 +560,23 @@ class MilitaryCommands(commands.Cog):
             defender_roll = random.uniform(0.8, 1.2)
 
             # Apply ideology modifiers
-            if civ.get('ideology') == 'fascism':
+            attacker_ideology = civ.get('ideology')
+            defender_ideology = target_civ.get('ideology')
+            if attacker_ideology == 'fascism':
                 attacker_roll *= 1.1  # Military bonus
-            if target_civ.get('ideology') == 'fascism':
+            if defender_ideology == 'fascism':
                 defender_roll *= 1.1
 
             # Destruction and pacifist ideology effects
-            if civ.get('ideology') == 'destruction':
+            if attacker_ideology == 'destruction':
                 attacker_roll *= 1.15  # More aggressive
                 defender_roll *= 0.9   # Less defensive
-            if target_civ.get('ideology') == 'pacifist':
+            if defender_ideology == 'pacifist':
                 defender_roll *= 0.85  # Pacifists are worse at defense
 
             # UNDERDOG VICTORY SYSTEM
             # If defender is significantly weaker, give them a chance for an upset victory
-            strength_ratio = defender_strength / max(1, attacker_strength)
+            strength_ratio = defender_strength / (attacker_strength if attacker_strength > 1 else 1)
             if strength_ratio < 0.5:  # Defender is less than half as strong
                 underdog_bonus = (0.5 - strength_ratio) * 0.8  # Up to 40% bonus for extreme underdogs
                 defender_roll *= (1 + underdog_bonus)
@@ -509,16 +586,12 @@ class MilitaryCommands(commands.Cog):
                     defender_roll *= 1.5  # Massive bonus
                     await ctx.send("🎯 **UNDERDOG SPIRIT!** The defenders fight with incredible determination against overwhelming odds!")
 
-            final_attacker_strength = attacker_strength * attacker_roll
-            final_defender_strength = defender_strength * defender_roll
-
             # Determine outcome
-            if final_attacker_strength > final_defender_strength:
-                victory_margin = final_attacker_strength / max(1, final_defender_strength)
-                await self._process_attack_victory(ctx, user_id, target_id, civ, target_civ, victory_margin)
+            result = resolve_battle(attacker_strength, defender_strength, attacker_roll, defender_roll)
+            if result.attacker_won:
+                await self._process_attack_victory(ctx, user_id, target_id, civ, target_civ, result.margin)
             else:
-                defeat_margin = final_defender_strength / max(1, final_attacker_strength)
-                await self._process_attack_defeat(ctx, user_id, target_id, civ, target_civ, defeat_margin)
+                await self._process_attack_defeat(ctx, user_id, target_id, civ, target_civ, result.margin)
 
         except Exception as e:
             logger.error(f"Error in attack command: {e}", exc_info=True)
@@ -526,30 +599,41 @@ class MilitaryCommands(commands.Cog):
     async def _process_attack_victory(self, ctx, attacker_id, defender_id, attacker_civ, defender_civ, margin):
         """Process successful attack"""
         try:
-            attacker_losses = min(random.randint(2, 8), attacker_civ['military']['soldiers'])
-            defender_losses = min(int(attacker_losses * margin), defender_civ['military']['soldiers'])
+            attacker_losses, defender_losses = battle_losses(
+                True, margin, attacker_civ['military']['soldiers'], defender_civ['military']['soldiers'])
 
             # Resource spoils
             spoils = {
-                "gold": min(int(defender_civ['resources']['gold'] * 0.15), defender_civ['resources']['gold']),
-                "food": min(int(defender_civ['resources']['food'] * 0.10), defender_civ['resources']['food']),
-                "stone": min(int(defender_civ['resources']['stone'] * 0.10), defender_civ['resources']['stone']),
-                "wood": min(int(defender_civ['resources']['wood'] * 0.10), defender_civ['resources']['wood'])
+                "gold": int(defender_civ['resources']['gold'] * 0.15),
+                "food": int(defender_civ['resources']['food'] * 0.10),
+                "stone": int(defender_civ['resources']['stone'] * 0.10),
+                "wood": int(defender_civ['resources']['wood'] * 0.10)
             }
 
             # Territory gain
-            territory_gained = min(int(defender_civ['territory']['land_size'] * 0.05), defender_civ['territory']['land_size'])
+            territory_gained = int(defender_civ['territory']['land_size'] * 0.05)
 
-            # Apply changes
-            self.civ_manager.update_military(attacker_id, {"soldiers": -attacker_losses})
-            self.civ_manager.update_military(defender_id, {"soldiers": -defender_losses})
+            # Destruction ideology bonus
+            destruction_bonus = attacker_civ.get('ideology') == 'destruction'
+            extra_damage = int(defender_civ['resources']['gold'] * 0.05) if destruction_bonus else 0
 
-            self.civ_manager.update_resources(attacker_id, spoils)
+            # Apply changes and log the victory in a single commit, one write per side
             negative_spoils = {res: -amt for res, amt in spoils.items()}
-            self.civ_manager.update_resources(defender_id, negative_spoils)
-
-            self.civ_manager.update_territory(attacker_id, {"land_size": territory_gained})
-            self.civ_manager.update_territory(defender_id, {"land_size": -territory_gained})
+            negative_spoils["gold"] -= extra_damage
+            with self.db.transaction():
+                self.civ_manager.update_stats(attacker_id, {
+                    "military": {"soldiers": -attacker_losses},
+                    "resources": spoils,
+                    "territory": {"land_size": territory_gained}
+                })
+                self.civ_manager.update_stats(defender_id, {
+                    "military": {"soldiers": -defender_losses},
+                    "resources": negative_spoils,
+                    "territory": {"land_size": -territory_gained}
+                })
+
+                self.db.log_event(attacker_id, "victory", "Battle Victory", f"Defeated {defender_civ['name']} in battle!")
+                self.db.log_event(defender_id, "defeat", "Battle Defeat", f"Defeated by {attacker_civ['name']} in battle.")
 
             # Create victory embed
             embed = create_embed(
@@ -567,20 +651,13 @@ class MilitaryCommands(commands.Cog):
             embed.add_field(name="Spoils of War", value=spoils_text or "None", inline=True)
             embed.add_field(name="Territory Gained", value=f"🏞️ {format_number(territory_gained)} km²", inline=True)
 
-            # Destruction ideology bonus
-            if attacker_civ.get('ideology') == 'destruction':
-                extra_damage = min(int(defender_civ['resources']['gold'] * 0.05), defender_civ['resources']['gold'])
-                self.civ_manager.update_resources(defender_id, {"gold": -extra_damage})
+            if destruction_bonus:
                 embed.add_field(name="Destruction Bonus",
                                 value=f"Your destructive forces caused extra damage! (-{format_number(extra_damage)} enemy gold)",
                                 inline=False)
 
             await ctx.send(embed=embed)
 
-            # Log the victory
-            self.db.log_event(attacker_id, "victory", "Battle Victory", f"Defeated {defender_civ['name']} in battle!")
-            self.db.log_event(defender_id, "defeat", "Battle Defeat", f"Defeated by {attacker_civ['name']} in battle.")
-
             # Try to mention the defender
             try:
                 member = None
@@ -601,28 +678,36 @@ class MilitaryCommands(commands.Cog):
     async def _process_attack_defeat(self, ctx, attacker_id, defender_id, attacker_civ, defender_civ, margin):
         """Process failed attack"""
         try:
-            attacker_losses = min(int(random.randint(5, 15) * margin), attacker_civ['military']['soldiers'])
-            defender_losses = min(random.randint(2, 5), defender_civ['military']['soldiers'])
-
-            # Apply losses
-            self.civ_manager.update_military(attacker_id, {"soldiers": -attacker_losses})
-            self.civ_manager.update_military(defender_id, {"soldiers": -defender_losses})
+            attacker_soldiers = attacker_civ['military']['soldiers']
+            defender_soldiers = defender_civ['military']['soldiers']
+            attacker_losses, defender_losses = battle_losses(False, margin, attacker_soldiers, defender_soldiers)
 
             # UNDERDOG VICTORY BONUSES FOR DEFENDER
-            strength_ratio = defender_civ['military']['soldiers'] / max(1, attacker_civ['military']['soldiers'])
-            if strength_ratio < 0.5:
-                # Underdog gets bonus rewards
-                bonus_gold = min(int(attacker_civ['resources']['gold'] * 0.1), attacker_civ['resources']['gold'])
-                bonus_morale = 20
-                
-                self.civ_manager.update_resources(defender_id, {"gold": bonus_gold})
-                self.civ_manager.update_population(defender_id, {"happiness": bonus_morale})
-                
+            strength_ratio = defender_soldiers / (attacker_soldiers if attacker_soldiers > 1 else 1)
+            underdog_victory = strength_ratio < 0.5
+            # Underdog gets bonus rewards
+            bonus_gold = int(attacker_civ['resources']['gold'] * 0.1)
+            bonus_morale = 20
+
+            # Apply losses, bonuses and the battle log in a single commit, one write per side
+            defender_changes = {"military": {"soldiers": -defender_losses}}
+            if underdog_victory:
+                defender_changes["resources"] = {"gold": bonus_gold}
+                defender_changes["population"] = {"happiness": bonus_morale}
+            with self.db.transaction():
+                # Happiness penalty for failed attack
+                self.civ_manager.update_stats(attacker_id, {
+                    "military": {"soldiers": -attacker_losses},
+                    "population": {"happiness": -10}
+                })
+                self.civ_manager.update_stats(defender_id, defender_changes)
+
+                self.db.log_event(attacker_id, "defeat", "Battle Defeat", f"Defeated by {defender_civ['name']} in battle.")
+                self.db.log_event(defender_id, "victory", "Battle Victory", f"Successfully defended against {attacker_civ['name']}!")
+
+            if underdog_victory:
                 await ctx.send(f"🏆 **UNDERDOG VICTORY!** {defender_civ['name']} gains {format_number(bonus_gold)} gold and +{bonus_morale} happiness for their heroic defense!")
 
-            # Happiness penalty for failed attack
-            self.civ_manager.update_population(attacker_id, {"happiness": -10})
-
             embed = create_embed(
                 "⚔️ Defeat!",
                 f"**{attacker_civ['name']}** was defeated by **{defender_civ['name']}**!",
@@ -644,10 +729,6 @@ class MilitaryCommands(commands.Cog):
 
             await ctx.send(embed=embed)
 
-            # Log the defeat
-            self.db.log_event(attacker_id, "defeat", "Battle Defeat", f"Defeated by {defender_civ['name']} in battle.")
-            self.db.log_event(defender_id, "victory", "Battle Victory", f"Successfully defended against {attacker_civ['name']}!")
-
             # Try to mention the defender
             try:
                 member = None
@@ -669,7 +750,7 @@ class MilitaryCommands(commands.Cog):
     async def stealth_battle(self, ctx, target_mention: str = None):
         """Conduct a spy-based stealth attack (4min cooldown)"""
         try:
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check cooldown
             if not self._check_cooldown(user_id, 'stealthbattle', 240):  # 4 minutes
@@ -698,37 +779,14 @@ class MilitaryCommands(commands.Cog):
                 return
 
             # Resolve target
-            target = await self._get_member_from_mention(ctx, target_mention)
-            if not target:
-                await ctx.send("❌ Could not find that user. Make sure you're mentioning a valid user in this server.")
-                return
-
-            target_id = str(target.id)
-            target_civ = self.civ_manager.get_civilization(target_id)
-            if not target_civ:
-                await ctx.send("❌ Target user doesn't have a civilization!")
+            resolved = await self._resolve_target(ctx, user_id, target_mention)
+            if not resolved:
                 return
+            target, target_id, target_civ = resolved
 
             # Calculate spy operation success
-            attacker_spy_power = civ['military']['spies'] * civ['military']['tech_level']
-            defender_spy_power = target_civ['military']['spies'] * target_civ['military']['tech_level']
-
-            # Base success chance
-            success_chance = 0.6 + (attacker_spy_power - defender_spy_power) / 100
-            success_chance = max(0.2, min(0.9, success_chance))
-
-            # Apply ideology modifiers
-            if civ.get('ideology') == 'anarchy':
-                success_chance *= 0.8  # Anarchy penalty to spy success
-            elif civ.get('ideology') == 'destruction':
-                success_chance *= 1.2  # Destruction bonus to spy success
-                if random.random() < 0.1:  # 10% chance for extra destruction
-                    success_chance += 0.15
-
-            if target_civ.get('ideology') == 'fascism':
-                success_chance *= 0.9  # Fascist states are harder to infiltrate
-            elif target_civ.get('ideology') == 'pacifist':
-                success_chance *= 1.1  # Pacifist states are easier to infiltrate
+            success_chance = spy_success_chance(civ['military'], target_civ['military'],
+                                                civ.get('ideology'), target_civ.get('ideology'))
 
             if random.random() < success_chance:
                 # Stealth mission succeeds
@@ -758,7 +816,7 @@ class MilitaryCommands(commands.Cog):
 
                 elif operation_type == 'theft':
                     # Steal resources
-                    stolen = min(int(target_civ['resources']['gold'] * random.uniform(0.05, 0.15)), target_civ['resources']['gold'])
+                    stolen = int(target_civ['resources']['gold'] * random.uniform(0.05, 0.15))
                     self.civ_manager.update_resources(target_id, {"gold": -stolen})
                     self.civ_manager.update_resources(user_id, {"gold": stolen})
                     result_text = f"Your spies stole {format_number(stolen)} gold!"
@@ -816,7 +874,7 @@ class MilitaryCommands(commands.Cog):
     async def siege_city(self, ctx, target_mention: str = None):
         """Lay siege to an enemy civilization (10min cooldown)"""
         try:
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check cooldown
             if not self._check_cooldown(user_id, 'siege', 600):  # 10 minutes
@@ -845,16 +903,10 @@ class MilitaryCommands(commands.Cog):
                 return
 
             # Resolve target
-            target = await self._get_member_from_mention(ctx, target_mention)
-            if not target:
-                await ctx.send("❌ Could not find that user. Make sure you're mentioning a valid user in this server.")
-                return
-
-            target_id = str(target.id)
-            target_civ = self.civ_manager.get_civilization(target_id)
-            if not target_civ:
-                await ctx.send("❌ Target user doesn't have a civilization!")
+            resolved = await self._resolve_target(ctx, user_id, target_mention)
+            if not resolved:
                 return
+            target, target_id, target_civ = resolved
 
             # Check war declaration
             with self.db.get_connection() as conn:
@@ -887,10 +939,10 @@ class MilitaryCommands(commands.Cog):
 
             # Resource drain on defender
             resource_drain = {
-                "gold": min(int(target_civ['resources']['gold'] * siege_effectiveness * 0.1), target_civ['resources']['gold']),
-                "food": min(int(target_civ['resources']['food'] * siege_effectiveness * 0.2), target_civ['resources']['food']),
-                "wood": min(int(target_civ['resources']['wood'] * siege_effectiveness * 0.15), target_civ['resources']['wood']),
-                "stone": min(int(target_civ['resources']['stone'] * siege_effectiveness * 0.15), target_civ['resources']['stone'])
+                "gold": int(target_civ['resources']['gold'] * siege_effectiveness * 0.1),
+                "food": int(target_civ['resources']['food'] * siege_effectiveness * 0.2),
+                "wood": int(target_civ['resources']['wood'] * siege_effectiveness * 0.15),
+                "stone": int(target_civ['resources']['stone'] * siege_effectiveness * 0.15)
             }
 
             # Attacker maintenance costs
@@ -903,14 +955,29 @@ class MilitaryCommands(commands.Cog):
                 await ctx.send("❌ You cannot afford to maintain the siege! Need more gold and food.")
                 return
 
-            # Apply siege effects
-            self.civ_manager.spend_resources(user_id, maintenance_cost)
-            negative_drain = {res: -amt for res, amt in resource_drain.items()}
-            self.civ_manager.update_resources(target_id, negative_drain)
+            # Destruction ideology bonus
+            extra_damage = None
+            if civ.get('ideology') == 'destruction':
+                extra_damage = {
+                    "gold": int(target_civ['resources']['gold'] * 0.05),
+                    "food": int(target_civ['resources']['food'] * 0.05)
+                }
 
-            # Happiness effects
-            self.civ_manager.update_population(target_id, {"happiness": -15})
-            self.civ_manager.update_population(user_id, {"happiness": -5})
+            # Apply siege effects and log the siege in one commit
+            with self.db.transaction():
+                self.civ_manager.spend_resources(user_id, maintenance_cost)
+                negative_drain = {res: -amt for res, amt in resource_drain.items()}
+                self.civ_manager.update_resources(target_id, negative_drain)
+
+                # Happiness effects
+                self.civ_manager.update_population(target_id, {"happiness": -15})
+                self.civ_manager.update_population(user_id, {"happiness": -5})
+
+                if extra_damage:
+                    self.civ_manager.update_resources(target_id, {k: -v for k, v in extra_damage.items()})
+
+                self.db.log_event(user_id, "siege", "Siege Initiated", f"Laying siege to {target_civ['name']}")
+                self.db.log_event(target_id, "besieged", "Under Siege", f"Being sieged by {civ['name']}")
 
             embed = create_embed(
                 "🏰 Siege in Progress",
@@ -925,23 +992,13 @@ class MilitaryCommands(commands.Cog):
             cost_text = f"🪙 {format_number(maintenance_cost['gold'])} Gold\n🌾 {format_number(maintenance_cost['food'])} Food"
             embed.add_field(name="Siege Maintenance Cost", value=cost_text, inline=True)
 
-            # Destruction ideology bonus
-            if civ.get('ideology') == 'destruction':
-                extra_damage = {
-                    "gold": min(int(target_civ['resources']['gold'] * 0.05), target_civ['resources']['gold']),
-                    "food": min(int(target_civ['resources']['food'] * 0.05), target_civ['resources']['food'])
-                }
-                self.civ_manager.update_resources(target_id, {k: -v for k, v in extra_damage.items()})
+            if extra_damage:
                 embed.add_field(name="Destruction Bonus",
                                 value=f"Your destructive siege caused extra damage!\n🪙 {format_number(extra_damage['gold'])} Gold\n🌾 {format_number(extra_damage['food'])} Food",
                                 inline=False)
 
             await ctx.send(embed=embed)
 
-            # Log the siege
-            self.db.log_event(user_id, "siege", "Siege Initiated", f"Laying siege to {target_civ['name']}")
-            self.db.log_event(target_id, "besieged", "Under Siege", f"Being sieged by {civ['name']}")
-
             # Try to mention the target
             try:
                 await ctx.send(f"{target.mention} 🏰 Your civilization **{target_civ['name']}** is under siege by **{civ['name']}**!")
@@ -955,7 +1012,7 @@ class MilitaryCommands(commands.Cog):
     async def find_soldiers(self, ctx):
         """Search for wandering soldiers to recruit (1min cooldown)"""
         try:
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check cooldown
             if not self._check_cooldown(user_id, 'find', 60):  # 1 minute
@@ -1040,7 +1097,7 @@ class MilitaryCommands(commands.Cog):
                 await ctx.send("🕊️ **Peace Offering**\nUsage: `.peace @user`\nSend a peace offer to end a war. They can accept with `.accept_peace @you`.")
                 return
 
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check for civil war first
             if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -1053,48 +1110,23 @@ class MilitaryCommands(commands.Cog):
                 return
 
             # Resolve target
-            target = await self._get_member_from_mention(ctx, target_mention)
-            if not target:
-                await ctx.send("❌ Could not find that user. Make sure you're mentioning a valid user in this server.")
+            resolved = await self._resolve_target(ctx, user_id, target_mention, "❌ You're already at peace with yourself!")
+            if not resolved:
                 return
+            target, target_id, target_civ = resolved
 
-            target_id = str(target.id)
-
-            if target_id == user_id:
-                await ctx.send("❌ You're already at peace with yourself!")
+            # Check the war and any pending offer in one lookup
+            war_id, offer_id = self.db.get_war_and_peace_offer(user_id, target_id)
+            if not war_id:
+                await ctx.send("❌ You're not at war with this civilization!")
                 return
 
-            target_civ = self.civ_manager.get_civilization(target_id)
-            if not target_civ:
-                await ctx.send("❌ Target user doesn't have a civilization!")
+            if offer_id:
+                await ctx.send("❌ You already have a pending peace offer to this civilization!")
                 return
 
-            # Check if at war
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-
-                cursor.execute('''
-                    SELECT id FROM wars 
-                    WHERE ((attacker_id = ? AND defender_id = ?) OR (attacker_id = ? AND defender_id = ?))
-                    AND result = 'ongoing'
-                ''', (user_id, target_id, target_id, user_id))
-
-                war = cursor.fetchone()
-                if not war:
-                    await ctx.send("❌ You're not at war with this civilization!")
-                    return
-
-            # Check if there's already a pending offer
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT COUNT(*) FROM peace_offers 
-                    WHERE offerer_id = ? AND receiver_id = ? AND status = 'pending'
-                ''', (user_id, target_id))
-
-                if cursor.fetchone()[0] > 0:
-                    await ctx.send("❌ You already have a pending peace offer to this civilization!")
-                    return
 
                 # Store the peace offer
                 cursor.execute('''
@@ -1129,7 +1161,7 @@ class MilitaryCommands(commands.Cog):
                 await ctx.send("🕊️ **Accept Peace**\nUsage: `.accept_peace @user`\nAccept a pending peace offer to end the war.")
                 return
 
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check for civil war first
             if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -1158,36 +1190,21 @@ class MilitaryCommands(commands.Cog):
                 await ctx.send("❌ That user doesn't have a civilization!")
                 return
 
-            # Check if at war
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-
-                cursor.execute('''
-                    SELECT id FROM wars 
-                    WHERE ((attacker_id = ? AND defender_id = ?) OR (attacker_id = ? AND defender_id = ?))
-                    AND result = 'ongoing'
-                ''', (user_id, offerer_id, offerer_id, user_id))
+            # Check the war and the offer from the offerer to this user in one lookup
+            war_id, offer_id = self.db.get_war_and_peace_offer(offerer_id, user_id)
+            if not war_id:
+                await ctx.send("❌ You're not at war with this civilization!")
+                return
 
-                war = cursor.fetchone()
-                if not war:
-                    await ctx.send("❌ You're not at war with this civilization!")
-                    return
+            if not offer_id:
+                await ctx.send("❌ No pending peace offer from this civilization!")
+                return
 
-            # Check for pending offer from the offerer to this user
-            with self.db.get_connection() as conn:
+            # End the war, close the offer, boost both sides and log it in one commit
+            with self.db.transaction() as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT id FROM peace_offers 
-                    WHERE offerer_id = ? AND receiver_id = ? AND status = 'pending'
-                ''', (offerer_id, user_id))
-
-                offer = cursor.fetchone()
-                if not offer:
-                    await ctx.send("❌ No pending peace offer from this civilization!")
-                    return
 
                 # Accept the peace
-                war_id = war[0]
                 cursor.execute('''
                     UPDATE wars SET result = 'peace', ended_at = ?
                     WHERE id = ?
@@ -1197,13 +1214,14 @@ class MilitaryCommands(commands.Cog):
                 cursor.execute('''
                     UPDATE peace_offers SET status = 'accepted', responded_at = ?
                     WHERE id = ?
-                ''', (datetime.utcnow(), offer[0]))
+                ''', (datetime.utcnow(), offer_id))
 
-                conn.commit()
+                # Happiness boost for both
+                self.civ_manager.update_population(user_id, {"happiness": 15})
+                self.civ_manager.update_population(offerer_id, {"happiness": 15})
 
-            # Happiness boost for both
-            self.civ_manager.update_population(user_id, {"happiness": 15})
-            self.civ_manager.update_population(offerer_id, {"happiness": 15})
+                self.db.log_event(user_id, "peace_accepted", "Peace Accepted", f"Accepted peace with {offerer_civ['name']}")
+                self.db.log_event(offerer_id, "peace_accepted", "Peace Accepted", f"Peace accepted by {civ['name']}")
 
             embed = create_embed(
                 "🕊️ Peace Achieved!",
@@ -1224,10 +1242,6 @@ class MilitaryCommands(commands.Cog):
             except Exception:
                 await ctx.send(f"🕊️ **Peace Accepted!** {civ['name']} (led by {ctx.author.display_name}) has accepted the peace offer! The war is over.")
 
-            # Log events
-            self.db.log_event(user_id, "peace_accepted", "Peace Accepted", f"Accepted peace with {offerer_civ['name']}")
-            self.db.log_event(offerer_id, "peace_accepted", "Peace Accepted", f"Peace accepted by {civ['name']}")
-
         except Exception as e:
             logger.error(f"Error in accept_peace command: {e}", exc_info=True)
 
@@ -1235,7 +1249,7 @@ class MilitaryCommands(commands.Cog):
     async def manage_cards(self, ctx, action: str = None, *args):
         """View or use your unlocked cards (No cooldown)"""
         try:
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check for civil war first
             if not await self.check_civil_war_and_proceed(ctx, user_id):
@@ -1478,7 +1492,7 @@ class MilitaryCommands(commands.Cog):
     async def add_border(self, ctx):
         """Add a defensive border to your territory (5min cooldown)"""
         try:
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check cooldown
             if not self._check_cooldown(user_id, 'addborder', 300):  # 5 minutes
@@ -1546,7 +1560,7 @@ class MilitaryCommands(commands.Cog):
     async def remove_border(self, ctx):
         """Remove your defensive border and retrieve all soldiers (2min cooldown)"""
         try:
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check cooldown
             if not self._check_cooldown(user_id, 'removeborder', 120):  # 2 minutes
@@ -1602,7 +1616,7 @@ class MilitaryCommands(commands.Cog):
     async def rectract_soldiers(self, ctx, percentage: int = None):
         """Assign a percentage of your soldiers to the border (1min cooldown)"""
         try:
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check cooldown
             if not self._check_cooldown(user_id, 'rectract', 60):  # 1 minute
@@ -1682,7 +1696,7 @@ class MilitaryCommands(commands.Cog):
     async def retrieve_soldiers(self, ctx, percentage: int = None):
         """Retrieve a percentage of soldiers from the border (1min cooldown)"""
         try:
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check cooldown
             if not self._check_cooldown(user_id, 'retrieve', 60):  # 1 minute
@@ -1761,7 +1775,7 @@ class MilitaryCommands(commands.Cog):
     async def border_info(self, ctx):
         """Check your border status (1min cooldown)"""
         try:
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             
             # Check cooldown
             if not self._check_cooldown(user_id, 'borderinfo', 60):  # 1 minute
@@ -1819,17 +1833,14 @@ class MilitaryCommands(commands.Cog):
     def _calculate_military_strength(self, civ):
         """Calculate total military strength of a civilization"""
         try:
-            soldiers = civ['military']['soldiers']
-            spies = civ['military']['spies']
-            tech_level = civ['military']['tech_level']
-            bonuses = civ.get('bonuses', {})
-
-            base_strength = soldiers * 10 + spies * 5
-            tech_bonus = tech_level * 50
-            territory_bonus = civ['territory']['land_size'] / 100
-            defense_bonus = bonuses.get('defense_strength', 0) / 100
-
-            return (base_strength + tech_bonus + territory_bonus) * (1 + defense_bonus)
+            military = civ['military']
+            return military_strength(
+                military['soldiers'],
+                military['spies'],
+                military['tech_level'],
+                civ['territory']['land_size'],
+                civ.get('bonuses', {}).get('defense_strength', 0)
+            )
         except KeyError as e:
             logger.error(f"Error calculating military strength - missing key {e}", exc_info=True)
             return 0
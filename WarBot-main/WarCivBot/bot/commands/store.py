@@ -1,11 +1,23 @@
 import random
+from itertools import islice
 import guilded
 from guilded.ext import commands
 import logging
-from bot.utils import format_number, check_cooldown_decorator, create_embed
+from bot.utils import format_number, check_cooldown_decorator, create_embed, get_user_id
 
 logger = logging.getLogger(__name__)
 
+# HyperItems listed by .inventory; the rest are summarised as a count
+INVENTORY_ITEM_LIMIT = 15
+
+# Marker shown next to a HyperItem for each rarity
+RARITY_EMOJIS = {
+    "common": "🟢",
+    "uncommon": "🔵",
+    "rare": "🟣",
+    "legendary": "🟡"
+}
+
 class StoreCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -152,11 +164,24 @@ class StoreCommands(commands.Cog):
                 "command": "shield"
             }
         }
+        
+        # Store item name for each bonus key an upgrade grants; first item wins
+        self.store_item_names_by_effect = {}
+        for item_data in self.store_items.values():
+            for effect_key in item_data['effect']:
+                self.store_item_names_by_effect.setdefault(effect_key, item_data['name'])
+        
+        # Drop table drawn from by every Black Market roll, built once
+        self.hyperitem_names = tuple(self.hyperitem_pool)
+        self.hyperitem_weights = tuple(data['weight'] for data in self.hyperitem_pool.values())
+        self.hyperitems_by_rarity = {}
+        for item_name, item_data in self.hyperitem_pool.items():
+            self.hyperitems_by_rarity.setdefault(item_data['rarity'], []).append(item_name)
 
     @commands.command(name='store')
     async def view_store(self, ctx, item: str = None):
         """View the civilization store and purchase upgrades"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         civ = self.civ_manager.get_civilization(user_id)
         
         if not civ:
@@ -219,9 +244,7 @@ class StoreCommands(commands.Cog):
         self.civ_manager.spend_resources(user_id, item_data['cost'])
         
         # Apply permanent bonuses
-        new_bonuses = bonuses.copy()
-        new_bonuses.update(item_data['effect'])
-        self.civ_manager.db.update_civilization(user_id, {"bonuses": new_bonuses})
+        self.civ_manager.db.patch_civilization_json(user_id, "bonuses", item_data['effect'])
         
         embed = create_embed(
             "🏪 Purchase Successful!",
@@ -244,7 +267,7 @@ class StoreCommands(commands.Cog):
     @commands.command(name='blackmarket')
     async def black_market(self, ctx):
         """Enter the black market to purchase random HyperItems (No cooldown)"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         civ = self.civ_manager.get_civilization(user_id)
         
         if not civ:
@@ -324,13 +347,6 @@ class StoreCommands(commands.Cog):
             "legendary": guilded.Color.gold()
         }
         
-        rarity_emojis = {
-            "common": "🟢",
-            "uncommon": "🔵", 
-            "rare": "🟣",
-            "legendary": "🟡"
-        }
-        
         embed = create_embed(
             "🕴️ Black Market Transaction",
             "The shadowy dealer hands you a mysterious package...",
@@ -342,7 +358,7 @@ class StoreCommands(commands.Cog):
             embed.add_field(name="Pity System", value=pity_message, inline=False)
         
         embed.add_field(
-            name=f"{rarity_emojis[item_data['rarity']]} {hyper_item}",
+            name=f"{RARITY_EMOJIS[item_data['rarity']]} {hyper_item}",
             value=f"**Rarity**: {item_data['rarity'].capitalize()}\n**Description**: {item_data['description']}\n**Command**: `.{item_data['command']}`",
             inline=False
         )
@@ -360,7 +376,7 @@ class StoreCommands(commands.Cog):
             embed.add_field(name="💎 Rare Find!", value="This powerful item will serve you well in battle!", inline=False)
             
         embed.add_field(name="Entry Fee", value="🪙 1,000 Gold", inline=True)
-        embed.add_field(name="Item Obtained", value=f"{rarity_emojis[item_data['rarity']]} {hyper_item}", inline=True)
+        embed.add_field(name="Item Obtained", value=f"{RARITY_EMOJIS[item_data['rarity']]} {hyper_item}", inline=True)
         
         await ctx.send(embed=embed)
         
@@ -384,17 +400,12 @@ class StoreCommands(commands.Cog):
 
     def _roll_hyperitem(self) -> str:
         """Roll for a random HyperItem based on drop rates"""
-        # Create weighted list
-        weighted_items = []
-        for item_name, item_data in self.hyperitem_pool.items():
-            weighted_items.extend([item_name] * item_data['weight'])
-            
-        return random.choice(weighted_items)
+        return random.choices(self.hyperitem_names, self.hyperitem_weights)[0]
 
     def _roll_hyperitem_with_pity(self, forced_rarity: str) -> str:
         """Roll for a HyperItem with forced rarity (pity system)"""
         # Get all items of the forced rarity
-        items_of_rarity = [item for item, data in self.hyperitem_pool.items() if data['rarity'] == forced_rarity]
+        items_of_rarity = self.hyperitems_by_rarity.get(forced_rarity)
         
         if not items_of_rarity:
             # Fallback to normal roll if no items of that rarity exist
@@ -405,7 +416,7 @@ class StoreCommands(commands.Cog):
     @commands.command(name='inventory')
     async def view_inventory(self, ctx):
         """View your HyperItems and store upgrades"""
-        user_id = str(ctx.author.id)
+        user_id = get_user_id(ctx)
         civ = self.civ_manager.get_civilization(user_id)
         
         if not civ:
@@ -424,17 +435,15 @@ class StoreCommands(commands.Cog):
         
         # HyperItems section
         if hyper_items:
+            known_items = [item for item in hyper_items if item in self.hyperitem_pool]
             item_list = []
-            for item in hyper_items:
-                if item in self.hyperitem_pool:
-                    item_data = self.hyperitem_pool[item]
-                    rarity_emoji = {
-                        "common": "🟢",
-                        "uncommon": "🔵", 
-                        "rare": "🟣",
-                        "legendary": "🟡"
-                    }[item_data['rarity']]
-                    item_list.append(f"{rarity_emoji} **{item}** - `.{item_data['command']}`")
+            # Only format the lines that will be shown
+            for item in islice(known_items, INVENTORY_ITEM_LIMIT):
+                item_data = self.hyperitem_pool[item]
+                rarity_emoji = RARITY_EMOJIS[item_data['rarity']]
+                item_list.append(f"{rarity_emoji} **{item}** - `.{item_data['command']}`")
+            if len(known_items) > INVENTORY_ITEM_LIMIT:
+                item_list.append(f"…and {len(known_items) - INVENTORY_ITEM_LIMIT} more")
                     
             embed.add_field(
                 name="🎁 HyperItems",
@@ -450,10 +459,9 @@ class StoreCommands(commands.Cog):
             for bonus_key, bonus_value in bonuses.items():
                 if bonus_key.endswith('_bonus') and not bonus_key.endswith('_bonus'):
                     # Find corresponding store item
-                    for item_key, item_data in self.store_items.items():
-                        if bonus_key in item_data['effect']:
-                            upgrades.append(f"✅ {item_data['name']}")
-                            break
+                    item_name = self.store_item_names_by_effect.get(bonus_key)
+                    if item_name:
+                        upgrades.append(f"✅ {item_name}")
                             
             if upgrades:
                 embed.add_field(name="🏪 Store Upgrades", value="\n".join(upgrades), inline=False)
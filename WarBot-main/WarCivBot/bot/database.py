@@ -9,24 +9,196 @@ import time
 import dropbox
 from dropbox.exceptions import ApiError, AuthError
 import os
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Maximum number of civilization rows kept in the in-memory cache
+CIV_CACHE_SIZE = 4096
+
+# Maximum number of users whose alliance lookup is remembered
+USER_ALLIANCE_CACHE_SIZE = 4096
+
+# Share of misses admitted once the cache is full, so one-off lookups of
+# rarely seen civilizations do not push out the regulars
+CIV_CACHE_ADMIT_RATE = 0.3
+
+# Longest command cooldown in the bot; older cooldown rows can be pruned
+MAX_COOLDOWN_MINUTES = 1440
+
+# How long the in-memory civilization id set is trusted before it is reloaded
+CIV_IDS_REFRESH_SECONDS = 86400
+
+# Seconds a user is told to wait when their cooldown could not be checked; the
+# command is refused rather than run without a cooldown
+COOLDOWN_ERROR_RETRY_SECONDS = 5
+
+# Compiled statements kept per connection; sqlite3's default of 128 is shared by
+# every ad-hoc query in the bot and the hot lookups below get evicted
+STATEMENT_CACHE_SIZE = 256
+
+# Longest a write waits for another thread's write lock before failing; writers
+# commit per command or per event page, so waits are normally far shorter
+BUSY_TIMEOUT_SECONDS = 2.0
+
+# Page cache per connection (KiB) and memory-mapped window (bytes); connections
+# live as long as their thread, so the hot pages stay in memory across commands
+PAGE_CACHE_KIB = 65536
+MMAP_SIZE_BYTES = 268435456
+
+# Applied to every new connection in one round: WAL lets readers on other threads
+# proceed while a write is in progress, and with synchronous=NORMAL a commit
+# only appends to the WAL instead of syncing the main file each time
+CONNECTION_PRAGMAS = f'''
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-{PAGE_CACHE_KIB};
+    PRAGMA mmap_size={MMAP_SIZE_BYTES};
+'''
+
+# Delay from the first commit of a burst to the upload, so a burst of commands
+# results in one Dropbox upload instead of one per write
+UPLOAD_DEBOUNCE_SECONDS = 5
+
+# Civilizations scanned per page when rolling events, bounding how many rows
+# are held in memory at once
+EVENT_ROLL_BATCH_SIZE = 1000
+
+# Event log rows buffered in memory before they are written on their own;
+# otherwise they ride along with the next commit
+EVENT_LOG_BATCH_SIZE = 100
+
+# Columns naming a player in each table cleared when their civilization is deleted
+USER_DATA_COLUMNS = {
+    'civilizations': ('user_id',),
+    'cooldowns': ('user_id',),
+    'cards': ('user_id',),
+    'events': ('user_id',),
+    'trade_requests': ('sender_id', 'recipient_id'),
+    'alliance_invitations': ('sender_id', 'recipient_id'),
+    'messages': ('sender_id', 'recipient_id'),
+    'peace_offers': ('offerer_id', 'receiver_id'),
+    'wars': ('attacker_id', 'defender_id')
+}
+
+# Civilization columns stored as JSON text
+CIV_JSON_COLUMNS = frozenset((
+    'resources', 'population', 'military', 'territory',
+    'hyper_items', 'bonuses', 'selected_cards'
+))
+
+# Layout of SQLite's own datetime('now'); timestamps are bound as strings in it
+SQL_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Decode columns selected as "name [datetime]" straight back into datetime objects;
+# fromisoformat also reads older rows written with a 'T' separator or microseconds
+sqlite3.register_converter('datetime', lambda value: datetime.fromisoformat(value.decode()))
+
+if orjson is not None:
+    def json_dumps(obj: Any) -> str:
+        """Serialize a JSON column with orjson"""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    json_loads = orjson.loads
+else:
+    # Reuse one compact encoder/decoder pair, matching orjson's output
+    json_dumps = json.JSONEncoder(separators=(',', ':')).encode
+    json_loads = json.JSONDecoder().decode
+
 class Database:
+    # Hot queries kept as constants so every call hits the same cached statement
+    SQL_GET_CIVILIZATION = 'SELECT * FROM civilizations WHERE user_id = ?'
+    SQL_GET_COOLDOWN = '''
+        SELECT last_used_at AS "last_used_at [datetime]" FROM cooldowns
+        WHERE user_id = ? AND command = ?
+    '''
+    SQL_COOLDOWN_REMAINING = '''
+        SELECT CAST((julianday(last_used_at, '+' || ? || ' minutes') - julianday('now')) * 86400 AS INTEGER)
+        FROM cooldowns WHERE user_id = ? AND command = ?
+    '''
+    SQL_GET_CIVILIZATION_WITH_COOLDOWN = '''
+        SELECT c.*,
+               CAST((julianday(cd.last_used_at, '+' || ? || ' minutes') - julianday('now')) * 86400 AS INTEGER)
+                   AS cooldown_remaining
+        FROM (SELECT ? AS user_id) u
+        LEFT JOIN civilizations c ON c.user_id = u.user_id
+        LEFT JOIN cooldowns cd ON cd.user_id = u.user_id AND cd.command = ?
+    '''
+    # julianday() compares old 'T'-separated rows by time rather than as text
+    SQL_PRUNE_COOLDOWNS = 'DELETE FROM cooldowns WHERE user_id = ? AND julianday(last_used_at) < julianday(?)'
+    SQL_SET_COOLDOWN = '''
+        INSERT OR REPLACE INTO cooldowns (user_id, command, last_used_at)
+        VALUES (?, ?, ?)
+    '''
+    # Starts the cooldown only if none is running; returns a row when it did
+    SQL_CLAIM_COOLDOWN = '''
+        INSERT INTO cooldowns (user_id, command, last_used_at) VALUES (?, ?, ?)
+        ON CONFLICT(user_id, command) DO UPDATE SET last_used_at = excluded.last_used_at
+        WHERE julianday(cooldowns.last_used_at, '+' || ? || ' minutes') <= julianday('now')
+        RETURNING 1
+    '''
+    SQL_CLEAR_COOLDOWN = 'DELETE FROM cooldowns WHERE user_id = ? AND command = ?'
+    SQL_GET_WAR_AND_PEACE_OFFER = '''
+        SELECT
+            (SELECT id FROM wars
+             WHERE ((attacker_id = ? AND defender_id = ?) OR (attacker_id = ? AND defender_id = ?))
+             AND result = 'ongoing') AS war_id,
+            (SELECT id FROM peace_offers
+             WHERE offerer_id = ? AND receiver_id = ? AND status = 'pending') AS offer_id
+    '''
+    SQL_GET_ALLIANCE = 'SELECT * FROM alliances WHERE id = ?'
+    SQL_GET_ALLIANCE_BY_NAME = 'SELECT * FROM alliances WHERE name = ?'
+    SQL_INSERT_EVENT = '''
+        INSERT INTO events (user_id, event_type, title, description, effects, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+
+    SQL_GET_USER_ALLIANCE = "SELECT * FROM alliances WHERE members LIKE '%\"' || ? || '\"%'"
+    SQL_ARE_ALLIED = '''
+        SELECT EXISTS (
+            SELECT 1 FROM alliances
+            WHERE members LIKE '%"' || ? || '"%' AND members LIKE '%"' || ? || '"%'
+        )
+    '''
+
     def __init__(self, db_path: str = 'nationbot.db', dropbox_refresh_token: str = None, 
                  dropbox_app_key: str = None, dropbox_app_secret: str = None):
         self.db_path = db_path
         self.local = threading.local()
+        # Raw civilization rows by user_id, least recently used first
+        self.civ_cache = OrderedDict()
+        self.civ_cache_lock = threading.Lock()
+        self.civ_cache_admit_credit = 0.0
+        # Every civilization's user_id, loaded on first use and kept in step with create/delete
+        self.civ_ids = None
+        self.civ_ids_loaded_at = 0.0
+        # Indexable copy of civ_ids for random picks, rebuilt only after the set changes
+        self.civ_ids_snapshot = None
+        # Alliance row (or None) each user was last seen in, least recently used first;
+        # cleared on any alliance write
+        self.user_alliances = OrderedDict()
         self.dropbox_refresh_token = dropbox_refresh_token or os.getenv('DROPBOX_REFRESH_TOKEN')
         self.dropbox_app_key = dropbox_app_key or os.getenv('DROPBOX_APP_KEY')
         self.dropbox_app_secret = dropbox_app_secret or os.getenv('DROPBOX_APP_SECRET')
         self.dropbox_client = None
         if self.dropbox_refresh_token and self.dropbox_app_key and self.dropbox_app_secret:
             self.init_dropbox()
+        # Uploads run on their own thread so commits never wait on Dropbox
+        self.upload_requested = threading.Event()
+        self.upload_lock = threading.Lock()
         self.download_database()
         self.init_database()
         self.setup_cleanup_scheduler()
+        threading.Thread(target=self._upload_worker, name='dropbox-upload', daemon=True).start()
 
     def init_dropbox(self):
         """Initialize Dropbox client with refresh token"""
@@ -69,15 +241,26 @@ class Database:
         if not self.dropbox_client:
             logger.warning("No Dropbox client, skipping upload")
             return
+        fd, snapshot_path = tempfile.mkstemp(suffix='.db', dir=os.path.dirname(os.path.abspath(self.db_path)))
+        os.close(fd)
         try:
-            # Check integrity
-            cursor = self.get_connection().cursor()
-            cursor.execute("PRAGMA integrity_check")
-            if cursor.fetchone()[0] != "ok":
+            # Upload a snapshot rather than the live file, which other threads'
+            # commits and WAL checkpoints may be writing while it is read
+            self.snapshot_database(snapshot_path)
+            
+            # Check integrity; quick_check skips the index cross-checks that make
+            # integrity_check slow, and runs before every debounced upload
+            snapshot = sqlite3.connect(snapshot_path)
+            try:
+                healthy = snapshot.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+            finally:
+                snapshot.close()
+            if not healthy:
                 logger.error("Database corrupted, skipping upload")
                 return
+            
             dropbox_path = f"/{os.path.basename(self.db_path)}"
-            with open(self.db_path, 'rb') as f:
+            with open(snapshot_path, 'rb') as f:
                 self.dropbox_client.files_upload(
                     f.read(),
                     dropbox_path,
@@ -87,14 +270,111 @@ class Database:
         except Exception as e:
             logger.error(f"Error uploading database to Dropbox: {e}")
             raise
+        finally:
+            os.remove(snapshot_path)
+
+    def snapshot_database(self, path: str):
+        """Write a consistent copy of the database to path, even while other threads commit"""
+        target = sqlite3.connect(path)
+        try:
+            self.get_connection().backup(target)
+        finally:
+            target.close()
+
+    def request_upload(self):
+        """Ask the upload thread to push the database to Dropbox"""
+        self.upload_requested.set()
+
+    def flush_upload(self):
+        """Upload right away if a commit is still waiting for one"""
+        with self.upload_lock:
+            if not self.upload_requested.is_set():
+                return
+            self.upload_requested.clear()
+            try:
+                self.upload_database()
+            except Exception as e:
+                logger.error(f"Error in background database upload: {e}")
+
+    def _upload_worker(self):
+        """Upload once per burst of commits"""
+        while True:
+            self.upload_requested.wait()
+            time.sleep(UPLOAD_DEBOUNCE_SECONDS)
+            self.flush_upload()
 
     def get_connection(self):
         """Get thread-local database connection"""
         if not hasattr(self.local, 'connection'):
-            self.local.connection = sqlite3.connect(self.db_path)
-            self.local.connection.row_factory = sqlite3.Row
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS,
+                                   detect_types=sqlite3.PARSE_COLNAMES,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+            conn.row_factory = sqlite3.Row
+            conn.executescript(CONNECTION_PRAGMAS)
+            self.local.connection = conn
         return self.local.connection
 
+    def commit(self):
+        """Commit and schedule an upload, unless an enclosing transaction() will do it on exit"""
+        if getattr(self.local, 'transaction_depth', 0):
+            return
+        self._commit_with_pending(self.get_connection())
+        self.request_upload()
+
+    def _commit_with_pending(self, conn):
+        """Commit the open transaction together with this thread's queued rows"""
+        cooldowns_written = self._write_pending_cooldowns(conn)
+        events_written = self._write_pending_events(conn)
+        try:
+            conn.commit()
+        except Exception:
+            # Nothing was applied: keep the queue for the next commit and forget
+            # cached rows that held the failed transaction's writes
+            conn.rollback()
+            self._thread_uncommitted_civilizations().clear()
+            self.invalidate_civilization()
+            raise
+        # Rows changed by the transaction were kept out of the cache until now; drop
+        # any copy another thread cached from before the commit
+        uncommitted = self._thread_uncommitted_civilizations()
+        if uncommitted:
+            with self.civ_cache_lock:
+                for user_id in uncommitted:
+                    self.civ_cache.pop(user_id, None)
+            uncommitted.clear()
+        if cooldowns_written:
+            self._thread_pending_cooldowns().clear()
+        if events_written:
+            self._thread_pending_events().clear()
+
+    @contextmanager
+    def transaction(self):
+        """Group several writes into one commit and one upload request"""
+        conn = self.get_connection()
+        depth = getattr(self.local, 'transaction_depth', 0)
+        # Cooldowns and event rows queued inside the block are only kept if it commits
+        cooldowns_before = dict(self._thread_pending_cooldowns()) if depth == 0 else None
+        events_mark = len(self._thread_pending_events())
+        self.local.transaction_depth = depth + 1
+        try:
+            yield conn
+        except Exception:
+            self.local.transaction_depth = depth
+            if depth == 0:
+                conn.rollback()
+                pending_cooldowns = self._thread_pending_cooldowns()
+                pending_cooldowns.clear()
+                pending_cooldowns.update(cooldowns_before)
+                del self._thread_pending_events()[events_mark:]
+                self._thread_uncommitted_civilizations().clear()
+                # Cached rows may hold writes that were just rolled back
+                self.invalidate_civilization()
+            raise
+        self.local.transaction_depth = depth
+        if depth == 0:
+            self._commit_with_pending(conn)
+            self.request_upload()
+
     def setup_cleanup_scheduler(self):
         """Schedule daily cleanup of expired requests"""
         def cleanup_task():
@@ -253,10 +533,23 @@ class Database:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_invites_expires ON alliance_invitations(expires_at)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_wars_ongoing ON wars(result)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_peace_offers_status ON peace_offers(status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_recipient ON messages(recipient_id)')
+        # Superseded by the (recipient_id, expires_at) index below
+        cursor.execute('DROP INDEX IF EXISTS idx_messages_recipient')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_recipient_expires ON messages(recipient_id, expires_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_trade_recipient ON trade_requests(recipient_id, expires_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_invites_recipient ON alliance_invitations(recipient_id, expires_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_wars_pair ON wars(attacker_id, defender_id, result)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_wars_defender ON wars(defender_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_peace_offers_pair ON peace_offers(offerer_id, receiver_id, status)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_user ON events(user_id, timestamp)')
+        # The dashboard's recent-events feed and 24h count read the log by time alone
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp)')
+        # get_all_civilizations returns rows newest-active first, which this index gives unsorted
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_civilizations_last_active ON civilizations(last_active)')
+        # .ally checks whether either civilization already leads an alliance
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alliances_leader ON alliances(leader_id)')
         
-        conn.commit()
-        self.upload_database()
+        self.commit()
         logger.info("Database initialized successfully")
 
     def create_civilization(self, user_id: str, name: str, bonus_resources: Dict = None, bonuses: Dict = None, hyper_item: str = None) -> bool:
@@ -304,21 +597,25 @@ class Database:
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 user_id, name,
-                json.dumps(default_resources),
-                json.dumps(default_population),
-                json.dumps(default_military),
-                json.dumps(default_territory),
-                json.dumps(hyper_items),
-                json.dumps(bonuses),
-                json.dumps(selected_cards),
+                json_dumps(default_resources),
+                json_dumps(default_population),
+                json_dumps(default_military),
+                json_dumps(default_territory),
+                json_dumps(hyper_items),
+                json_dumps(bonuses),
+                json_dumps(selected_cards),
                 None  # Region starts as null
             ))
             
             # Create initial card selection for tech level 1
             self.generate_card_selection(user_id, 1)
             
-            conn.commit()
-            self.upload_database()
+            self.invalidate_civilization(user_id)
+            self.commit()
+            with self.civ_cache_lock:
+                if self.civ_ids is not None:
+                    self.civ_ids.add(user_id)
+                    self.civ_ids_snapshot = None
             logger.info(f"Created civilization '{name}' for user {user_id}")
             return True
             
@@ -335,75 +632,203 @@ class Database:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # Delete from all related tables
-            tables_to_clean = [
-                'civilizations',
-                'cooldowns', 
-                'cards',
-                'events',
-                'trade_requests',
-                'alliance_invitations',
-                'messages',
-                'peace_offers'
-            ]
+            # Delete from all related tables, matching whichever columns name the player
+            for table, columns in USER_DATA_COLUMNS.items():
+                where = ' OR '.join(f'{column} = ?' for column in columns)
+                cursor.execute(f'DELETE FROM {table} WHERE {where}', (user_id,) * len(columns))
             
-            for table in tables_to_clean:
-                if table == 'civilizations':
-                    cursor.execute('DELETE FROM civilizations WHERE user_id = ?', (user_id,))
-                else:
-                    # For other tables, check if they have user_id column
-                    cursor.execute(f'DELETE FROM {table} WHERE user_id = ?', (user_id,))
-            
-            # Also clean from wars (both as attacker and defender)
-            cursor.execute('DELETE FROM wars WHERE attacker_id = ? OR defender_id = ?', (user_id, user_id))
-            
-            # Handle alliance memberships
-            cursor.execute('SELECT id, members FROM alliances')
-            alliances = cursor.fetchall()
-            for alliance in alliances:
-                alliance_id = alliance['id']
-                members = json.loads(alliance['members'])
+            # Handle alliance memberships, letting SQLite skip alliances the user is not in
+            cursor.execute('''
+                SELECT id, members FROM alliances
+                WHERE members LIKE '%"' || ? || '"%'
+            ''', (user_id,))
+            updates = []
+            for alliance in cursor.fetchall():
+                members = json_loads(alliance['members'])
                 if user_id in members:
                     members.remove(user_id)
-                    cursor.execute('UPDATE alliances SET members = ? WHERE id = ?', 
-                                 (json.dumps(members), alliance_id))
-            
-            conn.commit()
-            self.upload_database()
+                    updates.append((json_dumps(members), alliance['id']))
+            cursor.executemany('UPDATE alliances SET members = ? WHERE id = ?', updates)
+            
+            self.invalidate_civilization(user_id)
+            self.invalidate_alliances()
+            self.commit()
+            with self.civ_cache_lock:
+                if self.civ_ids is not None:
+                    self.civ_ids.discard(user_id)
+                    self.civ_ids_snapshot = None
             logger.info(f"Completely deleted civilization for user {user_id}")
             return True
             
         except Exception as e:
+            # Rows may already be gone from this connection's open transaction
+            self.invalidate_civilization(user_id)
             logger.error(f"Error deleting civilization for user {user_id}: {e}")
             return False
 
+    def remove_civilizations(self, *user_ids: str) -> bool:
+        """Delete civilization rows only, keeping the cache and id set in step"""
+        try:
+            placeholders = ','.join('?' * len(user_ids))
+            self.get_connection().execute(
+                f'DELETE FROM civilizations WHERE user_id IN ({placeholders})', user_ids
+            )
+            self.commit()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error removing civilizations {user_ids}: {e}")
+            return False
+        
+        finally:
+            # Drop cached state even on failure; the rows may already be gone
+            with self.civ_cache_lock:
+                for user_id in user_ids:
+                    self.civ_cache.pop(user_id, None)
+                    if self.civ_ids is not None:
+                        self.civ_ids.discard(user_id)
+                self.civ_ids_snapshot = None
+
+    def get_civilization_ids(self) -> Tuple[str, ...]:
+        """Get every civilization's user_id from memory, reloading from SQL once a day"""
+        try:
+            with self.civ_cache_lock:
+                now = time.monotonic()
+                if self.civ_ids is None or now - self.civ_ids_loaded_at > CIV_IDS_REFRESH_SECONDS:
+                    cursor = self.get_connection().execute('SELECT user_id FROM civilizations')
+                    self.civ_ids = {row['user_id'] for row in cursor}
+                    self.civ_ids_loaded_at = now
+                    self.civ_ids_snapshot = None
+                if self.civ_ids_snapshot is None:
+                    self.civ_ids_snapshot = tuple(self.civ_ids)
+                return self.civ_ids_snapshot
+        except Exception as e:
+            logger.error(f"Error getting civilization ids: {e}")
+            return ()
+
+    def _decode_civilization(self, row) -> Dict[str, Any]:
+        """Build a civilization dict from a row, decoding its JSON columns"""
+        return {
+            key: json_loads(row[key]) if key in CIV_JSON_COLUMNS else row[key]
+            for key in row.keys()
+        }
+
+    def _thread_uncommitted_civilizations(self) -> set:
+        """user_ids this thread's open transaction() has read or written, kept out of the cache"""
+        uncommitted = getattr(self.local, 'uncommitted_civilizations', None)
+        if uncommitted is None:
+            uncommitted = self.local.uncommitted_civilizations = set()
+        return uncommitted
+
+    def _hold_out_of_cache(self, user_id: str) -> bool:
+        """Inside a transaction(), drop a civilization from the shared cache until the commit"""
+        if not getattr(self.local, 'transaction_depth', 0):
+            return False
+        self.civ_cache.pop(user_id, None)
+        self._thread_uncommitted_civilizations().add(user_id)
+        return True
+
+    def _patch_cached_civilization(self, user_id: str, patch):
+        """Apply a write to the cached row, or hold the row out of the cache until its transaction commits"""
+        with self.civ_cache_lock:
+            if self._hold_out_of_cache(user_id):
+                return
+            row = self.civ_cache.get(user_id)
+            if row is not None:
+                # Cached sqlite3.Row objects are read-only, materialize before writing
+                row = dict(row)
+                patch(row)
+                row['last_active'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+                self.civ_cache[user_id] = row
+
+    def _cache_civilization(self, user_id: str, row):
+        """Store a raw civilization row, evicting the least recently used one"""
+        with self.civ_cache_lock:
+            # Rows read inside a transaction may include its uncommitted writes
+            if self._hold_out_of_cache(user_id):
+                return
+            if user_id not in self.civ_cache and len(self.civ_cache) >= CIV_CACHE_SIZE:
+                # Full cache: admit new rows at a fixed rate rather than on every miss
+                self.civ_cache_admit_credit += CIV_CACHE_ADMIT_RATE
+                if self.civ_cache_admit_credit < 1.0:
+                    return
+                self.civ_cache_admit_credit -= 1.0
+            self.civ_cache[user_id] = row
+            self.civ_cache.move_to_end(user_id)
+            if len(self.civ_cache) > CIV_CACHE_SIZE:
+                self.civ_cache.popitem(last=False)
+
+    def invalidate_civilization(self, user_id: str = None):
+        """Drop a cached civilization, or the whole cache when no user is given"""
+        with self.civ_cache_lock:
+            if user_id is None:
+                self.civ_cache.clear()
+            else:
+                self.civ_cache.pop(user_id, None)
+
     def get_civilization(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get civilization data for a user"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM civilizations WHERE user_id = ?', (user_id,))
-            row = cursor.fetchone()
+            with self.civ_cache_lock:
+                row = self.civ_cache.get(user_id)
+                if row is not None:
+                    self.civ_cache.move_to_end(user_id)
             
-            if not row:
-                return None
-            
-            civ = dict(row)
-            civ['resources'] = json.loads(civ['resources'])
-            civ['population'] = json.loads(civ['population'])
-            civ['military'] = json.loads(civ['military'])
-            civ['territory'] = json.loads(civ['territory'])
-            civ['hyper_items'] = json.loads(civ['hyper_items'])
-            civ['bonuses'] = json.loads(civ['bonuses'])
-            civ['selected_cards'] = json.loads(civ['selected_cards'])
+            if row is None:
+                row = self.get_connection().execute(self.SQL_GET_CIVILIZATION, (user_id,)).fetchone()
+                
+                if not row:
+                    return None
+                
+                self._cache_civilization(user_id, row)
             
-            return civ
+            # Decoding always builds a new dict, so callers never mutate the cached row
+            return self._decode_civilization(row)
             
         except Exception as e:
             logger.error(f"Error getting civilization for user {user_id}: {e}")
             return None
 
+    def get_civilizations_many(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get several civilizations keyed by user_id, reading all cache misses in one query"""
+        try:
+            rows = {}
+            with self.civ_cache_lock:
+                for user_id in user_ids:
+                    row = self.civ_cache.get(user_id)
+                    if row is not None:
+                        self.civ_cache.move_to_end(user_id)
+                        rows[user_id] = row
+            
+            missing = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in rows]
+            if missing:
+                placeholders = ','.join('?' * len(missing))
+                cursor = self.get_connection().cursor()
+                cursor.execute(f'SELECT * FROM civilizations WHERE user_id IN ({placeholders})', missing)
+                for row in cursor.fetchall():
+                    self._cache_civilization(row['user_id'], row)
+                    rows[row['user_id']] = row
+            
+            return {user_id: self._decode_civilization(row) for user_id, row in rows.items()}
+            
+        except Exception as e:
+            logger.error(f"Error getting civilizations for users {user_ids}: {e}")
+            return {}
+
+    def get_civilization_names(self, user_ids) -> Dict[str, str]:
+        """Get civilization names keyed by user_id in one query"""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+        try:
+            placeholders = ','.join('?' * len(user_ids))
+            cursor = self.get_connection().cursor()
+            cursor.execute(f'SELECT user_id, name FROM civilizations WHERE user_id IN ({placeholders})', user_ids)
+            return {row['user_id']: row['name'] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Error getting civilization names: {e}")
+            return {}
+
     def update_civilization(self, user_id: str, updates: Dict[str, Any]) -> bool:
         """Update civilization data"""
         try:
@@ -414,9 +839,9 @@ class Database:
             values = []
             
             for field, value in updates.items():
-                if field in ['resources', 'population', 'military', 'territory', 'hyper_items', 'bonuses', 'selected_cards']:
+                if field in CIV_JSON_COLUMNS:
                     set_clauses.append(f"{field} = ?")
-                    values.append(json.dumps(value))
+                    values.append(json_dumps(value))
                 else:
                     set_clauses.append(f"{field} = ?")
                     values.append(value)
@@ -427,47 +852,154 @@ class Database:
             query = f"UPDATE civilizations SET {', '.join(set_clauses)} WHERE user_id = ?"
             cursor.execute(query, values)
             
-            conn.commit()
-            self.upload_database()
+            # Write the stored values through to the cached row
+            self._patch_cached_civilization(user_id, lambda row: row.update(zip(updates.keys(), values)))
+            
+            self.commit()
             return True
             
         except Exception as e:
             logger.error(f"Error updating civilization for user {user_id}: {e}")
             return False
 
-    def get_command_cooldown(self, user_id: str, command: str) -> Optional[datetime]:
-        """Get the last used time for a command, or None if no cooldown"""
+    def patch_civilization_json(self, user_id: str, column: str, changes: Dict[str, Any]) -> bool:
+        """Merge changed keys into one JSON column in SQL, without rewriting the whole civilization"""
+        if column not in CIV_JSON_COLUMNS:
+            raise ValueError(f"{column} is not a JSON column")
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT last_used_at FROM cooldowns 
-                WHERE user_id = ? AND command = ?
-            ''', (user_id, command))
+            cursor.execute(f'''
+                UPDATE civilizations SET {column} = json_patch({column}, ?), last_active = CURRENT_TIMESTAMP
+                WHERE user_id = ?
+            ''', (json_dumps(changes), user_id))
+            if cursor.rowcount == 0:
+                return False
             
-            row = cursor.fetchone()
+            # Apply the same delta to the cached row
+            def patch(row):
+                value = json_loads(row[column])
+                value.update(changes)
+                row[column] = json_dumps(value)
+            self._patch_cached_civilization(user_id, patch)
+            
+            self.commit()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error patching {column} for user {user_id}: {e}")
+            return False
+
+    def spend_resources(self, user_id: str, costs: Dict[str, int]) -> bool:
+        """Deduct costs in one conditional UPDATE; nothing is spent unless every cost is covered"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            # Resources the civilization doesn't track are skipped, as update_resources does
+            new_resources = 'resources'
+            set_params = []
+            conditions = []
+            where_params = []
+            for resource, cost in costs.items():
+                path = f'$.{resource}'
+                new_resources = f"json_replace({new_resources}, ?, json_extract(resources, ?) - ?)"
+                set_params.extend((path, path, cost))
+                conditions.append("(json_extract(resources, ?) IS NULL OR json_extract(resources, ?) >= ?)")
+                where_params.extend((path, path, cost))
+            
+            cursor.execute(f'''
+                UPDATE civilizations SET resources = {new_resources}, last_active = CURRENT_TIMESTAMP
+                WHERE user_id = ? AND {' AND '.join(conditions) or '1'}
+            ''', set_params + [user_id] + where_params)
+            if cursor.rowcount == 0:
+                return False
+            
+            # Apply the same deduction to the cached row
+            def patch(row):
+                resources = json_loads(row['resources'])
+                for resource, cost in costs.items():
+                    if resource in resources:
+                        resources[resource] -= cost
+                row['resources'] = json_dumps(resources)
+            self._patch_cached_civilization(user_id, patch)
+            
+            self.commit()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error spending resources for user {user_id}: {e}")
+            return False
+
+    def get_command_cooldown(self, user_id: str, command: str) -> Optional[datetime]:
+        """Get the last used time for a command, or None if no cooldown"""
+        try:
+            row = self.get_connection().execute(self.SQL_GET_COOLDOWN, (user_id, command)).fetchone()
             if row:
-                return datetime.fromisoformat(row['last_used_at'])
+                return row['last_used_at']
             return None
             
         except Exception as e:
             logger.error(f"Error getting command cooldown: {e}")
             return None
 
-    def check_cooldown(self, user_id: str, command: str) -> Optional[datetime]:
-        """Check if command is on cooldown - returns expiry time if on cooldown, None if available"""
+    def get_civilization_with_cooldown(self, user_id: str, command: str, minutes: int) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+        """Get a user's civilization and seconds left on a command's cooldown in one query"""
         try:
-            last_used = self.get_command_cooldown(user_id, command)
-            if last_used:
-                # Return the last used time - your utils.py will calculate if it's expired
-                return last_used
+            with self.civ_cache_lock:
+                cached = self.civ_cache.get(user_id)
+                if cached is not None:
+                    self.civ_cache.move_to_end(user_id)
+            
+            # Cached civilizations only need the cooldown lookup
+            if cached is not None:
+                remaining = (self._pending_cooldown_remaining(user_id, command, minutes)
+                             or self.check_cooldown(user_id, command, minutes))
+                return self._decode_civilization(cached), remaining
+            
+            row = self.get_connection().execute(
+                self.SQL_GET_CIVILIZATION_WITH_COOLDOWN, (minutes, user_id, command)
+            ).fetchone()
+            remaining = self._pending_cooldown_remaining(user_id, command, minutes) or row['cooldown_remaining']
+            civ = None
+            if row['user_id'] is not None:
+                # Keep the row so the command's own get_civilization is a cache hit
+                civ_row = dict(row)
+                del civ_row['cooldown_remaining']
+                self._cache_civilization(user_id, civ_row)
+                civ = self._decode_civilization(civ_row)
+            return civ, remaining if remaining and remaining > 0 else None
+            
+        except Exception as e:
+            logger.error(f"Error getting civilization and cooldown for user {user_id}: {e}")
+            return None, None
+
+    def _pending_cooldown_remaining(self, user_id: str, command: str, minutes: int) -> Optional[int]:
+        """Seconds left on a cooldown that is queued but not yet written"""
+        started = self._thread_pending_cooldowns().get((user_id, command))
+        if started is None:
+            return None
+        remaining = int(minutes * 60 - (datetime.utcnow() - started).total_seconds())
+        return remaining if remaining > 0 else None
+
+    def check_cooldown(self, user_id: str, command: str, minutes: int) -> Optional[int]:
+        """Check if command is on cooldown - returns seconds remaining if on cooldown, None if available"""
+        try:
+            # SQLite does the time math and hands back the integer we need
+            row = self.get_connection().execute(self.SQL_COOLDOWN_REMAINING, (minutes, user_id, command)).fetchone()
+            if row and row[0] > 0:
+                return row[0]
             return None
             
         except Exception as e:
             logger.error(f"Error checking command cooldown: {e}")
             return None
 
+    def set_cooldown(self, user_id: str, command: str, minutes: int = None) -> bool:
+        """Start a command's cooldown now; its length is applied when it is checked"""
+        return self.set_command_cooldown(user_id, command)
+
     def set_command_cooldown(self, user_id: str, command: str, timestamp: datetime = None) -> bool:
         """Set the last used time for a command"""
         try:
@@ -477,19 +1009,93 @@ class Database:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            cursor.execute('''
-                INSERT OR REPLACE INTO cooldowns (user_id, command, last_used_at)
-                VALUES (?, ?, ?)
-            ''', (user_id, command, timestamp.isoformat()))
+            # Prune this user's cooldowns that can no longer block anything
+            cutoff = timestamp - timedelta(minutes=MAX_COOLDOWN_MINUTES)
+            cursor.execute(self.SQL_PRUNE_COOLDOWNS, (user_id, cutoff.strftime(SQL_TIMESTAMP_FORMAT)))
+            cursor.execute(self.SQL_SET_COOLDOWN, (user_id, command, timestamp.strftime(SQL_TIMESTAMP_FORMAT)))
             
-            conn.commit()
-            self.upload_database()
+            self.commit()
             return True
             
         except Exception as e:
             logger.error(f"Error setting command cooldown: {e}")
             return False
 
+    def try_start_cooldown(self, user_id: str, command: str, minutes: int) -> Optional[int]:
+        """Start a command's cooldown unless one is running - returns seconds remaining if it is, None once started"""
+        try:
+            remaining = self._pending_cooldown_remaining(user_id, command, minutes)
+            if remaining:
+                return remaining
+            
+            started = bool(self.get_connection().execute(
+                self.SQL_CLAIM_COOLDOWN,
+                (user_id, command, datetime.utcnow().strftime(SQL_TIMESTAMP_FORMAT), minutes)
+            ).fetchall())
+            self.commit()
+            if started:
+                return None
+            
+            # Lost to a running cooldown; if it lapsed since, still refuse rather than run unclaimed
+            return self.check_cooldown(user_id, command, minutes) or 1
+            
+        except Exception as e:
+            logger.error(f"Error starting command cooldown: {e}")
+            return COOLDOWN_ERROR_RETRY_SECONDS
+
+    def clear_cooldown(self, user_id: str, command: str) -> bool:
+        """Remove a command's cooldown"""
+        try:
+            self.get_connection().execute(self.SQL_CLEAR_COOLDOWN, (user_id, command))
+            self.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error clearing command cooldown: {e}")
+            return False
+
+    def _thread_pending_cooldowns(self) -> Dict[Tuple[str, str], datetime]:
+        """Cooldowns this thread has started but not yet committed, (user_id, command) -> start time"""
+        pending = getattr(self.local, 'pending_cooldowns', None)
+        if pending is None:
+            pending = self.local.pending_cooldowns = {}
+        return pending
+
+    def queue_command_cooldown(self, user_id: str, command: str):
+        """Start a command's cooldown now and write it with this thread's next commit"""
+        self._thread_pending_cooldowns()[(user_id, command)] = datetime.utcnow()
+
+    def flush_cooldowns(self):
+        """Commit this thread's queued cooldowns that no other write has picked up"""
+        if self._thread_pending_cooldowns() and not getattr(self.local, 'transaction_depth', 0):
+            try:
+                self.commit()
+            except Exception as e:
+                logger.error(f"Error flushing queued cooldowns: {e}")
+
+    def _write_pending_cooldowns(self, conn) -> bool:
+        """Add this thread's queued cooldowns to the transaction about to be committed"""
+        pending = self._thread_pending_cooldowns()
+        if not pending:
+            return False
+        # Under a savepoint a failed write leaves nothing behind and the queue is retried
+        conn.execute('SAVEPOINT pending_cooldowns')
+        try:
+            conn.executemany(self.SQL_PRUNE_COOLDOWNS, [
+                (user_id, (timestamp - timedelta(minutes=MAX_COOLDOWN_MINUTES)).strftime(SQL_TIMESTAMP_FORMAT))
+                for (user_id, command), timestamp in pending.items()
+            ])
+            conn.executemany(self.SQL_SET_COOLDOWN, [
+                (user_id, command, timestamp.strftime(SQL_TIMESTAMP_FORMAT))
+                for (user_id, command), timestamp in pending.items()
+            ])
+        except Exception as e:
+            conn.execute('ROLLBACK TO pending_cooldowns')
+            conn.execute('RELEASE pending_cooldowns')
+            logger.error(f"Error writing queued cooldowns, keeping them for the next commit: {e}")
+            return False
+        conn.execute('RELEASE pending_cooldowns')
+        return True
+
     def update_cooldown(self, user_id: str, command: str, timestamp: datetime = None) -> bool:
         """Update cooldown - alias for set_command_cooldown for compatibility"""
         return self.set_command_cooldown(user_id, command, timestamp)
@@ -525,10 +1131,9 @@ class Database:
             cursor.execute('''
                 INSERT OR REPLACE INTO cards (user_id, tech_level, available_cards, status)
                 VALUES (?, ?, ?, ?)
-            ''', (user_id, tech_level, json.dumps(available_cards), 'pending'))
+            ''', (user_id, tech_level, json_dumps(available_cards), 'pending'))
             
-            conn.commit()
-            self.upload_database()
+            self.commit()
             logger.info(f"Generated card selection for user {user_id} at tech level {tech_level}")
             return True
             
@@ -550,7 +1155,7 @@ class Database:
             row = cursor.fetchone()
             if row:
                 card_data = dict(row)
-                card_data['available_cards'] = json.loads(card_data['available_cards'])
+                card_data['available_cards'] = json_loads(card_data['available_cards'])
                 return card_data
             return None
             
@@ -577,8 +1182,7 @@ class Database:
                 WHERE user_id = ? AND tech_level = ?
             ''', (user_id, tech_level))
             
-            conn.commit()
-            self.upload_database()
+            self.commit()
             logger.info(f"User {user_id} selected card '{card_name}' at tech level {tech_level}")
             return selected_card
             
@@ -586,6 +1190,37 @@ class Database:
             logger.error(f"Error selecting card for user {user_id}: {e}")
             return None
 
+    def roll_civilizations_page(self, chance: float, anarchy_chance: float, after_user_id: str = '',
+                                batch_size: int = EVENT_ROLL_BATCH_SIZE) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Roll an event chance in SQL for the next page of civilizations after after_user_id,
+        returning the hits and the page's last user_id (None once every civilization was rolled)"""
+        try:
+            cursor = self.get_connection().cursor()
+            
+            # random() % 10000 is a uniform roll in basis points
+            cursor.execute('''
+                SELECT * FROM (
+                    SELECT * FROM civilizations
+                    WHERE user_id > ?
+                    ORDER BY user_id
+                    LIMIT ?
+                )
+                WHERE abs(random() % 10000) < CASE WHEN ideology = 'anarchy' THEN ? ELSE ? END
+            ''', (after_user_id, batch_size, int(anarchy_chance * 10000), int(chance * 10000)))
+            hits = [self._decode_civilization(row) for row in cursor.fetchall()]
+            
+            # Advance past the whole page, not just the last hit
+            cursor.execute('''
+                SELECT max(user_id) FROM (
+                    SELECT user_id FROM civilizations WHERE user_id > ? ORDER BY user_id LIMIT ?
+                )
+            ''', (after_user_id, batch_size))
+            return hits, cursor.fetchone()[0]
+            
+        except Exception as e:
+            logger.error(f"Error rolling events for civilizations: {e}")
+            return [], None
+
     def get_all_civilizations(self) -> List[Dict[str, Any]]:
         """Get all civilizations for leaderboards"""
         try:
@@ -597,15 +1232,7 @@ class Database:
             
             civilizations = []
             for row in rows:
-                civ = dict(row)
-                civ['resources'] = json.loads(civ['resources'])
-                civ['population'] = json.loads(civ['population'])
-                civ['military'] = json.loads(civ['military'])
-                civ['territory'] = json.loads(civ['territory'])
-                civ['hyper_items'] = json.loads(civ['hyper_items'])
-                civ['bonuses'] = json.loads(civ['bonuses'])
-                civ['selected_cards'] = json.loads(civ['selected_cards'])
-                civilizations.append(civ)
+                civilizations.append(self._decode_civilization(row))
             
             return civilizations
             
@@ -622,10 +1249,10 @@ class Database:
             cursor.execute('''
                 INSERT INTO alliances (name, leader_id, members, description)
                 VALUES (?, ?, ?, ?)
-            ''', (name, leader_id, json.dumps([leader_id]), description))
+            ''', (name, leader_id, json_dumps([leader_id]), description))
             
-            conn.commit()
-            self.upload_database()
+            self.invalidate_alliances()
+            self.commit()
             logger.info(f"Created alliance '{name}' led by {leader_id}")
             return True
             
@@ -637,26 +1264,55 @@ class Database:
             return False
 
     def log_event(self, user_id: str, event_type: str, title: str, description: str, effects: Dict = None):
-        """Log an event to the database"""
+        """Queue an event for the log; it is written with this thread's next commit"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO events (user_id, event_type, title, description, effects)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (user_id, event_type, title, description, json.dumps(effects or {})))
-            
-            conn.commit()
-            self.upload_database()
-            logger.debug(f"Logged event: {title} for user {user_id}")
+            pending = self._thread_pending_events()
+            pending.append((user_id, event_type, title, description,
+                            json_dumps(effects or {}), datetime.utcnow().strftime(SQL_TIMESTAMP_FORMAT)))
+            if len(pending) >= EVENT_LOG_BATCH_SIZE:
+                self.commit()
+            logger.debug("Logged event: %s for user %s", title, user_id)
             
         except Exception as e:
             logger.error(f"Error logging event: {e}")
 
+    def _thread_pending_events(self) -> List[tuple]:
+        """Event log rows this thread has queued but not yet committed"""
+        pending = getattr(self.local, 'pending_events', None)
+        if pending is None:
+            pending = self.local.pending_events = []
+        return pending
+
+    def flush_events(self):
+        """Commit this thread's queued event log rows that no other write has picked up"""
+        if self._thread_pending_events() and not getattr(self.local, 'transaction_depth', 0):
+            try:
+                self.commit()
+            except Exception as e:
+                logger.error(f"Error flushing queued events: {e}")
+
+    def _write_pending_events(self, conn) -> bool:
+        """Add this thread's queued event rows to the transaction about to be committed"""
+        pending = self._thread_pending_events()
+        if not pending:
+            return False
+        # A savepoint keeps a failed batch from leaving half its rows behind,
+        # so the whole queue can be retried by the next commit
+        conn.execute('SAVEPOINT pending_events')
+        try:
+            conn.executemany(self.SQL_INSERT_EVENT, pending)
+        except Exception as e:
+            conn.execute('ROLLBACK TO pending_events')
+            conn.execute('RELEASE pending_events')
+            logger.error(f"Error writing queued events, keeping them for the next commit: {e}")
+            return False
+        conn.execute('RELEASE pending_events')
+        return True
+
     def get_recent_events(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Get recent events for dashboard"""
         try:
+            self.flush_events()
             conn = self.get_connection()
             cursor = conn.cursor()
             
@@ -672,7 +1328,7 @@ class Database:
             events = []
             for row in rows:
                 event = dict(row)
-                event['effects'] = json.loads(event['effects'])
+                event['effects'] = json_loads(event['effects'])
                 events.append(event)
             
             return events
@@ -686,12 +1342,14 @@ class Database:
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
+            # Drop the recipient's expired rows while we are writing anyway
+            cursor.execute('DELETE FROM trade_requests WHERE recipient_id = ? AND expires_at <= CURRENT_TIMESTAMP',
+                           (recipient_id,))
             cursor.execute('''
                 INSERT INTO trade_requests (sender_id, recipient_id, offer, request)
                 VALUES (?, ?, ?, ?)
-            ''', (sender_id, recipient_id, json.dumps(offer), json.dumps(request)))
-            conn.commit()
-            self.upload_database()
+            ''', (sender_id, recipient_id, json_dumps(offer), json_dumps(request)))
+            self.commit()
             logger.info(f"Trade request created from {sender_id} to {recipient_id}")
             return True
         except Exception as e:
@@ -713,8 +1371,8 @@ class Database:
             requests = []
             for row in rows:
                 req = dict(row)
-                req['offer'] = json.loads(req['offer'])
-                req['request'] = json.loads(req['request'])
+                req['offer'] = json_loads(req['offer'])
+                req['request'] = json_loads(req['request'])
                 requests.append(req)
             return requests
         except Exception as e:
@@ -733,8 +1391,8 @@ class Database:
             row = cursor.fetchone()
             if row:
                 req = dict(row)
-                req['offer'] = json.loads(req['offer'])
-                req['request'] = json.loads(req['request'])
+                req['offer'] = json_loads(req['offer'])
+                req['request'] = json_loads(req['request'])
                 return req
             return None
         except Exception as e:
@@ -747,8 +1405,7 @@ class Database:
             conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute('DELETE FROM trade_requests WHERE id = ?', (request_id,))
-            conn.commit()
-            self.upload_database()
+            self.commit()
             return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"Error deleting trade request: {e}")
@@ -759,12 +1416,14 @@ class Database:
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
+            # Drop the recipient's expired rows while we are writing anyway
+            cursor.execute('DELETE FROM alliance_invitations WHERE recipient_id = ? AND expires_at <= CURRENT_TIMESTAMP',
+                           (recipient_id,))
             cursor.execute('''
                 INSERT INTO alliance_invitations (alliance_id, sender_id, recipient_id)
                 VALUES (?, ?, ?)
             ''', (alliance_id, sender_id, recipient_id))
-            conn.commit()
-            self.upload_database()
+            self.commit()
             logger.info(f"Alliance invite created: alliance={alliance_id} to {recipient_id}")
             return True
         except Exception as e:
@@ -810,8 +1469,7 @@ class Database:
             conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute('DELETE FROM alliance_invitations WHERE id = ?', (invite_id,))
-            conn.commit()
-            self.upload_database()
+            self.commit()
             return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"Error deleting alliance invite: {e}")
@@ -822,30 +1480,34 @@ class Database:
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
+            # Drop the recipient's expired rows while we are writing anyway
+            cursor.execute('DELETE FROM messages WHERE recipient_id = ? AND expires_at <= CURRENT_TIMESTAMP',
+                           (recipient_id,))
             cursor.execute('''
                 INSERT INTO messages (sender_id, recipient_id, message)
                 VALUES (?, ?, ?)
             ''', (sender_id, recipient_id, message))
-            conn.commit()
-            self.upload_database()
+            self.commit()
             logger.info(f"Message sent from {sender_id} to {recipient_id}")
             return True
         except Exception as e:
             logger.error(f"Error sending message: {e}")
             return False
 
-    def get_messages(self, user_id: str) -> List[Dict]:
-        """Get active messages for a user"""
+    def get_messages(self, user_id: str, limit: int = -1) -> List[Dict]:
+        """Get active messages for a user, newest first; created_epoch is created_at in Unix seconds"""
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT m.*, c.name as sender_name 
+                SELECT m.*, c.name as sender_name,
+                       CAST(strftime('%s', m.created_at) AS INTEGER) AS created_epoch
                 FROM messages m
                 JOIN civilizations c ON m.sender_id = c.user_id
                 WHERE recipient_id = ? AND expires_at > CURRENT_TIMESTAMP
                 ORDER BY created_at DESC
-            ''', (user_id,))
+                LIMIT ?
+            ''', (user_id, limit))
             return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Error getting messages: {e}")
@@ -857,8 +1519,7 @@ class Database:
             conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute('DELETE FROM messages WHERE id = ?', (message_id,))
-            conn.commit()
-            self.upload_database()
+            self.commit()
             return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"Error deleting message: {e}")
@@ -869,12 +1530,12 @@ class Database:
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM alliances WHERE id = ?', (alliance_id,))
+            cursor.execute(self.SQL_GET_ALLIANCE, (alliance_id,))
             row = cursor.fetchone()
             if row:
                 alliance = dict(row)
-                alliance['members'] = json.loads(alliance['members'])
-                alliance['join_requests'] = json.loads(alliance['join_requests'])
+                alliance['members'] = json_loads(alliance['members'])
+                alliance['join_requests'] = json_loads(alliance['join_requests'])
                 return alliance
             return None
         except Exception as e:
@@ -886,18 +1547,55 @@ class Database:
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM alliances WHERE name = ?', (name,))
+            cursor.execute(self.SQL_GET_ALLIANCE_BY_NAME, (name,))
             row = cursor.fetchone()
             if row:
                 alliance = dict(row)
-                alliance['members'] = json.loads(alliance['members'])
-                alliance['join_requests'] = json.loads(alliance['join_requests'])
+                alliance['members'] = json_loads(alliance['members'])
+                alliance['join_requests'] = json_loads(alliance['join_requests'])
                 return alliance
             return None
         except Exception as e:
             logger.error(f"Error getting alliance by name: {e}")
             return None
 
+    def get_user_alliance(self, user_id: str) -> Optional[Dict]:
+        """Get the alliance a user belongs to, remembering the answer until alliances change"""
+        try:
+            with self.civ_cache_lock:
+                if user_id in self.user_alliances:
+                    self.user_alliances.move_to_end(user_id)
+                    alliance = self.user_alliances[user_id]
+                    return dict(alliance) if alliance else None
+            
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(self.SQL_GET_USER_ALLIANCE, (user_id,))
+            row = cursor.fetchone()
+            alliance = dict(row) if row else None
+            
+            with self.civ_cache_lock:
+                self.user_alliances[user_id] = alliance
+                if len(self.user_alliances) > USER_ALLIANCE_CACHE_SIZE:
+                    self.user_alliances.popitem(last=False)
+            return dict(alliance) if alliance else None
+        except Exception as e:
+            logger.error(f"Error getting alliance for user {user_id}: {e}")
+            return None
+
+    def are_allied(self, user_id: str, other_id: str) -> bool:
+        """Check whether two users share an alliance"""
+        try:
+            return bool(self.get_connection().execute(self.SQL_ARE_ALLIED, (user_id, other_id)).fetchone()[0])
+        except Exception as e:
+            logger.error(f"Error checking alliance between {user_id} and {other_id}: {e}")
+            return False
+
+    def invalidate_alliances(self):
+        """Forget cached alliance memberships after any alliance write"""
+        with self.civ_cache_lock:
+            self.user_alliances.clear()
+
     def add_alliance_member(self, alliance_id: int, user_id: str) -> bool:
         """Add member to alliance"""
         try:
@@ -917,10 +1615,10 @@ class Database:
                 UPDATE alliances 
                 SET members = ?, join_requests = ?
                 WHERE id = ?
-            ''', (json.dumps(members), json.dumps(join_requests), alliance_id))
+            ''', (json_dumps(members), json_dumps(join_requests), alliance_id))
             
-            conn.commit()
-            self.upload_database()
+            self.invalidate_alliances()
+            self.commit()
             return True
         except Exception as e:
             logger.error(f"Error adding alliance member: {e}")
@@ -933,6 +1631,8 @@ class Database:
             cursor = conn.cursor()
             
             if user_id:
+                # One index probe per side; a civilization never fights itself, so the
+                # branches are disjoint and UNION ALL needs no duplicate-removal pass
                 cursor.execute('''
                     SELECT w.*, 
                            ac.name as attacker_name, 
@@ -940,8 +1640,16 @@ class Database:
                     FROM wars w
                     JOIN civilizations ac ON w.attacker_id = ac.user_id
                     JOIN civilizations dc ON w.defender_id = dc.user_id
-                    WHERE (w.attacker_id = ? OR w.defender_id = ?) AND w.result = ?
-                ''', (user_id, user_id, status))
+                    WHERE w.attacker_id = ? AND w.result = ?
+                    UNION ALL
+                    SELECT w.*, 
+                           ac.name as attacker_name, 
+                           dc.name as defender_name
+                    FROM wars w
+                    JOIN civilizations ac ON w.attacker_id = ac.user_id
+                    JOIN civilizations dc ON w.defender_id = dc.user_id
+                    WHERE w.defender_id = ? AND w.attacker_id != ? AND w.result = ?
+                ''', (user_id, status, user_id, user_id, status))
             else:
                 cursor.execute('''
                     SELECT w.*, 
@@ -958,6 +1666,18 @@ class Database:
             logger.error(f"Error getting wars: {e}")
             return []
 
+    def get_war_and_peace_offer(self, offerer_id: str, receiver_id: str) -> Tuple[Optional[int], Optional[int]]:
+        """Get the ongoing war between two civilizations and the pending peace offer from one to the other in one query"""
+        try:
+            cursor = self.get_connection().cursor()
+            cursor.execute(self.SQL_GET_WAR_AND_PEACE_OFFER,
+                           (offerer_id, receiver_id, receiver_id, offerer_id, offerer_id, receiver_id))
+            row = cursor.fetchone()
+            return row['war_id'], row['offer_id']
+        except Exception as e:
+            logger.error(f"Error getting war and peace offer: {e}")
+            return None, None
+
     def get_peace_offers(self, user_id: str = None) -> List[Dict]:
         """Get peace offers for a user or all peace offers"""
         try:
@@ -999,8 +1719,7 @@ class Database:
                 INSERT INTO peace_offers (offerer_id, receiver_id)
                 VALUES (?, ?)
             ''', (offerer_id, receiver_id))
-            conn.commit()
-            self.upload_database()
+            self.commit()
             logger.info(f"Peace offer created from {offerer_id} to {receiver_id}")
             return True
         except Exception as e:
@@ -1017,8 +1736,7 @@ class Database:
                 SET status = ?, responded_at = CURRENT_TIMESTAMP
                 WHERE id = ?
             ''', (status, offer_id))
-            conn.commit()
-            self.upload_database()
+            self.commit()
             return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"Error updating peace offer: {e}")
@@ -1036,8 +1754,7 @@ class Database:
                 AND result = 'ongoing'
             ''', (result, attacker_id, defender_id, defender_id, attacker_id))
             
-            conn.commit()
-            self.upload_database()
+            self.commit()
             return cursor.rowcount > 0
         except Exception as e:
             logger.error(f"Error ending war: {e}")
@@ -1070,6 +1787,7 @@ class Database:
             }
             
             # Get recent events
+            self.flush_events()
             cursor.execute('''
                 SELECT COUNT(*) as total_events
                 FROM events 
@@ -1120,9 +1838,9 @@ class Database:
                 civs = []
                 for row in cursor.fetchall():
                     civ = dict(row)
-                    resources = json.loads(civ['resources'])
-                    military = json.loads(civ['military'])
-                    territory = json.loads(civ['territory'])
+                    resources = json_loads(civ['resources'])
+                    military = json_loads(civ['military'])
+                    territory = json_loads(civ['territory'])
                     
                     military_power = (military['soldiers'] * 10 + 
                                     military['spies'] * 5 + 
@@ -1153,7 +1871,7 @@ class Database:
                 civs = []
                 for row in cursor.fetchall():
                     civ = dict(row)
-                    resources = json.loads(civ['resources'])
+                    resources = json_loads(civ['resources'])
                     civs.append({
                         'user_id': civ['user_id'],
                         'name': civ['name'],
@@ -1172,7 +1890,7 @@ class Database:
                 civs = []
                 for row in cursor.fetchall():
                     civ = dict(row)
-                    military = json.loads(civ['military'])
+                    military = json_loads(civ['military'])
                     total_units = military['soldiers'] + military['spies']
                     civs.append({
                         'user_id': civ['user_id'],
@@ -1194,7 +1912,7 @@ class Database:
                 civs = []
                 for row in cursor.fetchall():
                     civ = dict(row)
-                    territory = json.loads(civ['territory'])
+                    territory = json_loads(civ['territory'])
                     civs.append({
                         'user_id': civ['user_id'],
                         'name': civ['name'],
@@ -1223,8 +1941,7 @@ class Database:
             cursor.execute('DELETE FROM messages WHERE expires_at <= CURRENT_TIMESTAMP')
             message_count = cursor.rowcount
             
-            conn.commit()
-            self.upload_database()
+            self.commit()
             logger.info(f"Cleaned up expired requests: "
                        f"{trade_count} trades, {invite_count} invites, "
                        f"{message_count} messages removed")
@@ -1241,8 +1958,7 @@ class Database:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 backup_path = f"nationbot_backup_{timestamp}.db"
             
-            import shutil
-            shutil.copy2(self.db_path, backup_path)
+            self.snapshot_database(backup_path)
             logger.info(f"Database backed up locally to {backup_path}")
             
             if self.dropbox_client:
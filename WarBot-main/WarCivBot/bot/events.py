@@ -1,13 +1,38 @@
 import random
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
 import guilded
 from bot.utils import format_number, create_embed
+from bot.civilization import CivilizationManager
 
 logger = logging.getLogger(__name__)
 
+# Which civilization field group each event effect belongs to
+EFFECT_CATEGORIES = {
+    'gold': 'resources', 'food': 'resources', 'wood': 'resources', 'stone': 'resources',
+    'citizens': 'population', 'happiness': 'population', 'hunger': 'population',
+    'soldiers': 'military', 'spies': 'military', 'tech_level': 'military',
+    'land_size': 'territory',
+}
+
+# Display and scoring tables for event notifications, built once at import
+EFFECT_ICONS = {
+    'gold': '🪙', 'food': '🌾', 'wood': '🪵', 'stone': '🪨',
+    'citizens': '👤', 'happiness': '😊', 'hunger': '🍽️',
+    'soldiers': '⚔️', 'spies': '🕵️', 'tech_level': '🔬',
+    'land_size': '🏞️'
+}
+EFFECT_LABELS = {effect: effect.replace('_', ' ').title() for effect in EFFECT_ICONS}
+POSITIVE_EFFECTS = frozenset(['gold', 'food', 'wood', 'stone', 'citizens', 'happiness', 'soldiers', 'spies', 'tech_level', 'land_size'])
+NEGATIVE_EFFECTS = frozenset(['hunger'])
+
 class EventManager:
+    # Chance of a local event per civilization each 30-minute cycle
+    LOCAL_EVENT_CHANCE = 0.15
+    EVENT_CHECK_INTERVAL = 1800  # Check every 30 minutes
+
     def __init__(self, db):
         self.db = db
         self.running = False
@@ -218,6 +243,22 @@ class EventManager:
                 }
             ]
         }
+        
+        # Weighted local event pools per ideology, built once instead of on every roll
+        self.default_event_pool = self._build_event_pool(self.local_events)
+        self.ideology_event_pools = {
+            ideology: self._build_event_pool(self.local_events + events)
+            for ideology, events in self.ideology_events.items()
+        }
+        
+        # Effect category handlers, dispatched by EFFECT_CATEGORIES
+        self.civ_manager = CivilizationManager(db)
+        self.effect_handlers = {
+            'resources': self.civ_manager.update_resources,
+            'population': self.civ_manager.update_population,
+            'military': self.civ_manager.update_military,
+            'territory': self._update_territory,
+        }
 
     async def start_random_events(self, bot):
         """Start the random events loop"""
@@ -227,15 +268,19 @@ class EventManager:
         self.running = True
         logger.info("Random events system started")
         
+        # Schedule against a monotonic target so processing time doesn't push later checks back
+        next_run = time.monotonic() + self.EVENT_CHECK_INTERVAL
         while self.running:
             try:
-                await asyncio.sleep(1800)  # Check every 30 minutes
+                await asyncio.sleep(max(0, next_run - time.monotonic()))
+                next_run += self.EVENT_CHECK_INTERVAL
                 await self.process_random_events(bot)
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Error in random events loop: {e}")
                 await asyncio.sleep(300)  # Wait 5 minutes before retrying
+                next_run = max(next_run, time.monotonic())
 
     def stop_random_events(self):
         """Stop the random events loop"""
@@ -245,33 +290,63 @@ class EventManager:
     async def process_random_events(self, bot):
         """Process random events for all civilizations"""
         try:
-            # Get all active civilizations
-            civilizations = self.db.get_all_civilizations()
-            
-            if not civilizations:
-                return
-                
             # Check for global events first
-            await self._check_global_events(bot, civilizations)
+            await self._check_global_events(bot)
             
-            # Process local events for each civilization
-            for civ in civilizations:
-                await self._check_local_events(bot, civ)
+            # Roll inside SQLite so only the civilizations that were hit are loaded
+            triggered = await self._apply_to_civilization_pages(
+                self.LOCAL_EVENT_CHANCE,
+                self.LOCAL_EVENT_CHANCE * self._get_anarchy_modifier(),
+                self._apply_local_event
+            )
+                        
+            await asyncio.gather(*(self._notify_user_of_event(bot, civ['user_id'], event) for civ, event in triggered))
                 
         except Exception as e:
             logger.error(f"Error processing random events: {e}")
 
-    async def _check_global_events(self, bot, civilizations):
+    async def _apply_to_civilization_pages(self, chance, anarchy_chance, apply):
+        """Roll civilizations page by page and apply each hit, returning (civ, result) for truthy results"""
+        # Pages are read on a worker thread so walking every civilization never stalls the
+        # gateway; writes stay on the event loop with the commands' own, one commit per page,
+        # so an event and a command never rewrite the same row at once
+        triggered = []
+        after_user_id = ''
+        while after_user_id is not None:
+            hit_civs, after_user_id = await asyncio.to_thread(
+                self.db.roll_civilizations_page, chance, anarchy_chance, after_user_id
+            )
+            if not hit_civs:
+                continue
+            
+            # Only hits from pages that committed are reported
+            try:
+                with self.db.transaction():
+                    page_triggered = []
+                    for civ in hit_civs:
+                        result = apply(civ)
+                        if result:
+                            page_triggered.append((civ, result))
+            except Exception as e:
+                logger.error(f"Error applying a page of random events: {e}")
+                continue
+            triggered.extend(page_triggered)
+        return triggered
+
+    async def _check_global_events(self, bot):
         """Check and process global events"""
         for event in self.global_events:
             if random.random() < event["probability"]:
                 if event.get("global", False):
-                    # Apply to all civilizations
-                    affected_civs = []
-                    for civ in civilizations:
-                        self._apply_event_effects(civ['user_id'], event["effects"])
-                        affected_civs.append(civ['name'])
-                        
+                    # Every civilization is hit; walk them on the same paged path as local events
+                    def apply(civ, effects=event["effects"]):
+                        self._apply_event_effects(civ['user_id'], effects, civ)
+                        return True
+                    
+                    affected_civs = await self._apply_to_civilization_pages(1.0, 1.0, apply)
+                    if not affected_civs:
+                        return
+                    
                     # Log global event
                     self.db.log_event(None, "global_event", event["name"], event["description"])
                     
@@ -279,9 +354,13 @@ class EventManager:
                     logger.info(f"Global event triggered: {event['name']} - {len(affected_civs)} civilizations affected")
                     
                 else:
-                    # Apply to random civilization
-                    target_civ = random.choice(civilizations)
-                    self._apply_event_effects(target_civ['user_id'], event["effects"])
+                    # Apply to random civilization, picked from the in-memory id set
+                    civ_ids = self.db.get_civilization_ids()
+                    target_civ = self.db.get_civilization(random.choice(civ_ids)) if civ_ids else None
+                    if not target_civ:
+                        return
+                        
+                    self._apply_event_effects(target_civ['user_id'], event["effects"], target_civ)
                     self.db.log_event(target_civ['user_id'], "global_event", event["name"], event["description"])
                     
                     # Try to notify the affected user
@@ -289,92 +368,68 @@ class EventManager:
                     
                 break  # Only one global event per cycle
 
-    async def _check_local_events(self, bot, civ):
-        """Check and process local events for a civilization"""
+    def _apply_local_event(self, civ):
+        """Pick and apply a local event for a civilization whose roll hit, returning it"""
         user_id = civ['user_id']
-        ideology = civ.get('ideology', '')
         
-        # Apply ideology modifier to event frequency
-        base_chance = 0.15  # 15% base chance per 30-minute cycle
+        # Choose event type, including ideology-specific events
+        pool = self.ideology_event_pools.get(civ.get('ideology', ''), self.default_event_pool)
+        event = self._select_weighted_event(pool)
         
-        if ideology == 'anarchy':
-            event_modifier = self._get_anarchy_modifier(civ)
-            base_chance *= event_modifier
+        if event:
+            # Apply effects to the row we already loaded
+            self._apply_event_effects(user_id, event["effects"], civ)
             
-        if random.random() < base_chance:
-            # Choose event type
-            available_events = self.local_events.copy()
-            
-            # Add ideology-specific events
-            if ideology in self.ideology_events:
-                available_events.extend(self.ideology_events[ideology])
-                
-            # Weight events by probability
-            event = self._select_weighted_event(available_events)
+            # Log event
+            self.db.log_event(user_id, "random_event", event["name"], event["description"])
             
-            if event:
-                # Apply effects
-                self._apply_event_effects(user_id, event["effects"])
-                
-                # Log event
-                self.db.log_event(user_id, "random_event", event["name"], event["description"])
-                
-                # Notify user
-                await self._notify_user_of_event(bot, user_id, event)
+        return event
 
-    def _select_weighted_event(self, events):
-        """Select an event based on probability weights"""
-        weighted_events = []
-        for event in events:
-            weight = int(event["probability"] * 1000)  # Convert to integer weight
-            weighted_events.extend([event] * weight)
-            
-        return random.choice(weighted_events) if weighted_events else None
+    def _build_event_pool(self, events):
+        """Pair events with their integer probability weights"""
+        events = tuple(events)
+        weights = tuple(int(event["probability"] * 1000) for event in events)  # Convert to integer weight
+        return events, weights
+
+    def _select_weighted_event(self, pool):
+        """Select an event from a pool based on probability weights"""
+        events, weights = pool
+        return random.choices(events, weights)[0] if any(weights) else None
 
-    def _apply_event_effects(self, user_id, effects):
-        """Apply event effects to a civilization"""
+    def _apply_event_effects(self, user_id, effects, civ=None):
+        """Apply event effects to a civilization, loading it unless already given"""
         try:
-            civ = self.db.get_civilization(user_id)
+            if civ is None:
+                civ = self.db.get_civilization(user_id)
             if not civ:
                 return
                 
             # Separate effects by category
-            resource_effects = {}
-            population_effects = {}
-            military_effects = {}
-            territory_effects = {}
-            
+            grouped_effects = {}
             for effect, value in effects.items():
-                if effect in ['gold', 'food', 'wood', 'stone']:
-                    resource_effects[effect] = value
-                elif effect in ['citizens', 'happiness', 'hunger']:
-                    population_effects[effect] = value
-                elif effect in ['soldiers', 'spies', 'tech_level']:
-                    military_effects[effect] = value
-                elif effect in ['land_size']:
-                    territory_effects[effect] = value
+                category = EFFECT_CATEGORIES.get(effect)
+                if category:
+                    grouped_effects.setdefault(category, {})[effect] = value
                     
-            # Apply effects using civilization manager methods
-            from bot.civilization import CivilizationManager
-            civ_manager = CivilizationManager(self.db)
-            
-            if resource_effects:
-                civ_manager.update_resources(user_id, resource_effects)
-            if population_effects:
-                civ_manager.update_population(user_id, population_effects)
-            if military_effects:
-                civ_manager.update_military(user_id, military_effects)
-            if territory_effects:
-                # Handle territory updates
-                territory = civ['territory']
-                for effect, value in territory_effects.items():
-                    territory[effect] = max(100, territory.get(effect, 1000) + value)  # Minimum 100 km²
-                self.db.update_civilization(user_id, {"territory": territory})
+            # Apply each group with its handler
+            for category, changes in grouped_effects.items():
+                self.effect_handlers[category](user_id, changes)
                 
         except Exception as e:
             logger.error(f"Error applying event effects for user {user_id}: {e}")
 
-    def _get_anarchy_modifier(self, civ):
+    def _update_territory(self, user_id, territory_changes):
+        """Apply territory effects, keeping at least 100 km² of land"""
+        civ = self.db.get_civilization(user_id)
+        if not civ:
+            return False
+            
+        territory = civ['territory']
+        for effect, value in territory_changes.items():
+            territory[effect] = max(100, territory.get(effect, 1000) + value)  # Minimum 100 km²
+        return self.db.update_civilization(user_id, {"territory": territory})
+
+    def _get_anarchy_modifier(self):
         """Get event frequency modifier for anarchy ideology"""
         # Anarchy causes events to happen twice as often
         return 2.0
@@ -400,24 +455,21 @@ class EventManager:
             await user.send(embed=embed)
             
         except Exception as e:
-            logger.debug(f"Could not notify user {user_id} of event: {e}")
+            logger.debug("Could not notify user %s of event: %s", user_id, e)
 
     def _get_event_color(self, effects):
         """Determine embed color based on event effects"""
         positive_score = 0
         negative_score = 0
         
-        positive_effects = ['gold', 'food', 'wood', 'stone', 'citizens', 'happiness', 'soldiers', 'spies', 'tech_level', 'land_size']
-        negative_effects = ['hunger']
-        
         for effect, value in effects.items():
-            if effect in positive_effects and value > 0:
+            if effect in POSITIVE_EFFECTS and value > 0:
                 positive_score += 1
-            elif effect in positive_effects and value < 0:
+            elif effect in POSITIVE_EFFECTS and value < 0:
                 negative_score += 1
-            elif effect in negative_effects and value > 0:
+            elif effect in NEGATIVE_EFFECTS and value > 0:
                 negative_score += 1
-            elif effect in negative_effects and value < 0:
+            elif effect in NEGATIVE_EFFECTS and value < 0:
                 positive_score += 1
                 
         if positive_score > negative_score:
@@ -431,19 +483,13 @@ class EventManager:
         """Format event effects for display"""
         effect_lines = []
         
-        effect_icons = {
-            'gold': '🪙', 'food': '🌾', 'wood': '🪵', 'stone': '🪨',
-            'citizens': '👤', 'happiness': '😊', 'hunger': '🍽️',
-            'soldiers': '⚔️', 'spies': '🕵️', 'tech_level': '🔬',
-            'land_size': '🏞️'
-        }
-        
         for effect, value in effects.items():
-            icon = effect_icons.get(effect, '📊')
+            icon = EFFECT_ICONS.get(effect, '📊')
+            label = EFFECT_LABELS.get(effect) or effect.replace('_', ' ').title()
             if value > 0:
-                effect_lines.append(f"{icon} +{format_number(value)} {effect.replace('_', ' ').title()}")
+                effect_lines.append(f"{icon} +{format_number(value)} {label}")
             else:
-                effect_lines.append(f"{icon} {format_number(value)} {effect.replace('_', ' ').title()}")
+                effect_lines.append(f"{icon} {format_number(value)} {label}")
                 
         return '\n'.join(effect_lines) if effect_lines else "No direct effects"
 
@@ -1,11 +1,23 @@
 import functools
 import logging
+import re
 from datetime import datetime, timedelta
 from typing import Callable, Any
 import guilded
 
 logger = logging.getLogger(__name__)
 
+# A user mention, <@id> or <@!id>
+MENTION_RE = re.compile(r'<@!?(.+)>')
+
+def get_user_id(ctx) -> str:
+    """The invoking user's id as a string, converted once per command context"""
+    user_id = getattr(ctx, 'cached_user_id', None)
+    if user_id is None:
+        user_id = str(ctx.author.id)
+        ctx.cached_user_id = user_id
+    return user_id
+
 def format_number(number: int) -> str:
     """Format large numbers with appropriate suffixes"""
     if number < 1000:
@@ -17,8 +29,8 @@ def format_number(number: int) -> str:
     else:
         return f"{number/1000000000:.1f}B"
 
-def create_embed(title: str, description: str, color: guilded.Color = None) -> guilded.Embed:
-    """Create a standardized embed for bot responses"""
+def create_embed(title: str, description: str, color: guilded.Color = None, fields=()) -> guilded.Embed:
+    """Create a standardized embed for bot responses, with optional add_field keyword dicts"""
     if color is None:
         color = guilded.Color.blue()
         
@@ -29,6 +41,9 @@ def create_embed(title: str, description: str, color: guilded.Color = None) -> g
         timestamp=datetime.now()
     )
     
+    for field in fields:
+        embed.add_field(**field)
+    
     return embed
 
 def check_cooldown_decorator(minutes: int = 5):
@@ -36,39 +51,33 @@ def check_cooldown_decorator(minutes: int = 5):
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         async def wrapper(self, ctx, *args, **kwargs):
-            user_id = str(ctx.author.id)
+            user_id = get_user_id(ctx)
             command_name = func.__name__
             
-            # Check if user is on cooldown
-            cooldown_expiry = self.db.check_cooldown(user_id, command_name)
+            # Check and start the cooldown in one statement so concurrent uses can't both pass
+            seconds_left = self.db.try_start_cooldown(user_id, command_name, minutes)
             
-            if cooldown_expiry:
-                time_left = cooldown_expiry - datetime.now()
-                if time_left.total_seconds() > 0:
-                    # Format time remaining
-                    time_str = format_time_duration(time_left)
-                    
-                    embed = create_embed(
-                        "⏰ Command on Cooldown",
-                        f"You must wait **{time_str}** before using this command again.",
-                        guilded.Color.orange()
-                    )
-                    await ctx.send(embed=embed)
-                    return
+            if seconds_left:
+                # Format time remaining
+                time_str = format_time_duration(seconds_left)
+                
+                embed = create_embed(
+                    "⏰ Command on Cooldown",
+                    f"You must wait **{time_str}** before using this command again.",
+                    guilded.Color.orange()
+                )
+                await ctx.send(embed=embed)
+                return
                     
             # Execute the command
             try:
-                result = await func(self, ctx, *args, **kwargs)
-                
-                # Set cooldown only if command succeeded (didn't return early with error)
-                self.db.set_cooldown(user_id, command_name, minutes)
-                
-                return result
+                return await func(self, ctx, *args, **kwargs)
                 
             except Exception as e:
                 logger.error(f"Error in command {command_name}: {e}")
                 
-                # Don't set cooldown if command failed
+                # Don't keep the cooldown if command failed
+                self.db.clear_cooldown(user_id, command_name)
                 embed = create_embed(
                     "❌ Command Error",
                     "An error occurred while executing this command. Please try again.",
@@ -76,12 +85,14 @@ def check_cooldown_decorator(minutes: int = 5):
                 )
                 await ctx.send(embed=embed)
                 
+        # Lets the spam pre-check in on_message know how long the cooldown lasts
+        wrapper.cooldown_seconds = minutes * 60
         return wrapper
     return decorator
 
-def format_time_duration(delta: timedelta) -> str:
-    """Format a timedelta into a readable string"""
-    total_seconds = int(delta.total_seconds())
+def format_time_duration(delta) -> str:
+    """Format a timedelta or a number of seconds into a readable string"""
+    total_seconds = int(delta.total_seconds()) if isinstance(delta, timedelta) else int(delta)
     
     if total_seconds < 60:
         return f"{total_seconds} seconds"
@@ -271,14 +282,11 @@ def get_military_strength_description(soldiers: int, spies: int, tech_level: int
     else:
         return "Legendary"
 
+@functools.lru_cache(maxsize=4096)
 def validate_user_mention(mention: str) -> str:
     """Extract user ID from mention string"""
-    if mention.startswith('<@') and mention.endswith('>'):
-        user_id = mention[2:-1]
-        if user_id.startswith('!'):
-            user_id = user_id[1:]
-        return user_id
-    return None
+    match = MENTION_RE.fullmatch(mention)
+    return match.group(1) if match else None
 
 def get_resource_efficiency_bonus(ideology: str, action_type: str) -> float:
     """Get resource efficiency bonus based on ideology and action type"""
@@ -397,18 +405,16 @@ class CooldownManager:
                 
         self.db.set_cooldown(user_id, command, final_minutes)
         
-    def get_cooldown_with_context(self, user_id: str, command: str) -> dict:
+    def get_cooldown_with_context(self, user_id: str, command: str, minutes: int) -> dict:
         """Get cooldown information with additional context"""
-        expiry = self.db.check_cooldown(user_id, command)
+        seconds_left = self.db.check_cooldown(user_id, command, minutes)
         
-        if not expiry:
+        if not seconds_left:
             return {"on_cooldown": False}
             
-        time_left = expiry - datetime.now()
+        time_left = timedelta(seconds=seconds_left)
+        expiry = datetime.utcnow() + time_left
         
-        if time_left.total_seconds() <= 0:
-            return {"on_cooldown": False}
-            
         return {
             "on_cooldown": True,
             "time_left": time_left,
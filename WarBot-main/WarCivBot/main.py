@@ -1,11 +1,18 @@
 import os
+import time
 import asyncio
 import logging
+from collections import defaultdict, deque
 from datetime import datetime, timedelta
 import guilded
 from guilded.ext import commands
-import threading
-from web.dashboard import app as flask_app
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from web.dashboard import start_web_server
 from bot.database import Database
 from bot.civilization import CivilizationManager
 from bot.commands.basic import BasicCommands
@@ -31,6 +38,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Commands whose own cooldown ends within this window are dropped silently
+SPAM_WINDOW_SECONDS = 2
+
+# Per-user sliding window: at most this many commands in this many seconds
+USER_RATE_LIMIT_COMMANDS = 10
+USER_RATE_LIMIT_SECONDS = 5
+
+# Admission control: the concurrent command cap grows additively while commands
+# finish under the latency target and halves when they don't
+COMMAND_LATENCY_TARGET_SECONDS = 1.0
+COMMAND_LATENCY_WINDOW = 32
+COMMAND_CAP_START = 16.0
+COMMAND_CAP_MIN = 2.0
+COMMAND_CAP_MAX = 64.0
+
 class WarBot(commands.Bot):
     def __init__(self):
         super().__init__(command_prefix='.')
@@ -39,13 +61,32 @@ class WarBot(commands.Bot):
         self.civ_manager = CivilizationManager(self.db)
         self.event_manager = EventManager(self.db)
         
-        # Initialize command cogs - will be loaded in on_ready
-        pass
+        # Start and length of the cooldown each admitted (user, command) invocation
+        # began, and when entries whose cooldown ran out were last swept out
+        self.last_invocations = {}
+        self.last_invocations_swept_at = 0.0
+        
+        # Recent command times per user for the sliding-window rate limit, and when
+        # users idle for a whole window were last dropped
+        self.user_windows = defaultdict(lambda: deque(maxlen=USER_RATE_LIMIT_COMMANDS))
+        self.user_windows_swept_at = 0.0
+        
+        # Commands currently running, the adaptive cap on them and recent run times
+        self.inflight_commands = 0
+        self.command_cap = COMMAND_CAP_START
+        self.command_latencies = deque(maxlen=COMMAND_LATENCY_WINDOW)
+        
+        # Command cogs are loaded on the first on_ready; reconnects fire it again
+        self.cogs_loaded = False
 
     async def on_ready(self):
         logger.info(f'{self.user} has connected to Guilded!')
         print(f'WarBot is online as {self.user}')
         
+        if self.cogs_loaded:
+            return
+        self.cogs_loaded = True
+        
         # Initialize command cogs after bot is ready
         try:
             self.add_cog(BasicCommands(self))
@@ -80,25 +121,108 @@ class WarBot(commands.Bot):
         if message.author == self.user:
             return
         
+        # Drop command spam before any cog runs its database lookups
+        if self.is_command_spam(message) or self.is_rate_limited(message):
+            return
+        
+        content = getattr(message, 'content', '') or ''
+        if not content.startswith(self.command_prefix):
+            await self.process_commands(message)
+            return
+        
+        # Turn commands away while the bot is over its current concurrency cap
+        if self.inflight_commands >= int(self.command_cap):
+            await message.reply("⏳ I'm handling a lot of commands right now, please try again in a moment!")
+            return
+        
         # Process commands
-        await self.process_commands(message)
+        self.inflight_commands += 1
+        started = time.monotonic()
+        try:
+            await self.process_commands(message)
+        finally:
+            # Events are queued per thread; commit whatever this command logged
+            self.db.flush_events()
+            self.inflight_commands -= 1
+            self.record_command_latency(time.monotonic() - started)
+
+    def record_command_latency(self, seconds: float):
+        """Adjust the concurrency cap once per full window of command run times"""
+        self.command_latencies.append(seconds)
+        if len(self.command_latencies) < COMMAND_LATENCY_WINDOW:
+            return
+        
+        mean_latency = sum(self.command_latencies) / len(self.command_latencies)
+        self.command_latencies.clear()
+        if mean_latency <= COMMAND_LATENCY_TARGET_SECONDS:
+            self.command_cap = min(COMMAND_CAP_MAX, self.command_cap + 0.5)
+        else:
+            self.command_cap = max(COMMAND_CAP_MIN, self.command_cap * 0.5)
+            logger.warning(f"Commands averaging {mean_latency:.2f}s, lowering concurrency cap to {self.command_cap:.1f}")
 
+    def is_command_spam(self, message) -> bool:
+        """Check if the message repeats a command whose cooldown ends within the spam window"""
+        content = getattr(message, 'content', '') or ''
+        if not content.startswith(self.command_prefix):
+            return False
 
+        parts = content[len(self.command_prefix):].split(maxsplit=1)
+        if not parts:
+            return False
+
+        # Only commands behind a cooldown decorator are tracked, under their canonical
+        # name so aliases share an entry
+        command = self.get_command(parts[0])
+        cooldown_seconds = getattr(command.callback, 'cooldown_seconds', None) if command else None
+        if not cooldown_seconds:
+            return False
+
+        now = time.monotonic()
+        if now - self.last_invocations_swept_at > SPAM_WINDOW_SECONDS:
+            self.last_invocations = {
+                key: (started, seconds) for key, (started, seconds) in self.last_invocations.items()
+                if now - started < seconds
+            }
+            self.last_invocations_swept_at = now
+
+        key = (str(message.author.id), command.qualified_name)
+        started, seconds = self.last_invocations.get(key, (0.0, 0))
+        remaining = seconds - (now - started)
+        if remaining <= 0:
+            # This invocation starts a new cooldown
+            self.last_invocations[key] = (now, cooldown_seconds)
+            return False
+
+        # Longer waits still reach the command so it can reply with its cooldown message
+        return remaining < SPAM_WINDOW_SECONDS
+
+    def is_rate_limited(self, message) -> bool:
+        """Check if the author has used up their commands for the current window"""
+        content = getattr(message, 'content', '') or ''
+        if not content.startswith(self.command_prefix):
+            return False
+
+        now = time.monotonic()
+        if now - self.user_windows_swept_at > USER_RATE_LIMIT_SECONDS:
+            idle_users = [
+                user_id for user_id, window in self.user_windows.items()
+                if not window or now - window[-1] > USER_RATE_LIMIT_SECONDS
+            ]
+            for user_id in idle_users:
+                del self.user_windows[user_id]
+            self.user_windows_swept_at = now
+
+        window = self.user_windows[str(message.author.id)]
+        while window and now - window[0] > USER_RATE_LIMIT_SECONDS:
+            window.popleft()
+        if len(window) >= USER_RATE_LIMIT_COMMANDS:
+            return True
+        window.append(now)
+        return False
 
-def start_flask_server():
-    """Start the Flask web dashboard in a separate thread"""
-    try:
-        flask_app.run(host='0.0.0.0', port=5000, debug=False)
-    except Exception as e:
-        logger.error(f"Failed to start Flask server: {e}")
 
 async def main():
     """Main function to start the bot"""
-    # Start Flask server in background thread
-    flask_thread = threading.Thread(target=start_flask_server, daemon=True)
-    flask_thread.start()
-    logger.info("Flask dashboard started on port 5000")
-    
     # Get bot token from environment
     token = os.getenv('GUILDED_BOT_TOKEN', 'your_bot_token_here')
     
@@ -106,16 +230,42 @@ async def main():
         logger.error("Please set GUILDED_BOT_TOKEN environment variable")
         return
     
-    # Start the bot
     bot = WarBot()
+    
+    # Serve the web dashboard from the bot's event loop, sharing its database
+    web_runner = None
+    try:
+        web_runner = await start_web_server(bot.db, port=5000, bot=bot)
+        logger.info("Web dashboard started on port 5000")
+    except Exception as e:
+        logger.error(f"Failed to start web dashboard: {e}")
+    
+    # Start the bot
     try:
         await bot.start(token)
     except Exception as e:
         logger.error(f"Failed to start bot: {e}")
+    finally:
+        # Runs on Ctrl-C too, as asyncio.run cancels this task before closing the loop
+        if not bot.is_closed():
+            await bot.close()
+        if web_runner is not None:
+            await web_runner.cleanup()
+        # Cooldowns and event rows are queued on this thread, so commit them here before the final upload
+        bot.db.flush_cooldowns()
+        bot.db.flush_events()
+        # Don't lose writes still waiting out the upload debounce
+        await asyncio.to_thread(bot.db.flush_upload)
+        bot.db.close_connections()
+        logger.info("Bot and web dashboard shut down")
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        # uvloop's faster event loop drives both the bot and the dashboard when installed
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Bot shutdown requested")
     except Exception as e:
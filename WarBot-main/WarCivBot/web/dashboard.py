@@ -1,6 +1,10 @@
-from flask import Flask, render_template, jsonify
-import json
+from aiohttp import web
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+import asyncio
+import gzip
+import hashlib
 import os
+import re
 import sys
 import logging
 from datetime import datetime, timedelta
@@ -8,12 +12,27 @@ from datetime import datetime, timedelta
 # Add the parent directory to the path so we can import bot modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from bot.database import Database
+from bot.database import Database, json_loads
 from bot.civilization import CivilizationManager
 from bot.utils import format_number, get_civilization_rank, get_happiness_status
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'warbot-dashboard-secret-key')
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Leading indentation and blank lines, which make up a large share of the template
+TEMPLATE_INDENT_RE = re.compile(r'^\s+', re.MULTILINE)
+
+class MinifyingLoader(FileSystemLoader):
+    """Template loader that strips indentation once, when a template is compiled"""
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        # Newlines are kept so inline scripts with // comments stay valid
+        return TEMPLATE_INDENT_RE.sub('', source), filename, uptodate
+
+templates = Environment(loader=MinifyingLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html']))
+
+routes = web.RouteTableDef()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +42,23 @@ logger = logging.getLogger(__name__)
 db = None
 civ_manager = None
 
+# Rendered empty-state pages keyed by error message; they take no live data
+_empty_pages = {}
+EMPTY_PAGE_ERRORS = (
+    "Page not found",
+    "Internal server error",
+    "Database connection failed",
+    "Dashboard temporarily unavailable",
+)
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_SIZE = 500
+GZIP_CONTENT_TYPES = ('text/html', 'application/json')
+
+# Static assets only change on deploy, let browsers and proxies keep them for a day
+STATIC_CACHE_CONTROL = 'public, max-age=86400'
+STATIC_GZIP_EXTENSIONS = ('.css', '.js')
+
 def initialize_services():
     """Lazy initialization of services to improve startup time"""
     global db, civ_manager
@@ -40,20 +76,92 @@ def initialize_services():
         logger.error(f"Error initializing services: {e}")
         return None, None
 
-@app.route('/')
-def dashboard():
-    """Main dashboard page"""
+def precompress_static():
+    """Write a .gz copy next to each text asset so it can be sent as-is"""
+    for name in os.listdir(STATIC_DIR):
+        if not name.endswith(STATIC_GZIP_EXTENSIONS):
+            continue
+        path = os.path.join(STATIC_DIR, name)
+        gz_path = path + '.gz'
+        try:
+            if os.path.exists(gz_path) and os.path.getmtime(gz_path) >= os.path.getmtime(path):
+                continue
+            with open(path, 'rb') as src:
+                data = gzip.compress(src.read(), compresslevel=9, mtime=0)
+            with open(gz_path, 'wb') as dst:
+                dst.write(data)
+        except OSError as e:
+            logger.error(f"Error precompressing {name}: {e}")
+
+def render_template(template_name, **context):
+    """Render a dashboard template to an HTML string"""
+    return templates.get_template(template_name).render(**context)
+
+def render_empty_dashboard(error):
+    """Return the encoded no-data dashboard for this error, rendering it only once"""
+    page = _empty_pages.get(error)
+    if page is None:
+        page = render_template('index.html',
+                               stats=get_empty_stats(),
+                               top_civs=[],
+                               recent_events=[],
+                               alliances=[],
+                               error=error).encode('utf-8')
+        _empty_pages[error] = page
+    return page
+
+def html_response(page, status=200):
+    """Wrap encoded HTML in a response"""
+    return web.Response(body=page, status=status, content_type='text/html', charset='utf-8')
+
+@web.middleware
+async def error_pages(request, handler):
+    """Render the empty dashboard for unknown pages and unhandled errors"""
+    try:
+        return await handler(request)
+    except web.HTTPNotFound:
+        return html_response(render_empty_dashboard("Page not found"), status=404)
+    except web.HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unhandled dashboard error: {e}")
+        return html_response(render_empty_dashboard("Internal server error"), status=500)
+
+@web.middleware
+async def compress_response(request, handler):
+    """Gzip HTML/JSON responses and answer repeat requests with 304 via ETag"""
+    response = await handler(request)
+    try:
+        if (response.status != 200 or not isinstance(response, web.Response)
+                or response.body is None
+                or response.content_type not in GZIP_CONTENT_TYPES
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        response.headers['Vary'] = 'Accept-Encoding'
+        body = response.body
+        if len(body) >= GZIP_MIN_SIZE and 'gzip' in request.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=6, mtime=0)
+            response.body = body
+            response.headers['Content-Encoding'] = 'gzip'
+
+        etag = hashlib.md5(body).hexdigest()
+        if any(match.value == etag for match in request.if_none_match or ()):
+            return web.Response(status=304, headers={'ETag': f'"{etag}"', 'Vary': 'Accept-Encoding'})
+        response.etag = etag
+        return response
+    except Exception as e:
+        logger.error(f"Error compressing response: {e}")
+        return response
+
+def build_dashboard_page():
+    """Gather dashboard data and render the main page"""
     try:
         db, civ_manager = initialize_services()
         
         # Check if services are properly initialized
         if db is None or civ_manager is None:
-            return render_template('index.html', 
-                                 stats=get_empty_stats(),
-                                 top_civs=[],
-                                 recent_events=[],
-                                 alliances=[],
-                                 error="Database connection failed")
+            return render_empty_dashboard("Database connection failed")
         
         # Get statistics
         stats = get_dashboard_stats()
@@ -71,86 +179,95 @@ def dashboard():
                              stats=stats,
                              top_civs=top_civs,
                              recent_events=recent_events,
-                             alliances=alliances)
+                             alliances=alliances).encode('utf-8')
     except Exception as e:
         logger.error(f"Error loading dashboard: {e}")
-        return render_template('index.html', 
-                             stats=get_empty_stats(), 
-                             top_civs=[], 
-                             recent_events=[], 
-                             alliances=[],
-                             error="Dashboard temporarily unavailable")
-
-@app.route('/api/stats')
-def api_stats():
+        return render_empty_dashboard("Dashboard temporarily unavailable")
+
+def load_api_data(loader, fallback):
+    """Run an API data loader once services are available"""
+    db, civ_manager = initialize_services()
+    if db is None or civ_manager is None:
+        return fallback
+    return loader()
+
+@routes.get('/')
+async def dashboard(request):
+    """Main dashboard page"""
+    # Database work is synchronous, keep it off the bot's event loop
+    page = await asyncio.to_thread(build_dashboard_page)
+    return html_response(page)
+
+@routes.get('/api/stats')
+async def api_stats(request):
     """API endpoint for dashboard statistics"""
     try:
-        db, civ_manager = initialize_services()
-        if db is None or civ_manager is None:
-            return jsonify(get_empty_stats())
-        return jsonify(get_dashboard_stats())
+        stats = await asyncio.to_thread(load_api_data, get_dashboard_stats, get_empty_stats())
+        return web.json_response(stats)
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
-        return jsonify(get_empty_stats())
+        return web.json_response(get_empty_stats())
 
-@app.route('/api/civilizations')
-def api_civilizations():
+@routes.get('/api/civilizations')
+async def api_civilizations(request):
     """API endpoint for civilization data"""
     try:
-        db, civ_manager = initialize_services()
-        if db is None or civ_manager is None:
-            return jsonify([])
-        civs = get_top_civilizations(50)
-        return jsonify(civs)
+        civs = await asyncio.to_thread(load_api_data, lambda: get_top_civilizations(50), [])
+        return web.json_response(civs)
     except Exception as e:
         logger.error(f"Error getting civilizations: {e}")
-        return jsonify([])
+        return web.json_response([])
 
-@app.route('/api/events')
-def api_events():
+@routes.get('/api/events')
+async def api_events(request):
     """API endpoint for recent events"""
     try:
-        db, civ_manager = initialize_services()
-        if db is None or civ_manager is None:
-            return jsonify([])
-        events = get_recent_events(100)
-        return jsonify(events)
+        events = await asyncio.to_thread(load_api_data, lambda: get_recent_events(100), [])
+        return web.json_response(events)
     except Exception as e:
         logger.error(f"Error getting events: {e}")
-        return jsonify([])
+        return web.json_response([])
 
-@app.route('/api/leaderboard/<category>')
-def api_leaderboard(category):
+@routes.get('/api/leaderboard/{category}')
+async def api_leaderboard(request):
     """API endpoint for specific leaderboards"""
+    category = request.match_info['category']
     try:
         valid_categories = ['power', 'population', 'military', 'resources', 'happiness']
         
         if category not in valid_categories:
-            return jsonify({"error": "Invalid category"}), 400
-            
-        db, civ_manager = initialize_services()
-        if db is None or civ_manager is None:
-            return jsonify([])
+            return web.json_response({"error": "Invalid category"}, status=400)
             
-        leaderboard = get_leaderboard_by_category(category, 20)
-        return jsonify(leaderboard)
+        leaderboard = await asyncio.to_thread(
+            load_api_data, lambda: get_leaderboard_by_category(category, 20), [])
+        return web.json_response(leaderboard)
     except Exception as e:
         logger.error(f"Error getting leaderboard for {category}: {e}")
-        return jsonify([])
+        return web.json_response([])
+
+@routes.get('/static/{filename}')
+async def static_file(request):
+    """Serve a static asset straight from disk, using sendfile and its .gz copy when possible"""
+    path = os.path.join(STATIC_DIR, os.path.basename(request.match_info['filename']))
+    if not os.path.isfile(path):
+        raise web.HTTPNotFound()
+    return web.FileResponse(path, headers={'Cache-Control': STATIC_CACHE_CONTROL})
 
-@app.route('/health')
-def health_check():
+@routes.get('/health')
+async def health_check(request):
     """Health check endpoint for deployment monitoring"""
     db_status = "connected" if db is not None else "disconnected"
     civ_manager_status = "initialized" if civ_manager is not None else "uninitialized"
+    bot = request.app.get('bot')
     
-    return jsonify({
+    return web.json_response({
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
         "service": "warbot-dashboard",
         "database": db_status,
-        "civilization_manager": civ_manager_status
-    }), 200
+        "civilization_manager": civ_manager_status,
+        "bot_ready": bot.is_ready() if bot is not None else False
+    }, status=200)
 
 def get_dashboard_stats():
     """Get overall dashboard statistics"""
@@ -221,10 +338,11 @@ def get_top_civilizations(limit=10):
             logger.info("No civilizations found for leaderboard")
             return []
         
-        # Calculate power scores and sort
+        # Calculate power scores and sort; the civilizations are already loaded
+        calculate_power = civ_manager.calculate_power
         civ_scores = []
         for civ in civilizations:
-            power_score = civ_manager.get_civilization_power(civ['user_id'])
+            power_score = calculate_power(civ)
             rank, rank_emoji = get_civilization_rank(power_score)
             happiness_status, happiness_emoji = get_happiness_status(civ['population']['happiness'])
             
@@ -317,17 +435,14 @@ def get_alliance_info():
             logger.info("No alliances found in database")
             return []
         
+        # Look up every member's civilization name in one query
+        member_lists = [json_loads(row['members']) for row in rows]
+        names = db.get_civilization_names(member_id for members in member_lists for member_id in members)
+        
         alliances = []
-        for row in rows:
+        for row, members in zip(rows, member_lists):
             alliance = dict(row)
-            members = json.loads(alliance['members'])
-            
-            # Get member civilization names
-            member_names = []
-            for member_id in members:
-                civ = civ_manager.get_civilization(member_id)
-                if civ:
-                    member_names.append(civ['name'])
+            member_names = [names[member_id] for member_id in members if member_id in names]
             
             alliances.append({
                 "name": alliance['name'],
@@ -353,41 +468,42 @@ def get_leaderboard_by_category(category, limit=20):
             logger.info("No civilizations found for leaderboard")
             return []
         
+        # Pick the category's value and display once, not per civilization
+        if category == 'power':
+            value_of = civ_manager.calculate_power
+        elif category == 'population':
+            value_of = lambda civ: civ['population']['citizens']
+        elif category == 'military':
+            value_of = lambda civ: civ['military']['soldiers'] + civ['military']['spies']
+        elif category == 'resources':
+            value_of = lambda civ: sum(civ['resources'].values())
+        elif category == 'happiness':
+            value_of = lambda civ: civ['population']['happiness']
+        else:
+            value_of = None
+        display_of = (lambda value: f"{value}%") if category == 'happiness' else format_number
+        
         leaderboard = []
         for civ in civilizations:
-            # Handle None ideology
-            ideology = civ.get('ideology', 'None')
-            if ideology is None:
-                ideology = "None"
-                
             entry = {
                 "name": civ['name'],
                 "user_id": civ['user_id'],
-                "ideology": ideology
+                # Handle None ideology
+                "ideology": civ.get('ideology') or "None"
             }
-            
-            if category == 'power':
-                entry['value'] = civ_manager.get_civilization_power(civ['user_id'])
-                entry['display'] = format_number(entry['value'])
-            elif category == 'population':
-                entry['value'] = civ['population']['citizens']
-                entry['display'] = format_number(entry['value'])
-            elif category == 'military':
-                entry['value'] = civ['military']['soldiers'] + civ['military']['spies']
-                entry['display'] = format_number(entry['value'])
-            elif category == 'resources':
-                entry['value'] = sum(civ['resources'].values())
-                entry['display'] = format_number(entry['value'])
-            elif category == 'happiness':
-                entry['value'] = civ['population']['happiness']
-                entry['display'] = f"{entry['value']}%"
-            
+            if value_of is not None:
+                entry['value'] = value_of(civ)
             leaderboard.append(entry)
         
         # Sort by value
         leaderboard.sort(key=lambda x: x['value'], reverse=True)
         
-        return leaderboard[:limit]
+        # Only the entries shown need their display string
+        leaderboard = leaderboard[:limit]
+        if value_of is not None:
+            for entry in leaderboard:
+                entry['display'] = display_of(entry['value'])
+        return leaderboard
         
     except Exception as e:
         logger.error(f"Error getting {category} leaderboard: {e}")
@@ -447,27 +563,32 @@ def get_empty_stats():
         "ideology_distribution": {}
     }
 
-# Error handlers
-@app.errorhandler(404)
-def not_found(error):
-    return render_template('index.html', 
-                         stats=get_empty_stats(), 
-                         top_civs=[], 
-                         recent_events=[], 
-                         alliances=[],
-                         error="Page not found"), 404
-
-@app.errorhandler(500)
-def internal_error(error):
-    return render_template('index.html', 
-                         stats=get_empty_stats(), 
-                         top_civs=[], 
-                         recent_events=[], 
-                         alliances=[],
-                         error="Internal server error"), 500
+def create_app(database=None, bot=None):
+    """Build the dashboard application, optionally sharing an existing database and bot"""
+    global db, civ_manager
+    if database is not None:
+        db = database
+        civ_manager = CivilizationManager(database)
+
+    precompress_static()
+    # Empty-state pages are fixed, render them before the first request needs one
+    for error in EMPTY_PAGE_ERRORS:
+        render_empty_dashboard(error)
+    app = web.Application(middlewares=[error_pages, compress_response])
+    app['bot'] = bot
+    app.add_routes(routes)
+    return app
+
+async def start_web_server(database=None, host='0.0.0.0', port=5000, bot=None):
+    """Serve the dashboard from the running event loop"""
+    runner = web.AppRunner(create_app(database, bot))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner
 
 if __name__ == '__main__':
     # Get port from environment variable or default to 5000
     port = int(os.environ.get('PORT', 5000))
     logger.info(f"Starting server on port {port}")
-    app.run(host='0.0.0.0', port=port, debug=False)
+    web.run_app(create_app(), host='0.0.0.0', port=port)